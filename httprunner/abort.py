@@ -0,0 +1,144 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+from urllib.parse import urlparse
+
+from httprunner import exceptions, logger
+
+
+def get_testcase_host(testcase):
+    '''
+    get host testcase sends requests to, from base_url in config or url of
+    first teststep. empty string if host is unknown.
+    '''
+
+    base_url = testcase.get('config', {}).get('request', {}).get('base_url')
+    if not base_url:
+        for teststep in testcase.get('teststeps', []):
+            base_url = teststep.get('request', {}).get('url')
+            break
+
+    if not isinstance(base_url, str):
+        return ''
+
+    return urlparse(base_url).netloc
+
+
+class AbortController:
+    '''
+    circuit-breaker style abort rules of load run. rules are checked for the
+    whole run and for each host separately: once a host trips, testcases of
+    the host are no longer scheduled, and once the run trips, no testcase is.
+    Args:
+        max_error_rate (float): error rate over sliding window to trip
+        window (int): sliding window size, in testcases
+        min_samples (int): testcases needed in window before error rate and
+            latency rules are checked, window size if not specified
+        max_consecutive_failures (int): consecutive VaildationFailure to trip
+        latency_budget (float): p99 testcase latency over sliding window to
+            trip, in milliseconds
+    Examples:
+        >>> abort_controller = AbortController(max_error_rate=0.5, window=100)
+        >>> pool_runner = pool.ThreadPoolRunner(16, abort_controller=abort_controller)
+        >>> pool_runner.run(testcases, iterations=10000)
+            {
+                'total': 10000,
+                'successes': 120,
+                'failures': 110,
+                'skipped': 9770,
+                'aborted': {'': 'error rate 0.52 over window exceeds 0.5'},
+                'errors': [],
+                'duration': 3.2
+            }
+    '''
+
+    def __init__(self,
+                 max_error_rate=None,
+                 window=100,
+                 min_samples=None,
+                 max_consecutive_failures=None,
+                 latency_budget=None):
+        if window < 1:
+            raise exceptions.ParamError(f'invalid window size: {window}')
+        if max_error_rate is None and max_consecutive_failures is None \
+                and latency_budget is None:
+            raise exceptions.ParamError('no abort rule specified')
+
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.min_samples = min(min_samples or window, window)
+        self.max_consecutive_failures = max_consecutive_failures
+        self.latency_budget = latency_budget
+
+        self.lock = threading.Lock()
+        # host, '' for whole run => recent (failed, elapsed) outcomes
+        self.outcomes = {}
+        self.consecutive_failures = {}
+        # host, '' for whole run => reason of trip
+        self.tripped = {}
+
+    def is_aborted(self, host=''):
+        return '' in self.tripped or host in self.tripped
+
+    def _check_rules(self, key):
+        outcomes = self.outcomes[key]
+        if self.max_consecutive_failures is not None \
+                and self.consecutive_failures[key] \
+                >= self.max_consecutive_failures:
+            return f'{self.consecutive_failures[key]} consecutive ' \
+                'validation failures'
+
+        if len(outcomes) < self.min_samples:
+            return None
+
+        if self.max_error_rate is not None:
+            error_rate = sum(failed for failed, _ in outcomes) / len(outcomes)
+            if error_rate > self.max_error_rate:
+                return f'error rate {error_rate:.2f} over window ' \
+                    f'exceeds {self.max_error_rate}'
+
+        if self.latency_budget is not None:
+            latencies = sorted(elapsed for _, elapsed in outcomes)
+            p99 = latencies[min(int(len(latencies) * 0.99),
+                                len(latencies) - 1)]
+            if p99 > self.latency_budget:
+                return f'p99 latency {p99:.1f}ms over window ' \
+                    f'exceeds {self.latency_budget}ms'
+
+        return None
+
+    def record(self, host, error, elapsed):
+        '''
+        record outcome of testcase and trip rules.
+        Args:
+            host (str): host of testcase
+            error (Exception): failure or error of testcase, None if passed
+            elapsed (float): testcase duration in seconds
+        Returns:
+            bool: True if run or host is aborted.
+        '''
+
+        with self.lock:
+            for key in ['', host] if host else ['']:
+                if key in self.tripped:
+                    continue
+
+                if key not in self.outcomes:
+                    self.outcomes[key] = collections.deque(maxlen=self.window)
+                    self.consecutive_failures[key] = 0
+
+                self.outcomes[key].append((error is not None, elapsed * 1000))
+                if isinstance(error, exceptions.VaildationFailure):
+                    self.consecutive_failures[key] += 1
+                else:
+                    self.consecutive_failures[key] = 0
+
+                reason = self._check_rules(key)
+                if reason is not None:
+                    self.tripped[key] = reason
+                    logger.log_error(
+                        f"abort {'host ' + key if key else 'run'}: {reason}")
+
+            return self.is_aborted(host)
@@ -0,0 +1,218 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from httprunner import exceptions, logger, pool, stats
+
+
+class AimdController:
+    '''
+    additive-increase/multiplicative-decrease controller of virtual users.
+    users are increased by step while latency and error rate are within SLO,
+    and cut by factor as soon as either exceeds it.
+    Args:
+        target_p99 (float): p99 latency SLO of each teststep, in milliseconds
+        max_error_rate (float): error rate SLO, ratio of failed testcases
+        min_users (int): lower bound of virtual users
+        max_users (int): upper bound of virtual users
+        increase (int): users added when SLO is met
+        decrease (float): factor users are multiplied by when SLO is missed
+    '''
+
+    def __init__(self,
+                 target_p99,
+                 max_error_rate=0.01,
+                 min_users=1,
+                 max_users=64,
+                 increase=1,
+                 decrease=0.5):
+        if target_p99 <= 0:
+            raise exceptions.ParamError(f'invalid target p99: {target_p99}')
+        if not 1 <= min_users <= max_users:
+            raise exceptions.ParamError(
+                f'invalid users bounds: {min_users}, {max_users}')
+        if increase < 1 or not 0 < decrease < 1:
+            raise exceptions.ParamError(
+                f'invalid increase/decrease: {increase}, {decrease}')
+
+        self.target_p99 = target_p99
+        self.max_error_rate = max_error_rate
+        self.min_users = min_users
+        self.max_users = max_users
+        self.increase = increase
+        self.decrease = decrease
+        self.users = min_users
+
+    def is_within_slo(self, p99, error_rate):
+        return p99 <= self.target_p99 and error_rate <= self.max_error_rate
+
+    def update(self, p99, error_rate):
+        '''
+        get virtual users of next window from metrics of last window.
+        Args:
+            p99 (float): worst p99 latency of teststeps, in milliseconds
+            error_rate (float): ratio of failed testcases
+        Returns:
+            int: virtual users
+        '''
+
+        if self.is_within_slo(p99, error_rate):
+            users = self.users + self.increase
+        else:
+            users = int(self.users * self.decrease)
+
+        self.users = max(self.min_users, min(self.max_users, users))
+        return self.users
+
+
+class AdaptiveLoadRunner:
+    '''
+    run testcases in loop by virtual users, and adjust in-flight virtual
+    users every window by controller. maximum throughput of windows within
+    SLO is reported as maximum sustainable throughput.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        controller (AimdController): concurrency controller
+        window (float): seconds of each measuring window
+        clock (module): clock with perf_counter() and sleep(), time module
+            if not specified.
+    Examples:
+        >>> controller = AimdController(target_p99=200, max_users=32)
+        >>> AdaptiveLoadRunner(testcases, controller, window=5).run(windows=20)
+            {
+                'max_throughput': 312.5,
+                'max_throughput_users': 12,
+                'windows': [{'users': 1, 'testcases': 48, 'throughput': 9.6,
+                             'p99': 21.3, 'error_rate': 0.0, 'within_slo': True}]
+            }
+    '''
+
+    def __init__(self, testcases, controller, window=5.0, clock=time):
+        if not testcases:
+            raise exceptions.ParamError('testcases should not be empty')
+
+        self.testcases = testcases
+        self.controller = controller
+        self.window = window
+        self.clock = clock
+        # recorded by all runners, and swapped out at end of each window
+        self.latency_stats = stats.LatencyStats()
+        self.pool_runner = pool.ThreadPoolRunner(controller.max_users,
+                                                 self.latency_stats)
+
+        self.users = controller.users
+        self.running = False
+        self.lock = threading.Lock()
+        # parked virtual users wait on it until users are increased
+        self.users_changed = threading.Condition(self.lock)
+        self.successes = 0
+        self.failures = 0
+        self.window_start_at = None
+
+    def set_users(self, users):
+        with self.users_changed:
+            self.users = users
+            self.users_changed.notify_all()
+
+    def stop(self):
+        with self.users_changed:
+            self.running = False
+            self.users_changed.notify_all()
+
+    def _run_virtual_user(self, user_index):
+        iteration = user_index
+        while True:
+            with self.users_changed:
+                while self.running and user_index >= self.users:
+                    self.users_changed.wait()
+                if not self.running:
+                    return
+
+            testcase = self.testcases[iteration % len(self.testcases)]
+            iteration += 1
+            error = self.pool_runner.run_testcase_safely(testcase)
+            with self.lock:
+                if error is None:
+                    self.successes += 1
+                else:
+                    self.failures += 1
+
+    def measure_window(self):
+        '''
+        swap out latency stats and counters, and get metrics of the window
+        just ended.
+        Returns:
+            dict: window metrics, latency in milliseconds
+        '''
+
+        latency_stats = self.latency_stats.swap()
+        with self.lock:
+            successes, failures = self.successes, self.failures
+            self.successes = self.failures = 0
+            now = self.clock.perf_counter()
+            elapsed = now - self.window_start_at
+            self.window_start_at = now
+
+        p99 = 0
+        with latency_stats.lock:
+            for histogram in latency_stats.teststeps_histograms.values():
+                p99 = max(p99, histogram.get_value_at_percentile(99) / 1000)
+
+        total = successes + failures
+        error_rate = failures / total if total else 0
+        return {
+            'users': self.users,
+            'testcases': total,
+            'throughput': round(total / elapsed, 1) if elapsed > 0 else 0,
+            'p99': round(p99, 3),
+            'error_rate': round(error_rate, 4),
+            'within_slo': total > 0
+            and self.controller.is_within_slo(p99, error_rate)
+        }
+
+    def run(self, windows=20):
+        '''
+        run windows, adjusting virtual users after each.
+        Returns:
+            dict: maximum sustainable throughput and metrics of each window
+        '''
+
+        self.running = True
+        self.window_start_at = self.clock.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_virtual_user,
+                             args=(user_index, ),
+                             daemon=True)
+            for user_index in range(self.controller.max_users)
+        ]
+        for thread in threads:
+            thread.start()
+
+        history = []
+        try:
+            for _ in range(windows):
+                self.clock.sleep(self.window)
+                metrics = self.measure_window()
+                history.append(metrics)
+                self.set_users(
+                    self.controller.update(metrics['p99'],
+                                           metrics['error_rate']))
+                logger.log_info(f'adaptive window: {metrics}, '
+                                f'next users: {self.users}')
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            self.pool_runner.close()
+
+        sustainable = [metrics for metrics in history if metrics['within_slo']]
+        best = max(sustainable,
+                   key=lambda metrics: metrics['throughput'],
+                   default=None)
+        return {
+            'max_throughput': best['throughput'] if best else 0,
+            'max_throughput_users': best['users'] if best else 0,
+            'windows': history
+        }
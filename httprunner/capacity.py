@@ -0,0 +1,165 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import threading
+import time
+
+from httprunner import exceptions, logger, pool, stats
+
+
+def run_at_rate(testcases, rate, duration, max_in_flight=64, clock=time):
+    '''
+    start testcases at fixed arrival rate for duration, regardless of how
+    long previous testcases take. latency of each testcase is measured from
+    its intended start time, so that queueing in saturated runs is counted,
+    and teststeps latency is reported both raw and corrected by the delay of
+    testcase start.
+    Args:
+        testcases (list): testcases started in turn
+        rate (float): testcases started per second
+        duration (float): seconds to keep starting testcases
+        max_in_flight (int): max testcases running at the same time
+        clock (module): clock with perf_counter() and sleep(), time module
+            if not specified.
+    Returns:
+        dict: rate metrics, latency in milliseconds
+            {
+                'rate': 50,
+                'testcases': 500,
+                'failures': 0,
+                'error_rate': 0.0,
+                'throughput': 49.8,
+                'p50': 12.1,
+                'p99': 30.5,
+                'latency': {'teststeps': {'get user 1000': {'p99': 8.9, ...,
+                            'corrected': {'p99': 120.4, ...}}}, ...}
+            }
+    '''
+
+    schedule = stats.FixedRateSchedule(rate, clock)
+    histogram = stats.LatencyHistogram()
+    latency_stats = stats.LatencyStats()
+    lock = threading.Lock()
+    errors = []
+    pool_runner = pool.ThreadPoolRunner(max_in_flight, latency_stats)
+
+    def run_testcase(testcase, intended_start):
+        start_delay = max(clock.perf_counter() - intended_start, 0)
+        error = pool_runner.run_testcase_safely(testcase,
+                                                start_delay=start_delay)
+        elapsed = clock.perf_counter() - intended_start
+        with lock:
+            histogram.record(round(elapsed * 1000000))
+            if error is not None:
+                errors.append(error)
+
+    count = max(int(rate * duration), 1)
+    futures = {}
+    start_at = clock.perf_counter()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_in_flight) as executor:
+            for index in range(count):
+                testcase = testcases[index % len(testcases)]
+                intended_start = schedule.wait()
+                future = executor.submit(run_testcase, testcase,
+                                         intended_start)
+                futures[future] = testcase
+    finally:
+        pool_runner.close()
+    elapsed = clock.perf_counter() - start_at
+
+    # errors not caught by pool runner, e.g. in hooks, are failures as well
+    for future, testcase in futures.items():
+        try:
+            future.result()
+        except Exception as err:
+            name = testcase.get('config', {}).get('name', '')
+            logger.log_error(f'testcase crashed: {name}, {err!r}')
+            errors.append((name, repr(err)))
+
+    p50, p99 = histogram.get_values_at_percentiles([50, 99])
+    return {
+        'rate': rate,
+        'testcases': count,
+        'failures': len(errors),
+        'error_rate': round(len(errors) / count, 4),
+        'throughput': round(count / elapsed, 1) if elapsed > 0 else 0,
+        'p50': round(p50 / 1000, 3),
+        'p99': round(p99 / 1000, 3),
+        'latency': latency_stats.get_report()
+    }
+
+
+def search_capacity(testcases,
+                    target_p99,
+                    max_error_rate=0.01,
+                    min_rate=1,
+                    max_rate=1000,
+                    duration=10,
+                    tolerance=0.05,
+                    max_in_flight=64,
+                    clock=time):
+    '''
+    binary search the highest arrival rate at which p99 latency and error
+    rate hold within SLA.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        target_p99 (float): p99 latency SLA, in milliseconds
+        max_error_rate (float): error rate SLA, ratio of failed testcases
+        min_rate (float): lowest rate searched, in testcases per second
+        max_rate (float): highest rate searched
+        duration (float): seconds each rate is run
+        tolerance (float): stop when search range is narrower than this
+            ratio of lower bound
+        max_in_flight (int): max testcases running at the same time
+        clock (module): clock with perf_counter() and sleep()
+    Returns:
+        dict: capacity report, capacity is 0 if SLA fails even at min_rate.
+            {
+                'capacity': 180,
+                'target_p99': 200,
+                'max_error_rate': 0.01,
+                'curve': [
+                    {'rate': 1, 'p99': 12.1, 'error_rate': 0.0, 'passed': True},
+                    {'rate': 1000, 'p99': 5020.3, 'error_rate': 0.1, 'passed': False}
+                ]
+            }
+    '''
+
+    if not testcases:
+        raise exceptions.ParamError('testcases should not be empty')
+    if not 0 < min_rate <= max_rate:
+        raise exceptions.ParamError(
+            f'invalid rate range: {min_rate}, {max_rate}')
+
+    curve = []
+
+    def probe(rate):
+        metrics = run_at_rate(testcases, rate, duration, max_in_flight, clock)
+        metrics['passed'] = metrics['p99'] <= target_p99 \
+            and metrics['error_rate'] <= max_error_rate
+        curve.append(metrics)
+        logger.log_info(f'capacity probe: {metrics}')
+        return metrics['passed']
+
+    if not probe(min_rate):
+        capacity = 0
+    elif min_rate == max_rate or probe(max_rate):
+        capacity = max_rate
+    else:
+        low, high = min_rate, max_rate
+        while high - low > low * tolerance:
+            rate = (low + high) / 2
+            if probe(rate):
+                low = rate
+            else:
+                high = rate
+        capacity = low
+
+    return {
+        'capacity': capacity,
+        'target_p99': target_p99,
+        'max_error_rate': max_error_rate,
+        'curve': sorted(curve, key=lambda metrics: metrics['rate'])
+    }
@@ -0,0 +1,319 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import http.client
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from httprunner import exceptions, logger, utils
+
+# cassette file layout:
+#   MAGIC
+#   record: meta length (uint32) + meta json + response body
+#   ...
+#   index json: {request key: [[record offset, meta length, body length], ...]}
+#   footer: index offset (uint64) + index length (uint64) + MAGIC
+MAGIC = b'HRCASSETTE1\n'
+RECORD_HEADER = struct.Struct('<I')
+FOOTER = struct.Struct('<QQ')
+
+
+def normalize_url(url):
+    '''
+    sort query parameters, so that the same request matches in any order.
+    '''
+
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class ReplayBody(io.BytesIO):
+    '''
+    raw body of replayed response. recorded Set-Cookie headers are exposed as
+    original response, so that requests.Session extracts cookies into its
+    jar as from a real response.
+    '''
+
+    class _OriginalResponse:
+        def __init__(self, msg):
+            self.msg = msg
+
+    def __init__(self, body, set_cookies):
+        super().__init__(body)
+        msg = http.client.HTTPMessage()
+        for set_cookie in set_cookies:
+            msg['Set-Cookie'] = set_cookie
+        self._original_response = self._OriginalResponse(msg)
+
+
+class Cassette:
+    '''
+    compact indexed on-disk cassette of request/response pairs.
+    in record mode, request/response of each teststep is appended to cassette
+    file; in replay mode, the cassette file is memory mapped and responses
+    are served from it without any network. cassette can be shared by
+    sessions of concurrent runners.
+    Args:
+        path (str): cassette file path
+        mode (enum): 'record' or 'replay'
+        match_headers (list): request header names matched besides method and url
+        match_body_fields (list): json body fields matched, dotted path supported
+            e.g. ['sign', 'user.name']
+    Examples:
+        >>> with Cassette('smoketest.cassette', 'record') as cassette:
+        ...     runner.run_testcase(testcase, client.HttpSession(cassette=cassette))
+        >>> with Cassette('smoketest.cassette', 'replay') as cassette:
+        ...     runner.run_testcase(testcase, client.HttpSession(cassette=cassette))
+    '''
+
+    def __init__(self,
+                 path,
+                 mode='replay',
+                 match_headers=None,
+                 match_body_fields=None):
+        if mode not in ['record', 'replay']:
+            raise exceptions.ParamError(f'invalid cassette mode: {mode}')
+
+        self.path = path
+        self.mode = mode
+        self.match_headers = match_headers or []
+        self.match_body_fields = [
+            utils.compile_content_path(field)
+            for field in match_body_fields or []
+        ]
+        self.index = {}
+        self.play_counts = {}
+        # records are appended and replayed by concurrent runners
+        self.lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+
+        if mode == 'record':
+            self._file = open(path, 'wb')
+            self._file.write(MAGIC)
+        else:
+            self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            raise exceptions.FileNotFound(f'cassette not found: {self.path}')
+
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file can not be mapped
+            self._mmap = b''
+
+        footer_offset = len(self._mmap) - FOOTER.size - len(MAGIC)
+        if footer_offset < len(MAGIC) \
+                or self._mmap[:len(MAGIC)] != MAGIC \
+                or self._mmap[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise exceptions.FileFormatError(
+                f'cassette format error: {self.path}')
+
+        index_offset, index_length = FOOTER.unpack_from(
+            self._mmap, footer_offset)
+        self.index = json.loads(
+            self._mmap[index_offset:index_offset + index_length].decode(
+                'utf-8'))
+        logger.log_debug(
+            f'cassette loaded: {self.path}, {len(self.index)} requests')
+
+    def close(self):
+        '''
+        write index in record mode, and release file.
+        '''
+
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self._file is None:
+            return
+
+        if self.mode == 'record':
+            index_bytes = json.dumps(self.index).encode('utf-8')
+            index_offset = self._file.tell()
+            self._file.write(index_bytes)
+            self._file.write(FOOTER.pack(index_offset, len(index_bytes)))
+            self._file.write(MAGIC)
+        elif isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+        self._file.close()
+        self._file = None
+        self._mmap = None
+
+    def get_request_key(self, request):
+        '''
+        get matching key of request with matching rules.
+        Args:
+            request (requests.PreparedRequest): request to be matched
+        Returns:
+            str: request key
+        '''
+
+        key = [request.method.upper(), normalize_url(request.url)]
+
+        for header_name in self.match_headers:
+            key.append(request.headers.get(header_name))
+
+        if self.match_body_fields:
+            body = request.body or b''
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            try:
+                body = json.loads(body.decode('utf-8'))
+            except ValueError:
+                body = None
+
+            for content_path in self.match_body_fields:
+                try:
+                    key.append(utils.query_content(body, content_path))
+                except (KeyError, IndexError, TypeError):
+                    key.append(None)
+
+        return json.dumps(key, sort_keys=True, default=str)
+
+    def record(self, request, resp):
+        '''
+        append request/response pair to cassette file.
+        Args:
+            request (requests.PreparedRequest): sent request
+            resp (requests.Response): received response, body is read fully.
+        '''
+
+        body = resp.content or b''
+        original_response = getattr(resp.raw, '_original_response', None)
+        set_cookies = original_response.msg.get_all('Set-Cookie') \
+            if original_response is not None else None
+        meta = {
+            'status_code': resp.status_code,
+            'reason': resp.reason,
+            'url': resp.url,
+            'headers': dict(resp.headers),
+            'cookies': resp.cookies.get_dict(),
+            'set_cookies': set_cookies or []
+        }
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        key = self.get_request_key(request)
+
+        with self.lock:
+            offset = self._file.tell()
+            self._file.write(RECORD_HEADER.pack(len(meta_bytes)))
+            self._file.write(meta_bytes)
+            self._file.write(body)
+            self.index.setdefault(key, []).append(
+                [offset, len(meta_bytes), len(body)])
+
+    def play(self, request):
+        '''
+        build response of request from cassette, identical requests are
+        replayed in recorded order.
+        Args:
+            request (requests.PreparedRequest): request to be replayed
+        Returns:
+            requests.Response: replayed response
+        Raises:
+            exceptions.RecordNotFound: request is not recorded.
+        '''
+
+        key = self.get_request_key(request)
+        records = self.index.get(key)
+        if not records:
+            err_msg = f'request not recorded in cassette: {key}'
+            logger.log_error(err_msg)
+            raise exceptions.RecordNotFound(err_msg)
+
+        with self.lock:
+            play_count = self.play_counts.get(key, 0)
+            self.play_counts[key] = play_count + 1
+        offset, meta_length, body_length = records[play_count % len(records)]
+
+        meta_offset = offset + RECORD_HEADER.size
+        body_offset = meta_offset + meta_length
+        meta = json.loads(
+            self._mmap[meta_offset:body_offset].decode('utf-8'))
+
+        resp = requests.Response()
+        resp.status_code = meta['status_code']
+        resp.reason = meta['reason']
+        resp.url = meta['url']
+        resp.headers = CaseInsensitiveDict(meta['headers'])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.cookies = requests.cookies.cookiejar_from_dict(meta['cookies'])
+        # cassette recorded without Set-Cookie headers sets name=value only
+        set_cookies = meta.get('set_cookies')
+        if set_cookies is None:
+            set_cookies = [
+                f'{name}={value}' for name, value in meta['cookies'].items()
+            ]
+        resp.raw = ReplayBody(
+            self._mmap[body_offset:body_offset + body_length], set_cookies)
+        resp.request = request
+        return resp
+
+
+class RecordAdapter(HTTPAdapter):
+    '''
+    transport adapter which sends request and records it into cassette.
+    '''
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, **kwargs):
+        resp = super().send(request, stream=stream, **kwargs)
+        self.cassette.record(request, resp)
+        return resp
+
+
+class ReplayAdapter(BaseAdapter):
+    '''
+    transport adapter which serves response from cassette without network.
+    '''
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, stream=False, **kwargs):
+        resp = self.cassette.play(request)
+        if not stream:
+            resp.content
+        return resp
+
+    def close(self):
+        pass
+
+
+def get_adapter(cassette):
+    '''
+    get transport adapter of cassette mode.
+    '''
+
+    if cassette.mode == 'record':
+        return RecordAdapter(cassette)
+    else:
+        return ReplayAdapter(cassette)
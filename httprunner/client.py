@@ -0,0 +1,696 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import copy
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from httprunner import exceptions, logger, scheduler, stats
+
+DISCARD_CHUNK_SIZE = 64 * 1024
+
+
+def build_url(base_url, path):
+    '''
+    prepend url with base_url unless it's already an absolute URL.
+    Examples:
+        >>> build_url('http://127.0.0.1:5000', '/api/users')
+            'http://127.0.0.1:5000/api/users'
+        >>> build_url('http://127.0.0.1:5000', 'http://127.0.0.1:3458/headers')
+            'http://127.0.0.1:3458/headers'
+    '''
+
+    if path.startswith(('http://', 'https://')) or not base_url:
+        return path
+
+    return f"{base_url.rstrip('/')}/{path.lstrip('/')}"
+
+
+def discard_body(resp):
+    '''
+    read and drop response body chunk by chunk without decoding or buffering,
+    so the connection can be reused. response is marked body_discarded, and
+    its body is taken as empty by response.ResponseObject.
+    '''
+
+    raw = resp.raw
+    try:
+        while raw.read(DISCARD_CHUNK_SIZE, decode_content=False):
+            pass
+    except TypeError:
+        # raw is not urllib3 response
+        while raw.read(DISCARD_CHUNK_SIZE):
+            pass
+
+    resp.body_discarded = True
+
+    release_conn = getattr(raw, 'release_conn', None)
+    if release_conn is not None:
+        release_conn()
+
+
+class _Flight:
+    '''
+    in-flight upstream request shared by identical concurrent requests.
+    '''
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.resp = None
+        self.error = None
+
+
+class RequestCoalescer:
+    '''
+    single-flight layer for idempotent GET requests. concurrent identical
+    requests share one upstream response, and with cache_ttl, successful
+    responses are reused until they expire. requests are identical only if
+    their effective headers, cookies and auth are the same, so that
+    responses are never shared between users.
+    Args:
+        cache_ttl (float): seconds responses are cached, 0 disables cache.
+        max_cache_size (int): max responses cached, expired responses are
+            evicted first, then the oldest ones.
+    Examples:
+        >>> coalescer = RequestCoalescer(cache_ttl=0.5)
+        >>> session = HttpSession('http://127.0.0.1:5000', coalescer=coalescer)
+        >>> coalescer.get_report()
+            {
+                'get users': {
+                    'requests': 100,
+                    'upstream': 4,
+                    'coalesced': 90,
+                    'cached': 6,
+                    'hit_rate': 0.96
+                }
+            }
+    '''
+
+    def __init__(self, cache_ttl=0, max_cache_size=1024):
+        self.cache_ttl = cache_ttl
+        self.max_cache_size = max_cache_size
+        self.lock = threading.Lock()
+        self.flights = {}
+        # key => (expire time, response), in insertion order
+        self.cache = OrderedDict()
+        self.endpoints_counts = {}
+
+    @staticmethod
+    def get_request_key(method, url, kwargs, session=None, skip_body=False):
+        '''
+        get key of request, None if request can not be coalesced.
+        only GET requests without body and streaming are coalesced.
+        headers, cookies and auth of session are merged with those of
+        request, as requests.Session does. skip_body requests are keyed
+        apart, they share status and headers with body discarded.
+        '''
+
+        if method.upper() != 'GET' or kwargs.get('stream'):
+            return None
+
+        for arg in ['data', 'json', 'files']:
+            if kwargs.get(arg):
+                return None
+
+        headers = {}
+        cookies = {}
+        auth = kwargs.get('auth')
+        if session is not None:
+            headers.update(session.headers)
+            cookies.update(session.cookies.get_dict())
+            auth = auth or session.auth
+
+        headers.update(kwargs.get('headers') or {})
+        request_cookies = kwargs.get('cookies') or {}
+        if not isinstance(request_cookies, dict):
+            request_cookies = requests.utils.dict_from_cookiejar(
+                request_cookies)
+        cookies.update(request_cookies)
+
+        return json.dumps([
+            url,
+            kwargs.get('params'),
+            {str(name).lower(): value
+             for name, value in headers.items()}, cookies, auth, skip_body
+        ], sort_keys=True, default=str)
+
+    def _cache_response(self, key, resp):
+        now = time.perf_counter()
+        for cached_key, (expire_at, _) in list(self.cache.items()):
+            if expire_at <= now:
+                del self.cache[cached_key]
+
+        self.cache.pop(key, None)
+        while self.cache and len(self.cache) >= self.max_cache_size:
+            self.cache.popitem(last=False)
+
+        self.cache[key] = (now + self.cache_ttl, resp)
+
+    def _count(self, name, kind):
+        counts = self.endpoints_counts.setdefault(name, {
+            'requests': 0,
+            'upstream': 0,
+            'coalesced': 0,
+            'cached': 0
+        })
+        counts['requests'] += 1
+        counts[kind] += 1
+
+    def request(self, key, name, send_request):
+        '''
+        get response of request, from cache or in-flight identical request
+        if any, otherwise send it upstream.
+        Args:
+            key (str): request key
+            name (str): endpoint name, counts are reported by it.
+            send_request (callable): send request upstream and return response.
+        Returns:
+            requests.Response: response copy owned by caller.
+        '''
+
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None and cached[0] > time.perf_counter():
+                self._count(name, 'cached')
+                return copy.copy(cached[1])
+
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = _Flight()
+                is_leader = True
+                self._count(name, 'upstream')
+            else:
+                is_leader = False
+                self._count(name, 'coalesced')
+
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.copy(flight.resp)
+
+        try:
+            flight.resp = send_request()
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                if self.cache_ttl > 0 and flight.resp is not None \
+                        and flight.resp.ok:
+                    self._cache_response(key, flight.resp)
+            flight.event.set()
+
+        return copy.copy(flight.resp)
+
+    def get_report(self):
+        '''
+        get coalescing counts and hit rate of each endpoint.
+        '''
+
+        with self.lock:
+            report = {}
+            for name, counts in self.endpoints_counts.items():
+                hits = counts['coalesced'] + counts['cached']
+                report[name] = dict(
+                    counts, hit_rate=round(hits / counts['requests'], 4))
+            return report
+
+
+class RequestHedger:
+    '''
+    hedging policy for idempotent requests to cut tail latency. if no
+    response arrives within observed percentile latency of the endpoint,
+    a duplicate request is sent and whichever returns first is used.
+    endpoints are not hedged until enough latency samples are observed.
+    each attempt runs on its own thread, so that attempts never queue
+    behind each other, and on its own session borrowed from hedger, with
+    headers, cookies and adapters of caller session, so that caller session
+    is never used by two threads. cookies set by winning response are
+    merged back into caller session.
+    Args:
+        percentile (float): percentile of observed latency to hedge after
+        min_samples (int): samples needed before endpoint is hedged
+    Examples:
+        >>> hedger = RequestHedger(percentile=95)
+        >>> session = HttpSession('http://127.0.0.1:5000', hedger=hedger)
+        >>> session.request('GET', '/api/users/1000', name='get user', hedge=True)
+        >>> hedger.get_report()
+            {
+                'get user': {
+                    'requests': 100,
+                    'hedged': 6,
+                    'hedge_wins': 4,
+                    'hedge_delay': 12.3
+                }
+            }
+    '''
+
+    # session attributes copied into attempt sessions
+    SESSION_ATTRIBUTES = [
+        'headers', 'auth', 'proxies', 'params', 'verify', 'cert', 'trust_env',
+        'max_redirects'
+    ]
+
+    def __init__(self, percentile=95, min_samples=20):
+        if not 0 < percentile < 100:
+            raise exceptions.ParamError(f'invalid percentile: {percentile}')
+
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.endpoints_histograms = {}
+        self.endpoints_counts = {}
+        # idle attempt sessions
+        self.sessions = []
+
+    @staticmethod
+    def is_hedgeable(method, kwargs):
+        '''
+        only idempotent requests without streaming are hedged.
+        '''
+
+        return method.upper() in scheduler.IDEMPOTENT_METHODS \
+            and not kwargs.get('stream')
+
+    def get_hedge_delay(self, name):
+        '''
+        get seconds to wait before sending duplicate request, None if there
+        are not enough samples of endpoint.
+        '''
+
+        with self.lock:
+            histogram = self.endpoints_histograms.get(name)
+            if histogram is None or histogram.total_count < self.min_samples:
+                return None
+
+            return histogram.get_value_at_percentile(self.percentile) / 1000000
+
+    def _borrow_session(self, session):
+        with self.lock:
+            attempt_session = self.sessions.pop() if self.sessions else None
+
+        if attempt_session is None:
+            attempt_session = requests.Session()
+
+        for attribute in self.SESSION_ATTRIBUTES:
+            setattr(attempt_session, attribute,
+                    copy.copy(getattr(session, attribute)))
+        attempt_session.cookies = session.cookies.copy()
+        # connection pools and cassette adapters are shared with caller
+        attempt_session.adapters = session.adapters
+        return attempt_session
+
+    def _release_session(self, attempt_session):
+        with self.lock:
+            self.sessions.append(attempt_session)
+
+    def _send(self, name, attempt_session, send_request, rate_limiters):
+        for _, rate_limiter in rate_limiters or []:
+            rate_limiter.acquire()
+
+        start_at = time.perf_counter()
+        resp = send_request(attempt_session)
+        elapsed = time.perf_counter() - start_at
+        with self.lock:
+            histogram = self.endpoints_histograms.get(name)
+            if histogram is None:
+                histogram = stats.LatencyHistogram()
+                self.endpoints_histograms[name] = histogram
+            histogram.record(round(elapsed * 1000000))
+
+        return resp
+
+    def _start_attempt(self, name, session, send_request, rate_limiters=None):
+        attempt_session = self._borrow_session(session)
+        future = concurrent.futures.Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(
+                    self._send(name, attempt_session, send_request,
+                               rate_limiters))
+            except BaseException as err:
+                future.set_exception(err)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future, attempt_session
+
+    def _finish_attempt(self, attempt_session, is_winner, future):
+        if not is_winner and future.exception() is None:
+            future.result().close()
+        self._release_session(attempt_session)
+
+    def request(self, name, session, send_request, rate_limiters=None):
+        '''
+        send request, and duplicate it if it is slower than hedge delay.
+        Args:
+            name (str): endpoint name, latency and counts are kept by it.
+            session (requests.Session): caller session, attempts are sent
+                by sessions copied from it.
+            send_request (callable): send request upstream by session given
+                as argument, and return response.
+            rate_limiters (list): (name, TokenBucket) tuples, a token of each
+                is acquired before sending duplicate. token of original
+                request is taken by caller.
+        Returns:
+            requests.Response: first successful response, response of
+                original request if both fail.
+        '''
+
+        delay = self.get_hedge_delay(name)
+        attempts = [self._start_attempt(name, session, send_request)]
+        primary = attempts[0][0]
+
+        if delay is not None:
+            try:
+                primary.result(timeout=delay)
+            except concurrent.futures.TimeoutError:
+                attempts.append(
+                    self._start_attempt(name, session, send_request,
+                                        rate_limiters))
+            except Exception:
+                pass
+
+        winner = primary
+        futures = [future for future, _ in attempts]
+        pending = set(futures)
+        while len(futures) > 1 and pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            succeeded = [
+                future for future in futures
+                if future in done and future.exception() is None
+            ]
+            if succeeded:
+                winner = succeeded[0]
+                break
+
+        if not winner.done():
+            # both attempts failed
+            concurrent.futures.wait([winner])
+
+        for future, attempt_session in attempts:
+            if future is winner:
+                if future.exception() is None:
+                    session.cookies.update(attempt_session.cookies)
+                self._finish_attempt(attempt_session, True, future)
+            else:
+                # losing response is closed once it arrives
+                future.add_done_callback(
+                    functools.partial(self._finish_attempt, attempt_session,
+                                      False))
+
+        with self.lock:
+            counts = self.endpoints_counts.setdefault(name, {
+                'requests': 0,
+                'hedged': 0,
+                'hedge_wins': 0
+            })
+            counts['requests'] += 1
+            if len(attempts) > 1:
+                counts['hedged'] += 1
+                if winner is not primary:
+                    counts['hedge_wins'] += 1
+
+        return winner.result()
+
+    def get_report(self):
+        '''
+        get duplicate counts, hedge wins and current hedge delay in
+        milliseconds of each endpoint.
+        '''
+
+        report = {}
+        for name in list(self.endpoints_counts):
+            delay = self.get_hedge_delay(name)
+            with self.lock:
+                report[name] = dict(
+                    self.endpoints_counts[name],
+                    hedge_delay=round(delay * 1000, 3)
+                    if delay is not None else None)
+
+        return report
+
+    def close(self):
+        '''
+        drop idle attempt sessions, their adapters belong to caller sessions.
+        '''
+
+        with self.lock:
+            self.sessions = []
+
+
+class TokenBucket:
+    '''
+    token bucket rate limiter, safe to be shared by threads. each caller
+    reserves a token at once, letting tokens go negative, and sleeps until
+    its reserved token is refilled, so waiting never spins and callers are
+    served in reservation order.
+    Args:
+        rate (float): tokens refilled per second
+        burst (int): bucket capacity, requests allowed at once when idle
+    '''
+
+    def __init__(self, rate, burst=1):
+        if not rate or rate <= 0 or burst < 1:
+            raise exceptions.ParamError(
+                f'invalid rate limit: rate {rate}, burst {burst}')
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        '''
+        reserve one token.
+        Returns:
+            float: seconds to wait before reserved token is available.
+        '''
+
+        with self.lock:
+            now = time.perf_counter()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return max(-self.tokens / self.rate, 0)
+
+    def tighten(self, rate, burst=1):
+        '''
+        lower rate and burst of bucket to the given ones if they are lower,
+        tokens refilled so far are kept.
+        Returns:
+            bool: True if rate or burst is lowered.
+        '''
+
+        if not rate or rate <= 0 or burst < 1:
+            raise exceptions.ParamError(
+                f'invalid rate limit: rate {rate}, burst {burst}')
+
+        with self.lock:
+            if rate >= self.rate and burst >= self.burst:
+                return False
+
+            now = time.perf_counter()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.rate = min(self.rate, rate)
+            self.burst = min(self.burst, burst)
+            self.tokens = min(self.tokens, self.burst)
+            return True
+
+    def acquire(self):
+        '''
+        wait until one token is available.
+        Returns:
+            float: seconds waited.
+        '''
+
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+
+def parse_rate_limit(rate_limit):
+    '''
+    parse rate limit config, in requests per second.
+    Examples:
+        >>> parse_rate_limit(10)
+            (10, 1)
+        >>> parse_rate_limit({'rate': 10, 'burst': 5})
+            (10, 5)
+    '''
+
+    if isinstance(rate_limit, dict):
+        return rate_limit.get('rate'), rate_limit.get('burst', 1)
+
+    return rate_limit, 1
+
+
+class RateLimiters:
+    '''
+    rate limiters of one run by limiter name, may be shared by sessions of
+    concurrent virtual users. limiters live as long as the registry, so
+    limits of one run never leak into the next one, e.g. in daemon or watch
+    mode.
+    Examples:
+        >>> rate_limiters = RateLimiters()
+        >>> session = HttpSession('http://127.0.0.1:5000',
+        ...                       rate_limiters=rate_limiters)
+    '''
+
+    def __init__(self):
+        self.mapping = {}
+        self.lock = threading.Lock()
+
+    def get(self, name, rate, burst=1):
+        '''
+        get rate limiter by name, created on first use. there is only one
+        bucket for each name: if testcases of run configure different limits
+        of the same name, the lowest rate and burst win, whatever order they
+        are run in.
+        Returns:
+            TokenBucket: rate limiter
+        '''
+
+        with self.lock:
+            rate_limiter = self.mapping.get(name)
+            if rate_limiter is None:
+                rate_limiter = TokenBucket(rate, burst)
+                self.mapping[name] = rate_limiter
+            elif (rate_limiter.rate, rate_limiter.burst) != (rate, burst) \
+                    and rate_limiter.tighten(rate, burst):
+                logger.log_warning(
+                    f'conflicting rate limits of {name}, lowered to rate '
+                    f'{rate_limiter.rate}, burst {rate_limiter.burst}')
+
+            return rate_limiter
+
+
+class HttpSession(requests.Session):
+    '''
+    requests.Session with base_url, and records elapsed time of requests.
+    Args:
+        base_url (str): base url prepended to relative url of each request.
+        cassette (cassette.Cassette): record requests into cassette, or replay
+            responses from cassette without network, by cassette mode.
+        coalescer (RequestCoalescer): share responses of identical GET
+            requests, may be shared by sessions of concurrent virtual users.
+        hedger (RequestHedger): duplicate slow idempotent requests opted in
+            by hedge, may be shared by sessions of concurrent virtual users.
+        rate_limiters (RateLimiters): rate limiters requests wait on, session
+            has its own ones if not specified.
+    '''
+
+    def __init__(self,
+                 base_url=None,
+                 cassette=None,
+                 coalescer=None,
+                 hedger=None,
+                 rate_limiters=None):
+        super().__init__()
+        self.base_url = base_url or ''
+        self.cassette = cassette
+        self.coalescer = coalescer
+        self.hedger = hedger
+        self.rate_limiters = rate_limiters or RateLimiters()
+
+        if cassette is not None:
+            from httprunner.cassette import get_adapter
+            adapter = get_adapter(cassette)
+            self.mount('http://', adapter)
+            self.mount('https://', adapter)
+
+    def request(self,
+                method,
+                url,
+                name=None,
+                skip_body=False,
+                rate_limiters=None,
+                hedge=False,
+                **kwargs):
+        '''
+        send request and return response.
+        Args:
+            method (str): HTTP method
+            url (str): relative url or absolute url
+            name (str): request name, default is url
+            skip_body (bool): discard response body without buffering, for
+                requests whose validators and extractors never touch content,
+                response is marked body_discarded.
+            rate_limiters (list): (name, TokenBucket) tuples, a token of each
+                is acquired before sending request.
+            hedge (bool): hedge request by hedger of session, if request is
+                idempotent.
+            kwargs: other arguments of requests.Session.request
+        Returns:
+            requests.Response: response, with elapsed_seconds measured from
+                sending request until response is ready to be validated,
+                started_at of time.perf_counter() when request is sent, and
+                rate_limit_waits of seconds waited on each rate limiter, not
+                included in elapsed_seconds.
+        '''
+
+        url = build_url(self.base_url, url)
+        # checked before skip_body forces streaming: body of skip_body
+        # request is never read, and losing response is closed by hedger.
+        hedge = hedge and self.hedger is not None \
+            and self.hedger.is_hedgeable(method, kwargs)
+        # keyed by request of caller, streaming is forced by skip_body only
+        key = None
+        if self.coalescer is not None:
+            key = self.coalescer.get_request_key(method, url, kwargs, self,
+                                                 skip_body)
+        if skip_body:
+            kwargs['stream'] = True
+
+        rate_limit_waits = [(limiter_name, rate_limiter.acquire())
+                            for limiter_name, rate_limiter in rate_limiters
+                            or []]
+
+        logger.log_debug(f'{method} {name or url}')
+        start_at = time.perf_counter()
+
+        def send_upstream():
+            return super(HttpSession, self).request(method, url, **kwargs)
+
+        if hedge:
+
+            def send_upstream():
+                # every attempt takes its own rate limiter tokens
+                return self.hedger.request(
+                    name or url, self, lambda attempt_session:
+                    attempt_session.request(method, url, **kwargs),
+                    rate_limiters)
+
+        def send_request():
+            resp = send_upstream()
+            if skip_body:
+                # discarded before coalesced requests share the response
+                discard_body(resp)
+            return resp
+
+        if key is None:
+            resp = send_request()
+        else:
+            resp = self.coalescer.request(key, name or url, send_request)
+
+        resp.elapsed_seconds = time.perf_counter() - start_at
+        resp.started_at = start_at
+        resp.rate_limit_waits = rate_limit_waits
+
+        return resp
@@ -0,0 +1,341 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import importlib
+import os
+import socket
+import stat
+import sys
+import time
+
+from httprunner import daemon_client, exceptions, loader, logger, pool, stats
+
+MESSAGE_REQUEST = daemon_client.MESSAGE_REQUEST
+MESSAGE_RESPONSE = daemon_client.MESSAGE_RESPONSE
+# client lives in daemon_client, which imports stdlib modules only
+send_request = daemon_client.send_request
+
+
+class RunnerDaemon:
+    '''
+    long-lived runner holding loaded project and testcases, serving run
+    requests over unix socket. before each run, only parts of project
+    changed on disk are reloaded: confcustom.py, .env, api folder, suite
+    folder, or testcase files.
+    Args:
+        project_path (str): project path, located as load_project_tests does
+        socket_path (str): unix socket path
+    Examples:
+        >>> RunnerDaemon('tests', '/tmp/httprunner.sock').serve_forever()
+        >>> daemon_client.send_request('/tmp/httprunner.sock', {
+                'command': 'run',
+                'paths': ['tests/testcases/smoketest.yml']
+            })
+    '''
+
+    def __init__(self, project_path, socket_path):
+        self.project_path = os.path.abspath(project_path)
+        self.socket_path = socket_path
+        self.server_socket = None
+        self.running = False
+        # file path => (mtime, testcase or None, FileFormatError or None)
+        self.testcases_mapping = {}
+        self.load_project()
+
+    ###########################################################################
+    #   project reloading
+    ###########################################################################
+
+    def get_project_files(self):
+        '''
+        get mtime of each project file, grouped by project part.
+        Returns:
+            dict: {part: {file path: mtime}}, part is one of
+                'confcustom', 'env', 'api', 'suite'
+        '''
+
+        project_working_directory = loader.project_working_directory
+        parts_files = {
+            'confcustom':
+            [os.path.join(project_working_directory, 'confcustom.py')],
+            'env': [os.path.join(project_working_directory, '.env')],
+            'api':
+            loader.load_folder_files(
+                os.path.join(project_working_directory, 'api')),
+            'suite':
+            loader.load_folder_files(
+                os.path.join(project_working_directory, 'suite'))
+        }
+
+        project_files = {}
+        for part, files in parts_files.items():
+            project_files[part] = {
+                file_path: os.stat(file_path).st_mtime_ns
+                for file_path in files if os.path.isfile(file_path)
+            }
+
+        return project_files
+
+    def load_project(self):
+        loader.load_project_tests(self.project_path)
+        self.project_files = self.get_project_files()
+        self.testcases_mapping.clear()
+
+    def reload_confcustom(self):
+        project_mapping = loader.project_mapping
+        project_mapping['confcustom'] = {'variables': {}, 'functions': {}}
+        loader.load_builtin_module()
+
+        if 'confcustom' in sys.modules:
+            importlib.reload(sys.modules['confcustom'])
+        if os.path.isfile(
+                os.path.join(loader.project_working_directory,
+                             'confcustom.py')):
+            loader.load_confcustom_module()
+
+    def reload_changed(self):
+        '''
+        reload project parts changed on disk since last load.
+        Returns:
+            list: reloaded parts, e.g. ['confcustom', 'api']
+        '''
+
+        project_files = self.get_project_files()
+        changed_parts = [
+            part for part in project_files
+            if project_files[part] != self.project_files.get(part)
+        ]
+
+        project_working_directory = loader.project_working_directory
+        for part in changed_parts:
+            logger.log_info(f'reload changed project part: {part}')
+            if part in ['api', 'suite']:
+                # testcases are expanded with api and suite definitions
+                self.testcases_mapping.clear()
+
+            if part == 'confcustom':
+                self.reload_confcustom()
+            elif part == 'env':
+                loader.project_mapping['env'] = {}
+                loader.load_env_file()
+            elif part == 'api':
+                loader.load_api_folder(
+                    os.path.join(project_working_directory, 'api'))
+            elif part == 'suite':
+                loader.load_test_folder(
+                    os.path.join(project_working_directory, 'suite'))
+
+            # part failed to reload is reloaded again on next request
+            self.project_files[part] = project_files[part]
+
+        return changed_parts
+
+    def load_testcases(self, paths, cwd=None):
+        '''
+        load testcases of files or folders, reusing loaded testcases of
+        files not changed on disk. files in folders which are not testcase
+        files are skipped, while files named in paths must be testcases.
+        Args:
+            paths (list): testcase file or folder paths
+            cwd (str): directory relative paths are resolved against, cwd of
+                daemon if not specified.
+        Returns:
+            tuple: (testcases list, reloaded testcase files list)
+        Raises:
+            exceptions.FileNotFound: path not exists.
+            exceptions.FileFormatError: file named in paths is not testcase.
+        '''
+
+        files = []
+        for path in paths:
+            path = os.path.abspath(os.path.join(cwd, path) if cwd else path)
+            if os.path.isdir(path):
+                files.extend((file_path, False) for file_path in sorted(
+                    loader.load_folder_files(path)))
+            elif os.path.isfile(path):
+                files.append((path, True))
+            else:
+                err_msg = f'path not exists: {path}'
+                logger.log_error(err_msg)
+                raise exceptions.FileNotFound(err_msg)
+
+        testcases = []
+        reloaded_files = []
+        for file_path, is_named in files:
+            mtime = os.stat(file_path).st_mtime_ns
+            loaded = self.testcases_mapping.get(file_path)
+            if loaded is None or loaded[0] != mtime:
+                try:
+                    testcase, error = loader._load_test_file(file_path), None
+                except exceptions.FileFormatError as err:
+                    testcase, error = None, err
+                loaded = self.testcases_mapping[file_path] = (mtime, testcase,
+                                                              error)
+                reloaded_files.append(file_path)
+
+            if loaded[2] is not None and is_named:
+                err_msg = f'invalid testcase file: {file_path}, {loaded[2]}'
+                logger.log_error(err_msg)
+                raise exceptions.FileFormatError(err_msg)
+
+            if loaded[1] and loaded[1]['teststeps']:
+                testcases.append(loaded[1])
+
+        return testcases, reloaded_files
+
+    ###########################################################################
+    #   requests serving
+    ###########################################################################
+
+    def run(self, paths, iterations=1, cwd=None):
+        '''
+        reload changed parts and run testcases of paths.
+        Args:
+            paths (list): testcase file or folder paths
+            iterations (int): times each testcase is run
+            cwd (str): directory relative paths are resolved against
+        Returns:
+            dict: run report
+                {
+                    'reloaded': ['api'],
+                    'reloaded_testcases': ['/path/to/smoketest.yml'],
+                    'total': 1,
+                    'successes': 1,
+                    'failures': 0,
+                    'errors': [],
+                    'stats': {},
+                    'duration': 0.05
+                }
+        '''
+
+        start_at = time.perf_counter()
+        reloaded = self.reload_changed()
+        testcases, reloaded_files = self.load_testcases(paths, cwd)
+
+        latency_stats = stats.LatencyStats()
+        pool_runner = pool.ThreadPoolRunner(1, latency_stats)
+        try:
+            result = pool_runner.run(testcases, iterations)
+        finally:
+            pool_runner.close()
+
+        result.update({
+            'reloaded': reloaded,
+            'reloaded_testcases': reloaded_files,
+            'stats': latency_stats.get_report(),
+            'duration': time.perf_counter() - start_at
+        })
+        return result
+
+    def handle_request(self, request):
+        '''
+        handle request from client. any error of request is returned to
+        client, and never stops daemon.
+        Args:
+            request (dict): request, command is one of 'run', 'reload',
+                'ping', 'shutdown'. relative paths are resolved against cwd.
+                {
+                    'command': 'run',
+                    'paths': ['smoketest.yml'],
+                    'iterations': 1,
+                    'cwd': '/path/to/client/cwd'
+                }
+        Returns:
+            dict: response, with 'error' if request failed.
+        '''
+
+        try:
+            command = request.get('command')
+            if command == 'run':
+                return self.run(request['paths'], request.get('iterations', 1),
+                                request.get('cwd'))
+            elif command == 'reload':
+                self.load_project()
+                return {'reloaded': ['project']}
+            elif command == 'ping':
+                return {'pong': True}
+            elif command == 'shutdown':
+                self.running = False
+                return {'shutdown': True}
+            else:
+                raise exceptions.ParamError(f'invalid command: {command}')
+        except Exception as err:
+            logger.log_error(f'request failed: {err!r}')
+            return {'error': repr(err)}
+
+    def handle_payload(self, message_type, payload):
+        '''
+        decode request frame and handle it.
+        Returns:
+            dict: response
+        '''
+
+        if message_type != MESSAGE_REQUEST:
+            return {'error': f'unexpected message type: {message_type}'}
+
+        try:
+            request = daemon_client.load_json(payload)
+        except Exception as err:
+            logger.log_error(f'invalid request payload: {err!r}')
+            return {'error': f'invalid request payload: {err!r}'}
+
+        if not isinstance(request, dict):
+            return {'error': f'invalid request: {request!r}'}
+
+        return self.handle_request(request)
+
+    def listen(self):
+        '''
+        bind unix socket accessible by current user only, removing stale
+        socket file of previous daemon.
+        Raises:
+            exceptions.ParamError: socket path exists and is not socket.
+        '''
+
+        if os.path.lexists(self.socket_path):
+            if not stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+                err_msg = f'socket path exists and is not socket: ' \
+                    f'{self.socket_path}'
+                logger.log_error(err_msg)
+                raise exceptions.ParamError(err_msg)
+
+            # stale socket file of previous daemon
+            os.remove(self.socket_path)
+
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.server_socket.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.server_socket.listen()
+        logger.log_info(f'runner daemon listening on {self.socket_path}')
+
+    def serve_forever(self):
+        '''
+        serve requests one by one until shutdown command is received.
+        '''
+
+        if self.server_socket is None:
+            self.listen()
+
+        self.running = True
+        try:
+            while self.running:
+                sock, _ = self.server_socket.accept()
+                with sock:
+                    try:
+                        message_type, payload = daemon_client.recv_frame(
+                            sock)
+                    except exceptions.WorkerError:
+                        continue
+
+                    response = self.handle_payload(message_type, payload)
+                    daemon_client.send_frame(
+                        sock, MESSAGE_RESPONSE,
+                        daemon_client.dump_json(response))
+        finally:
+            self.server_socket.close()
+            self.server_socket = None
+            os.remove(self.socket_path)
+
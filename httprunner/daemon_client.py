@@ -0,0 +1,80 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# thin client of runner daemon, imported by editor and git hooks without
+# loading httprunner runtime, so only stdlib modules are imported here.
+
+import json
+import os
+import socket
+import struct
+import zlib
+
+from httprunner import exceptions
+
+# frame: message type (uint8) + payload length (uint32) + payload, same as
+# frames between coordinator and workers
+FRAME_HEADER = struct.Struct('<BI')
+MESSAGE_REQUEST = 1
+MESSAGE_RESPONSE = 2
+
+
+def send_frame(sock, message_type, payload):
+    sock.sendall(FRAME_HEADER.pack(message_type, len(payload)) + payload)
+
+
+def recv_frame(sock):
+    '''
+    receive one frame from socket.
+    Returns:
+        tuple: (message type, payload)
+    Raises:
+        exceptions.WorkerError: connection is closed before frame received.
+    '''
+
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    message_type, length = FRAME_HEADER.unpack(header)
+    return message_type, _recv_exact(sock, length)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise exceptions.WorkerError('connection closed unexpectedly')
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def dump_json(content):
+    return zlib.compress(
+        json.dumps(content, separators=(',', ':')).encode('utf-8'))
+
+
+def load_json(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def send_request(socket_path, request, timeout=None):
+    '''
+    send request to runner daemon and wait for response. relative paths
+    in request are resolved against cwd of client.
+    Args:
+        socket_path (str): unix socket path of daemon
+        request (dict): request, see RunnerDaemon.handle_request
+        timeout (float): seconds to wait for response
+    Returns:
+        dict: response
+    '''
+
+    request = dict(request)
+    request.setdefault('cwd', os.getcwd())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        send_frame(sock, MESSAGE_REQUEST, dump_json(request))
+        _, payload = recv_frame(sock)
+        return load_json(payload)
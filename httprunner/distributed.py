@@ -0,0 +1,568 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import selectors
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from httprunner import exceptions, logger, pool, sla, snapshot, stats
+
+# frame: message type (uint8) + payload length (uint32) + payload
+FRAME_HEADER = struct.Struct('<BI')
+MESSAGE_PLAN = 1
+MESSAGE_METRICS = 2
+MESSAGE_DONE = 3
+MESSAGE_SNAPSHOT = 4
+MESSAGE_HELLO = 5
+MESSAGE_ERROR = 6
+
+# worker hello carries random nonce, and snapshot and plan frames are
+# prefixed by HMAC of nonce, message type and payload with shared secret
+NONCE_SIZE = 16
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+METRICS_INTERVAL = 1.0
+
+###############################################################################
+#   frames
+###############################################################################
+
+
+def send_frame(sock, message_type, payload):
+    sock.sendall(FRAME_HEADER.pack(message_type, len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    '''
+    receive exactly size bytes from socket.
+    Raises:
+        exceptions.WorkerError: connection is closed before size bytes received.
+    '''
+
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise exceptions.WorkerError('connection closed unexpectedly')
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    '''
+    receive one frame from socket.
+    Returns:
+        tuple: (message type, payload)
+    '''
+
+    message_type, length = FRAME_HEADER.unpack(
+        recv_exact(sock, FRAME_HEADER.size))
+    return message_type, recv_exact(sock, length)
+
+
+def _get_secret_bytes(secret):
+    if not secret:
+        raise exceptions.ParamError('shared secret should not be empty')
+
+    return secret.encode('utf-8') if isinstance(secret, str) else secret
+
+
+def sign_payload(secret, nonce, message_type, payload):
+    '''
+    prefix payload with HMAC-SHA256 of nonce, message type and payload.
+    '''
+
+    digest = hmac.new(_get_secret_bytes(secret),
+                      nonce + bytes([message_type]) + payload,
+                      hashlib.sha256).digest()
+    return digest + payload
+
+
+def verify_payload(secret, nonce, message_type, signed_payload):
+    '''
+    verify signed payload, before it is deserialized.
+    Returns:
+        bytes: payload without signature
+    Raises:
+        exceptions.WorkerError: signature mismatch, e.g. sender does not know
+            shared secret, or frame is replayed from another connection.
+    '''
+
+    digest = signed_payload[:DIGEST_SIZE]
+    payload = signed_payload[DIGEST_SIZE:]
+    expected = hmac.new(_get_secret_bytes(secret),
+                        nonce + bytes([message_type]) + payload,
+                        hashlib.sha256).digest()
+    if not hmac.compare_digest(digest, expected):
+        err_msg = f'authentication failed for message type: {message_type}'
+        logger.log_error(err_msg)
+        raise exceptions.WorkerError(err_msg)
+
+    return payload
+
+
+def dump_json(content):
+    return zlib.compress(
+        json.dumps(content, separators=(',', ':')).encode('utf-8'))
+
+
+def load_json(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+###############################################################################
+#   plan
+###############################################################################
+
+
+def split_range(total, parts):
+    '''
+    split range(total) into contiguous ranges of nearly equal size.
+    Examples:
+        >>> split_range(10, 3)
+            [(0, 4), (4, 7), (7, 10)]
+    '''
+
+    ranges = []
+    start = 0
+    for index in range(parts):
+        end = start + total // parts + (1 if index < total % parts else 0)
+        ranges.append((start, end))
+        start = end
+
+    return ranges
+
+
+def get_plan_testcases(plan):
+    '''
+    get testcases to be run by worker from plan, each parameters mapping of
+    worker range is bound to testcase config variables.
+    Args:
+        plan (dict): worker plan, with testcases booted from project snapshot
+            {
+                'testcases': [testcase1, testcase2],
+                'parameters': [{'uid': 1000}, {'uid': 1001}],
+                'range': [0, 2],
+                'threads': 8
+            }
+    Returns:
+        list: testcases to be run
+    '''
+
+    start, end = plan['range']
+    parameters = plan.get('parameters')
+    if not parameters:
+        return plan['testcases'] * (end - start)
+
+    testcases = []
+    for parameter_mapping in parameters:
+        parameter_variables = [{
+            name: value
+        } for name, value in parameter_mapping.items()]
+        for testcase in plan['testcases']:
+            config = dict(testcase.get('config', {}))
+            variables = config.get('variables') or []
+            if isinstance(variables, dict):
+                # mapping form, e.g. {'uid': 0}
+                variables = [{
+                    name: value
+                } for name, value in variables.items()]
+            config['variables'] = list(variables) + parameter_variables
+            testcases.append(dict(testcase, config=config))
+
+    return testcases
+
+
+###############################################################################
+#   worker
+###############################################################################
+
+
+def run_plan(pool_runner, plan):
+    '''
+    run testcases of plan. SLA of testcases is left to coordinator, which
+    evaluates it once on latency stats merged from all workers, so latency
+    stats and result counts of each testcase with SLA are returned instead.
+    Returns:
+        dict: run result, with `sla_stats` keyed by testcase index in plan
+            {
+                'total': 10,
+                'successes': 10,
+                'failures': 0,
+                'errors': [],
+                'duration': 1.2,
+                'sla_stats': {
+                    0: {'total': 10, 'successes': 10, 'failures': 0,
+                        'stats': 'base64 encoded latency stats'}
+                }
+            }
+    '''
+
+    plan_testcases = plan['testcases']
+    plan_stats = pool_runner.get_testcases_stats(plan_testcases)
+    testcases = get_plan_testcases(plan)
+    # testcases of plan are repeated for each parameters mapping or iteration
+    testcases_stats = {
+        index: plan_stats[index % len(plan_testcases)]
+        for index in range(len(testcases))
+        if index % len(plan_testcases) in plan_stats
+    }
+    result = pool_runner.run(testcases, testcases_stats=testcases_stats)
+
+    sla_stats = {
+        index: {
+            'total': 0,
+            'successes': 0,
+            'failures': 0,
+            'stats': base64.b64encode(
+                testcase_stats.to_bytes()).decode('ascii')
+        }
+        for index, testcase_stats in plan_stats.items()
+    }
+    for index, testcase_result in result.pop('testcases_results').items():
+        plan_index = index % len(plan_testcases)
+        for key, value in testcase_result.items():
+            sla_stats[plan_index][key] += value
+    result['sla_stats'] = sla_stats
+
+    return result
+
+
+def recv_signed_frame(sock, secret, nonce, expected_type):
+    '''
+    receive one signed frame of expected type, and verify it.
+    Returns:
+        bytes: verified payload
+    '''
+
+    message_type, payload = recv_frame(sock)
+    if message_type != expected_type:
+        raise exceptions.WorkerError(f'unexpected message type: {message_type}')
+
+    return verify_payload(secret, nonce, message_type, payload)
+
+
+def run_worker(host, port, secret, metrics_interval=METRICS_INTERVAL):
+    '''
+    connect to coordinator, boot project from received snapshot, run
+    received plan, and stream latency stats to coordinator until plan is
+    finished. snapshot is only unpickled after it is verified with shared
+    secret.
+    Args:
+        host (str): coordinator host
+        port (int): coordinator port
+        secret (str): shared secret of coordinator
+        metrics_interval (float): seconds between latency stats snapshots
+    '''
+
+    with socket.create_connection((host, port)) as sock:
+        nonce = os.urandom(NONCE_SIZE)
+        send_frame(sock, MESSAGE_HELLO, nonce)
+        payload = recv_signed_frame(sock, secret, nonce, MESSAGE_SNAPSHOT)
+        testcases = snapshot.load_snapshot(payload)
+
+        payload = recv_signed_frame(sock, secret, nonce, MESSAGE_PLAN)
+        plan = load_json(payload)
+        plan['testcases'] = testcases
+
+        latency_stats = stats.LatencyStats()
+        result = {}
+        errors = []
+
+        def run():
+            pool_runner = None
+            try:
+                pool_runner = pool.ThreadPoolRunner(plan['threads'],
+                                                    latency_stats)
+                result.update(run_plan(pool_runner, plan))
+            except Exception as err:
+                # reported to coordinator instead of an empty result
+                logger.log_error(f'worker run failed: {err!r}')
+                errors.append(err)
+            finally:
+                if pool_runner is not None:
+                    pool_runner.close()
+
+        run_thread = threading.Thread(target=run)
+        run_thread.start()
+        while run_thread.is_alive():
+            run_thread.join(metrics_interval)
+            # cumulative snapshot, coordinator keeps the latest one
+            send_frame(sock, MESSAGE_METRICS, latency_stats.to_bytes())
+
+        if errors:
+            send_frame(sock, MESSAGE_ERROR, dump_json({'error': repr(errors[0])}))
+        else:
+            send_frame(sock, MESSAGE_DONE, dump_json(result))
+
+
+###############################################################################
+#   coordinator
+###############################################################################
+
+
+class Coordinator:
+    '''
+    coordinator of distributed load run. project is loaded once by
+    coordinator and shipped to worker processes over TCP as project snapshot,
+    followed by plan of each worker, with parameters split into one
+    contiguous range for each worker. latency stats streamed by workers are
+    merged into one report. snapshot and plan are signed with shared secret,
+    so that workers only run projects of trusted coordinator.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        parameters (list): parameters mappings, each one is run once
+            [{'uid': 1000}, {'uid': 1001}]
+        iterations (int): times testcases are run if parameters not specified
+        threads (int): threads count of each worker
+        host (str): listening host
+        port (int): listening port, 0 means any free port
+        secret (str): shared secret of workers, random one if not specified
+    Examples:
+        >>> loader.load_project_tests('tests')
+        >>> coordinator = Coordinator(testcases, iterations=1000)
+        >>> coordinator.listen()
+        >>> # start workers:
+        >>> #   run_worker('127.0.0.1', coordinator.port, coordinator.secret)
+        >>> coordinator.run(workers_count=4)
+    '''
+
+    def __init__(self,
+                 testcases,
+                 parameters=None,
+                 iterations=1,
+                 threads=8,
+                 host='127.0.0.1',
+                 port=0,
+                 secret=None):
+        self.testcases = testcases
+        self.parameters = parameters or []
+        self.iterations = iterations
+        self.threads = threads
+        self.host = host
+        self.port = port
+        self.secret = secret or secrets.token_hex(16)
+        self.server_socket = None
+        self.workers_stats = {}
+
+    def listen(self):
+        '''
+        start listening, actual port is updated if port is 0.
+        '''
+
+        family, _, _, _, address = socket.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM)[0]
+        server_socket = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server_socket.bind(address)
+            server_socket.listen()
+        except OSError:
+            server_socket.close()
+            raise
+
+        self.server_socket = server_socket
+        self.port = self.server_socket.getsockname()[1]
+        logger.log_info(f'coordinator listening on {self.host}:{self.port}')
+
+    def close(self):
+        if self.server_socket is not None:
+            self.server_socket.close()
+            self.server_socket = None
+
+    def get_plans(self, workers_count):
+        '''
+        get plan of each worker.
+        '''
+
+        total = len(self.parameters) or self.iterations
+        plans = []
+        for start, end in split_range(total, workers_count):
+            plans.append({
+                'parameters': self.parameters[start:end],
+                'range': [start, end],
+                'threads': self.threads
+            })
+
+        return plans
+
+    def get_merged_stats(self):
+        '''
+        merge latest latency stats snapshots of all workers.
+        '''
+
+        merged_stats = stats.LatencyStats()
+        for latency_stats in self.workers_stats.values():
+            merged_stats.merge(latency_stats)
+
+        return merged_stats
+
+    def run(self, workers_count, timeout=None):
+        '''
+        wait for workers to connect, ship plans, and collect results.
+        Args:
+            workers_count (int): workers to be waited for
+            timeout (float): seconds to wait for workers to finish
+        Returns:
+            dict: merged report
+                {
+                    'workers': 2,
+                    'total': 100,
+                    'successes': 99,
+                    'failures': 1,
+                    'errors': [('smoketest', 'VaildationFailure()')],
+                    'duration': 3.2,
+                    'stats': {},
+                    'sla': [],
+                    'sla_passed': True
+                }
+                SLA of each testcase is evaluated once on latency stats and
+                results merged from all workers, see ThreadPoolRunner.run.
+        Raises:
+            exceptions.ParamError: invalid SLA of testcases.
+            exceptions.WorkerError: worker disconnected, failed or timeout.
+        '''
+
+        for testcase in self.testcases:
+            if testcase.get('config', {}).get('sla'):
+                sla.check_testcase_sla(testcase)
+
+        if self.server_socket is None:
+            self.listen()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.server_socket.settimeout(timeout)
+        plans = self.get_plans(workers_count)
+        project_snapshot = snapshot.dump_snapshot(self.testcases)
+        selector = selectors.DefaultSelector()
+        results = {}
+
+        try:
+            for worker_id, plan in enumerate(plans):
+                try:
+                    sock, address = self.server_socket.accept()
+                except socket.timeout:
+                    raise exceptions.WorkerError(
+                        'timeout waiting for workers to connect')
+                logger.log_info(f'worker {worker_id} connected: {address}')
+                sock.settimeout(timeout)
+                try:
+                    message_type, nonce = recv_frame(sock)
+                except socket.timeout:
+                    sock.close()
+                    raise exceptions.WorkerError(
+                        f'timeout waiting for hello of worker {worker_id}')
+                if message_type != MESSAGE_HELLO or len(nonce) != NONCE_SIZE:
+                    sock.close()
+                    raise exceptions.WorkerError(
+                        f'invalid hello of worker {worker_id}')
+                sock.settimeout(None)
+                send_frame(
+                    sock, MESSAGE_SNAPSHOT,
+                    sign_payload(self.secret, nonce, MESSAGE_SNAPSHOT,
+                                 project_snapshot))
+                send_frame(
+                    sock, MESSAGE_PLAN,
+                    sign_payload(self.secret, nonce, MESSAGE_PLAN,
+                                 dump_json(plan)))
+                selector.register(sock, selectors.EVENT_READ, worker_id)
+
+            while len(results) < workers_count:
+                wait_timeout = None if deadline is None \
+                    else max(deadline - time.monotonic(), 0)
+                events = selector.select(wait_timeout)
+                if not events:
+                    raise exceptions.WorkerError(
+                        'timeout waiting for workers to finish')
+
+                for key, _ in events:
+                    worker_id = key.data
+                    message_type, payload = recv_frame(key.fileobj)
+                    if message_type == MESSAGE_METRICS:
+                        self.workers_stats[worker_id] = \
+                            stats.LatencyStats.from_bytes(payload)
+                    elif message_type == MESSAGE_DONE:
+                        results[worker_id] = load_json(payload)
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                    elif message_type == MESSAGE_ERROR:
+                        error = load_json(payload)['error']
+                        raise exceptions.WorkerError(
+                            f'worker {worker_id} failed: {error}')
+                    else:
+                        raise exceptions.WorkerError(
+                            f'unexpected message type of worker {worker_id}: '
+                            f'{message_type}')
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+
+        errors = []
+        for result in results.values():
+            errors.extend(tuple(error) for error in result['errors'])
+
+        # workers run side by side, the slowest one takes whole run duration
+        durations = [result['duration'] for result in results.values()]
+        run_result = {
+            'workers': workers_count,
+            'total': sum(result['total'] for result in results.values()),
+            'successes':
+            sum(result['successes'] for result in results.values()),
+            'failures': sum(result['failures'] for result in results.values()),
+            'errors': errors,
+            'duration': max(durations, default=0),
+            'stats': self.get_merged_stats().get_report()
+        }
+        self.evaluate_sla(results, run_result)
+        return run_result
+
+    def evaluate_sla(self, results, run_result):
+        '''
+        evaluate SLA of each testcase once, on latency stats and result
+        counts merged from all workers.
+        Args:
+            results (dict): results of workers, keyed by worker id
+            run_result (dict): merged run result
+        '''
+
+        sla_testcases = [(index, testcase)
+                         for index, testcase in enumerate(self.testcases)
+                         if testcase.get('config', {}).get('sla')]
+        if not sla_testcases:
+            return
+
+        run_result['sla'] = []
+        for index, testcase in sla_testcases:
+            merged_stats = stats.LatencyStats()
+            testcase_result = {'total': 0, 'successes': 0, 'failures': 0}
+            for result in results.values():
+                # keys of json objects are strings
+                sla_stats = result.get('sla_stats', {}).get(str(index))
+                if sla_stats is None:
+                    continue
+
+                merged_stats.merge(
+                    stats.LatencyStats.from_bytes(
+                        base64.b64decode(sla_stats['stats'])))
+                for key in testcase_result:
+                    testcase_result[key] += sla_stats[key]
+
+            testcase_result['duration'] = run_result['duration']
+            pool.evaluate_testcase_sla(testcase, merged_stats,
+                                       testcase_result, run_result)
+
+        run_result['sla_passed'] = all(
+            validator['check_result'] == 'pass'
+            for validator in run_result['sla'])
@@ -68,3 +68,15 @@ class ApiNotFound(NotFoundError):
 
 class TestcaseNotFound(NotFoundError):
     pass
+
+
+class RecordNotFound(NotFoundError):
+    pass
+
+
+class WorkerError(MyBaseError):
+    pass
+
+
+class RunAborted(MyBaseError):
+    pass
@@ -0,0 +1,155 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from httprunner import logger
+
+
+class FixtureCache:
+    '''
+    cache of fixture suite output variables, shared by testcases run in the
+    same worker. a fixture suite is run once per cache key, and its output
+    variables are reused until ttl expires or the fixture is invalidated.
+    Args:
+        default_ttl (float): seconds output is cached if fixture does not
+            specify ttl, None means never expires.
+        max_size (int): max outputs cached, expired outputs are evicted
+            first, then the least recently used ones.
+    Examples:
+        >>> fixture_cache = FixtureCache(default_ttl=300)
+        >>> runner.run_testcase(testcase, fixture_cache=fixture_cache)
+        >>> fixture_cache.get_report()
+            {
+                'setup_and_reset': {'runs': 1, 'reused': 99}
+            }
+    '''
+
+    def __init__(self, default_ttl=None, max_size=1024):
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # (name, key) => (expire time, output), least recently used first
+        self.fixtures_mapping = OrderedDict()
+        self.fixtures_counts = {}
+        # (name, key) => [lock held while fixture of key is run, users count],
+        # dropped once no runner uses it
+        self.running_locks = {}
+
+    def _count(self, name, kind):
+        counts = self.fixtures_counts.setdefault(name, {'runs': 0, 'reused': 0})
+        counts[kind] += 1
+
+    def get(self, name, key):
+        '''
+        get cached output of fixture.
+        Args:
+            name (str): fixture suite name
+            key (str): cache key of fixture
+        Returns:
+            dict: copy of cached output variables, None if not cached or expired.
+        '''
+
+        with self.lock:
+            cached = self.fixtures_mapping.get((name, key))
+            if cached is None:
+                return None
+
+            expire_at, output = cached
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self.fixtures_mapping[(name, key)]
+                logger.log_debug(f'fixture expired: {name}')
+                return None
+
+            self.fixtures_mapping.move_to_end((name, key))
+            self._count(name, 'reused')
+            return copy.deepcopy(output)
+
+    def set(self, name, key, output, ttl=None):
+        '''
+        cache output variables of fixture run.
+        Args:
+            name (str): fixture suite name
+            key (str): cache key of fixture
+            output (dict): output variables
+            ttl (float): seconds output is cached, default_ttl if not specified.
+        '''
+
+        ttl = self.default_ttl if ttl is None else ttl
+        expire_at = None if ttl is None else time.monotonic() + ttl
+
+        with self.lock:
+            self._count(name, 'runs')
+            now = time.monotonic()
+            for cached_key, (cached_expire_at, _) in list(
+                    self.fixtures_mapping.items()):
+                if cached_expire_at is not None and cached_expire_at <= now:
+                    del self.fixtures_mapping[cached_key]
+
+            self.fixtures_mapping.pop((name, key), None)
+            while self.fixtures_mapping \
+                    and len(self.fixtures_mapping) >= self.max_size:
+                self.fixtures_mapping.popitem(last=False)
+
+            self.fixtures_mapping[(name, key)] = (expire_at,
+                                                  copy.deepcopy(output))
+
+    def get_or_run(self, name, key, run, ttl=None):
+        '''
+        get cached output of fixture, or run fixture and cache its output if
+        not cached. concurrent misses of the same key are single-flight: one
+        of them runs fixture, and the others wait and reuse its output.
+        Args:
+            name (str): fixture suite name
+            key (str): cache key of fixture
+            run (callable): run fixture and return its output variables
+            ttl (float): seconds output is cached, default_ttl if not specified.
+        Returns:
+            tuple: (output variables, True if reused from cache)
+        '''
+
+        output = self.get(name, key)
+        if output is not None:
+            return output, True
+
+        with self.lock:
+            running_lock = self.running_locks.setdefault(
+                (name, key), [threading.Lock(), 0])
+            running_lock[1] += 1
+
+        try:
+            with running_lock[0]:
+                # cached by runner holding the lock before
+                output = self.get(name, key)
+                if output is not None:
+                    return output, True
+
+                output = run()
+                self.set(name, key, output, ttl)
+                return output, False
+        finally:
+            with self.lock:
+                running_lock[1] -= 1
+                if running_lock[1] == 0:
+                    del self.running_locks[(name, key)]
+
+    def invalidate(self, name=None):
+        '''
+        drop cached output of fixture, or all fixtures if name not specified.
+        '''
+
+        with self.lock:
+            for fixture_name, key in list(self.fixtures_mapping):
+                if name is None or fixture_name == name:
+                    del self.fixtures_mapping[(fixture_name, key)]
+
+    def get_report(self):
+        '''
+        get runs and reused counts of each fixture.
+        '''
+
+        with self.lock:
+            return copy.deepcopy(self.fixtures_counts)
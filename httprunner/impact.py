@@ -0,0 +1,407 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+from httprunner import exceptions, loader, logger, parser
+from httprunner.watch import DEFINITION_FOLDERS
+
+INDEX_VERSION = 2
+REFERENCE_TYPES = ['def-api', 'def-testcase', 'functions', 'variables']
+
+###############################################################################
+#   fingerprints
+###############################################################################
+
+
+def get_definition_hash(definition):
+    content = json.dumps(definition, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def get_file_hash(file_path):
+    if not os.path.isfile(file_path):
+        return None
+
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _get_top_level_segments(source, tree):
+    '''
+    get source segment of each top level statement, from its first line,
+    decorators included, to the line before next statement. blank lines
+    around statement are stripped, so that spacing changes no hash.
+    '''
+
+    lines = source.splitlines(keepends=True)
+    starts = [
+        min([node.lineno] +
+            [decorator.lineno for decorator in getattr(
+                node, 'decorator_list', [])]) for node in tree.body
+    ]
+    ends = [start - 1 for start in starts[1:]] + [len(lines)]
+    return [(node, ''.join(lines[start - 1:end]).strip() + '\n')
+            for node, start, end in zip(tree.body, starts, ends)]
+
+
+def get_python_functions_hashes(file_path):
+    '''
+    get hash of each top level function in python file. hash of function
+    covers its own source, sources of functions and classes of the module
+    it references, recursively, and all module level statements, e.g.
+    imports and assignments of constants, that it may depend on.
+    Returns:
+        dict: {function name: source hash}, empty if file not exists.
+    '''
+
+    if not os.path.isfile(file_path):
+        return {}
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {}
+
+    definitions = {}
+    functions = []
+    module_state = []
+    for node, segment in _get_top_level_segments(source, tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(node.name)
+
+        if isinstance(node,
+                      (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            references = {
+                child.id
+                for child in ast.walk(node) if isinstance(child, ast.Name)
+            }
+            definitions[node.name] = (segment, references)
+        else:
+            module_state.append(segment)
+
+    functions_hashes = {}
+    for name in functions:
+        # definitions referenced by function, recursively
+        closure = {name}
+        pending = [name]
+        while pending:
+            for reference in definitions[pending.pop()][1]:
+                if reference in definitions and reference not in closure:
+                    closure.add(reference)
+                    pending.append(reference)
+
+        content = ''.join(module_state) + ''.join(
+            definitions[reference][0] for reference in sorted(closure))
+        functions_hashes[name] = hashlib.sha1(
+            content.encode('utf-8')).hexdigest()
+
+    return functions_hashes
+
+
+def _load_definition_file(ref_type, file_path):
+    if not os.path.isfile(file_path):
+        return {}
+
+    if ref_type == 'def-api':
+        return loader.load_api_file(file_path)
+    else:
+        return loader.load_test_definition_file(file_path)
+
+
+def _extract_content_references(content, functions, variables):
+    if isinstance(content, dict):
+        for key, value in content.items():
+            _extract_content_references(key, functions, variables)
+            _extract_content_references(value, functions, variables)
+    elif isinstance(content, (list, tuple)):
+        for item in content:
+            _extract_content_references(item, functions, variables)
+    elif isinstance(content, str):
+        for function in parser.extract_functions(content):
+            functions.add(parser.parse_function(function)['func_name'])
+        variables.update(parser.extract_variables(content))
+
+
+###############################################################################
+#   dependency index
+###############################################################################
+
+
+def build_index(project_path, testcase_paths):
+    '''
+    build dependency index from testcase files to api/suite definitions,
+    project functions and confcustom variables they reference. paths in index
+    are relative to project working directory, so that index can be reused
+    in another checkout. confcustom variables are fingerprinted by the whole
+    confcustom.py file.
+    Args:
+        project_path (str): project path, located as load_project_tests does
+        testcase_paths (list): testcase files or folders
+    Returns:
+        dict: dependency index
+            {
+                'version': 2,
+                'testcases': {
+                    'testcases/smoketest.yml': {
+                        'def-api': ['get_token'],
+                        'def-testcase': ['setup_and_reset'],
+                        'functions': ['get_sign'],
+                        'variables': ['user_agent']
+                    }
+                },
+                'def-api': {'get_token': ['api/basic.yml', '<hash>']},
+                'def-testcase': {'setup_and_reset': ['suite/setup.yml', '<hash>']},
+                'functions': {'get_sign': ['api_server.py', '<hash>']},
+                'variables': {'user_agent': ['confcustom.py', '<hash>']}
+            }
+    '''
+
+    loader.load_project_tests(project_path)
+    project_working_directory = loader.project_working_directory
+
+    def get_relative_path(path):
+        return os.path.relpath(os.path.abspath(path),
+                               project_working_directory)
+
+    index = {
+        'version': INDEX_VERSION,
+        'testcases': {},
+        'functions': {},
+        'variables': {}
+    }
+
+    for ref_type, folder in DEFINITION_FOLDERS.items():
+        index[ref_type] = {}
+        folder_path = os.path.join(project_working_directory, folder)
+        for file_path in loader.load_folder_files(folder_path):
+            for name, definition in _load_definition_file(
+                    ref_type, file_path).items():
+                index[ref_type][name] = [
+                    get_relative_path(file_path),
+                    get_definition_hash(definition)
+                ]
+
+    # functions defined in project files, built-in functions are excluded
+    functions_files = {}
+    for name, function in loader.project_mapping['confcustom'][
+            'functions'].items():
+        try:
+            file_path = os.path.abspath(inspect.getsourcefile(function))
+        except TypeError:
+            continue
+        if not file_path.startswith(project_working_directory + os.sep):
+            continue
+        functions_files.setdefault(file_path, []).append(name)
+
+    for file_path, names in functions_files.items():
+        functions_hashes = get_python_functions_hashes(file_path)
+        for name in names:
+            function = loader.project_mapping['confcustom']['functions'][name]
+            source_name = getattr(function, '__name__', name)
+            if source_name in functions_hashes:
+                index['functions'][name] = [
+                    get_relative_path(file_path), functions_hashes[source_name]
+                ]
+
+    # variables of project confcustom.py, built-in variables are excluded
+    confcustom_path = os.path.join(project_working_directory, 'confcustom.py')
+    confcustom_module = sys.modules.get('confcustom')
+    confcustom_hash = get_file_hash(confcustom_path)
+    if confcustom_module is not None and confcustom_hash is not None:
+        for name in loader.project_mapping['confcustom']['variables']:
+            if name in vars(confcustom_module):
+                index['variables'][name] = [
+                    get_relative_path(confcustom_path), confcustom_hash
+                ]
+
+    files = []
+    for path in testcase_paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            files.extend(loader.load_folder_files(path))
+        elif os.path.isfile(path):
+            files.append(path)
+
+    for file_path in sorted(set(files)):
+        try:
+            testcase = loader._load_test_file(file_path)
+            references = loader.get_test_file_references(file_path)
+        except (exceptions.FileFormatError, exceptions.NotFoundError,
+                exceptions.ParamError):
+            continue
+
+        functions, variables = set(), set()
+        _extract_content_references(testcase, functions, variables)
+        index['testcases'][get_relative_path(file_path)] = {
+            'def-api': sorted(references['def-api']),
+            'def-testcase': sorted(references['def-testcase']),
+            'functions': sorted(functions & set(index['functions'])),
+            'variables': sorted(variables & set(index['variables']))
+        }
+
+    return index
+
+
+def save_index(index, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+
+
+def load_index(path):
+    '''
+    load dependency index file.
+    Raises:
+        exceptions.FileNotFound: index file not exists.
+        exceptions.FileFormatError: index file is invalid or outdated.
+    '''
+
+    if not os.path.isfile(path):
+        raise exceptions.FileNotFound(f'dependency index not found: {path}')
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except ValueError:
+        index = None
+
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        err_msg = f'dependency index format error: {path}'
+        logger.log_error(err_msg)
+        raise exceptions.FileFormatError(err_msg)
+
+    return index
+
+
+###############################################################################
+#   selection
+###############################################################################
+
+
+def get_changed_names(index, project_working_directory, changed_files):
+    '''
+    get definitions, functions and variables changed in changed files, by
+    comparing current fingerprints with fingerprints in index.
+    Returns:
+        dict: changed names of each type
+            {
+                'def-api': {'get_token'},
+                'def-testcase': set(),
+                'functions': set(),
+                'variables': set()
+            }
+    '''
+
+    changed_names = {ref_type: set() for ref_type in REFERENCE_TYPES}
+
+    for relative_path in changed_files:
+        file_path = os.path.join(project_working_directory, relative_path)
+
+        for ref_type in DEFINITION_FOLDERS:
+            indexed_hashes = {
+                name: item[1]
+                for name, item in index[ref_type].items()
+                if item[0] == relative_path
+            }
+            if not indexed_hashes and not relative_path.startswith(
+                    DEFINITION_FOLDERS[ref_type] + os.sep):
+                continue
+
+            current_hashes = {
+                name: get_definition_hash(definition)
+                for name, definition in _load_definition_file(
+                    ref_type, file_path).items()
+            }
+            for name in set(indexed_hashes) | set(current_hashes):
+                if indexed_hashes.get(name) != current_hashes.get(name):
+                    changed_names[ref_type].add(name)
+
+        indexed_functions = {
+            name: item[1]
+            for name, item in index['functions'].items()
+            if item[0] == relative_path
+        }
+        if indexed_functions:
+            current_hashes = get_python_functions_hashes(file_path)
+            for name, source_hash in indexed_functions.items():
+                if current_hashes.get(name) != source_hash:
+                    changed_names['functions'].add(name)
+
+        current_hash = get_file_hash(file_path)
+        for name, item in index['variables'].items():
+            if item[0] == relative_path and item[1] != current_hash:
+                changed_names['variables'].add(name)
+
+    return changed_names
+
+
+def select_testcases(index, project_path, changed_files):
+    '''
+    select minimal set of testcases affected by changed files. a testcase is
+    affected if its file changed, or it references a changed api/suite
+    definition, project function or confcustom variable. changed files not known by index and
+    not definition files, e.g. new testcases, are selected as they are.
+    all testcases are selected if .env is changed.
+    Args:
+        index (dict): dependency index built by build_index
+        project_path (str): project path of current checkout
+        changed_files (list): changed file paths, absolute or relative to cwd,
+            e.g. output of `git diff --name-only`
+    Returns:
+        list: affected testcase file paths, absolute and sorted.
+    '''
+
+    confcustom_path = loader.locate_confcustom_py(project_path)
+    project_working_directory = os.path.dirname(confcustom_path) \
+        if confcustom_path else os.getcwd()
+
+    relative_paths = [
+        os.path.relpath(os.path.abspath(path), project_working_directory)
+        for path in changed_files
+    ]
+    changed_names = get_changed_names(index, project_working_directory,
+                                      relative_paths)
+    # variables in .env are not traced by index
+    env_changed = '.env' in relative_paths
+
+    affected = set()
+    for relative_path, references in index['testcases'].items():
+        if env_changed or relative_path in relative_paths:
+            affected.add(relative_path)
+            continue
+
+        for ref_type, names in changed_names.items():
+            if names & set(references[ref_type]):
+                affected.add(relative_path)
+                break
+
+    indexed_files = set(index['testcases'])
+    for ref_type in REFERENCE_TYPES:
+        indexed_files.update(item[0] for item in index[ref_type].values())
+
+    definition_folders = tuple(folder + os.sep
+                               for folder in DEFINITION_FOLDERS.values())
+    for relative_path in relative_paths:
+        if relative_path in indexed_files \
+                or relative_path.startswith(definition_folders) \
+                or relative_path.startswith(os.pardir) \
+                or not relative_path.endswith(('.yml', '.yaml', '.json')):
+            continue
+
+        if os.path.isfile(
+                os.path.join(project_working_directory, relative_path)):
+            affected.add(relative_path)
+
+    return sorted(
+        os.path.join(project_working_directory, relative_path)
+        for relative_path in affected
+        if os.path.isfile(
+            os.path.join(project_working_directory, relative_path)))
@@ -8,8 +8,10 @@ import yaml
 import sys
 import importlib
 import collections
+import copy
+import types
 
-from httprunner import logger, exceptions, validator, utils, parser
+from httprunner import logger, exceptions, validator, utils, parser, response
 
 sys.path.insert(0, os.getcwd())
 
@@ -363,13 +365,18 @@ def _load_test_file(file_path):
                 }
             ]
     Returns:
-        dict: testcase dict
+        dict: testcase dict, with absolute path of file it is loaded from
             {
                 "config":{},
-                "teststeps":[teststep1,teststep2]
+                "teststeps":[teststep1,teststep2],
+                "path":"/path/to/testcase.yml"
             }
     '''
-    testcase = {"config": {}, "teststeps": []}
+    testcase = {
+        "config": {},
+        "teststeps": [],
+        "path": os.path.abspath(file_path)
+    }
 
     for item in load_file(file_path):
         if not isinstance(item, dict) or len(item) != 1:
@@ -399,7 +406,13 @@ def _load_test_file(file_path):
                 for teststep in block['teststeps']:
                     if 'api' in teststep:
                         extend_api_definition(teststep)
-                    testcase['teststeps'].append(teststep)
+
+                if test_block.get('cache'):
+                    # cacheable suite is kept as one fixture teststep
+                    testcase['teststeps'].append(
+                        _load_fixture_teststep(test_block, block))
+                else:
+                    testcase['teststeps'].extend(block['teststeps'])
             else:
                 testcase['teststeps'].append(test_block)
         else:
@@ -407,9 +420,62 @@ def _load_test_file(file_path):
                 f'unexpected block key: {key}. block key should only be "config" or "test".'
             )
 
+    # compile check items and extractors once, shared by all executions
+    for teststep in testcase['teststeps']:
+        for sub_teststep in teststep.get('teststeps', [teststep]):
+            response.compile_teststep_fields(sub_teststep)
+
     return testcase
 
 
+def _load_fixture_teststep(test_block, suite_block):
+    '''
+    load cacheable suite reference as fixture teststep, output variables of
+    fixture can be cached and reused across testcases by runner.
+    Args:
+        test_block (dict): suite reference block
+            {
+                'name': 'setup and reset all.',
+                'suite': 'setup_and_reset($device_sn)',
+                'cache': {'ttl': 300, 'scope': 'suite'},
+                'output': ['token', 'device_sn']
+            }
+        suite_block (dict): suite definition with teststeps extended
+    Returns:
+        dict: fixture teststep
+            {
+                'name': 'setup and reset all.',
+                'suite': 'setup_and_reset($device_sn)',
+                'cache': {'ttl': 300, 'scope': 'suite'},
+                'output': ['token', 'device_sn'],
+                'teststeps': [teststep1, teststep2]
+            }
+    Raises:
+        exceptions.ParamError: cache scope is invalid.
+    '''
+
+    cache = test_block['cache']
+    if not isinstance(cache, dict):
+        cache = {}
+    cache = {'ttl': cache.get('ttl'), 'scope': cache.get('scope', 'args')}
+
+    if cache['scope'] not in ['args', 'suite']:
+        err_msg = f"invalid fixture cache scope: {cache['scope']}"
+        logger.log_error(err_msg)
+        raise exceptions.ParamError(err_msg)
+
+    output = test_block.get('output') or suite_block.get('config', {}).get(
+        'output', [])
+
+    return {
+        'name': test_block.get('name') or test_block['suite'],
+        'suite': test_block['suite'],
+        'cache': cache,
+        'output': output,
+        'teststeps': suite_block['teststeps']
+    }
+
+
 def _get_block_by_name(ref_call, ref_type):
     '''
     get test content by reference name.
@@ -444,6 +510,9 @@ def _get_block_by_name(ref_call, ref_type):
 
     if args_mapping:
         block = parser.substitute_variables(block, args_mapping)
+    else:
+        # reference block is extended later, keep definition untouched
+        block = copy.deepcopy(block)
 
     return block
 
@@ -688,20 +757,36 @@ def load_api_folder(api_folder_path):
     api_items_mapping = load_folder_content(api_folder_path)
 
     for api_file_path, api_items in api_items_mapping.items():
-        for api_item in api_items:
-            key, api_dict = api_item.popitem()
+        _load_api_items(api_items, api_definition_mapping)
 
-            api_def = api_dict.pop('def')
-            function_meta = parser.parse_function(api_def)
-            func_name = function_meta['func_name']
+    project_mapping['def-api'] = api_definition_mapping
+    return api_definition_mapping
 
-            if func_name in api_definition_mapping:
-                logger.log_warning(f'API definition duplicated: {func_name}')
 
-            api_dict['function_meta'] = function_meta
-            api_definition_mapping[func_name] = api_dict
+def _load_api_items(api_items, api_definition_mapping):
+    for api_item in api_items:
+        key, api_dict = api_item.popitem()
 
-    project_mapping['def-api'] = api_definition_mapping
+        api_def = api_dict.pop('def')
+        function_meta = parser.parse_function(api_def)
+        func_name = function_meta['func_name']
+
+        if func_name in api_definition_mapping:
+            logger.log_warning(f'API definition duplicated: {func_name}')
+
+        api_dict['function_meta'] = function_meta
+        api_definition_mapping[func_name] = api_dict
+
+
+def load_api_file(api_file_path):
+    '''
+    load api definitions from one api file, project_mapping is not updated.
+    Returns:
+        dict: api definition mapping of api file.
+    '''
+
+    api_definition_mapping = {}
+    _load_api_items(load_file(api_file_path), api_definition_mapping)
     return api_definition_mapping
 
 
@@ -746,34 +831,120 @@ def load_test_folder(test_folder_path):
     test_items_mapping = load_folder_content(test_folder_path)
 
     for test_file_path, items in test_items_mapping.items():
-        testcase = {"config": {}, "teststeps": []}
-        for item in items:
-            key, block = item.popitem()
+        _load_test_items(test_file_path, items, test_definition_mapping)
+
+    project_mapping['def-testcase'] = test_definition_mapping
+    return test_definition_mapping
 
-            if key == 'config':
-                testcase['config'].update(block)
 
-                if "def" not in block:
-                    test_definition_mapping[test_file_path] = testcase
-                    continue
+def _load_test_items(test_file_path, items, test_definition_mapping):
+    testcase = {"config": {}, "teststeps": []}
+    for item in items:
+        key, block = item.popitem()
 
-                testcase_def = block['def']
-                function_meta = parser.parse_function(testcase_def)
-                func_name = function_meta['func_name']
+        if key == 'config':
+            testcase['config'].update(block)
 
-                if func_name in test_definition_mapping:
-                    logger.log_warning(
-                        f'testcase definition duplicated: {func_name}')
+            if "def" not in block:
+                test_definition_mapping[test_file_path] = testcase
+                continue
 
-                testcase['function_meta'] = function_meta
-                test_definition_mapping[func_name] = testcase
-            else:
-                testcase['teststeps'].append(block)
+            testcase_def = block['def']
+            function_meta = parser.parse_function(testcase_def)
+            func_name = function_meta['func_name']
 
-    project_mapping['def-testcase'] = test_definition_mapping
+            if func_name in test_definition_mapping:
+                logger.log_warning(
+                    f'testcase definition duplicated: {func_name}')
+
+            testcase['function_meta'] = function_meta
+            test_definition_mapping[func_name] = testcase
+        else:
+            testcase['teststeps'].append(block)
+
+
+def load_test_definition_file(test_file_path):
+    '''
+    load testcase definitions from one suite file, project_mapping is not
+    updated.
+    Returns:
+        dict: testcase definition mapping of suite file.
+    '''
+
+    test_definition_mapping = {}
+    _load_test_items(test_file_path, load_file(test_file_path),
+                     test_definition_mapping)
     return test_definition_mapping
 
 
+def get_test_file_references(file_path):
+    '''
+    get api and suite definitions referenced by testcase file, apis
+    referenced by referenced suites are included.
+    Args:
+        file_path (str): testcase file path
+    Returns:
+        dict: referenced definition names
+            {
+                'def-api': {'get_token', 'reset_all'},
+                'def-testcase': {'setup_and_reset'}
+            }
+    '''
+
+    references = {'def-api': set(), 'def-testcase': set()}
+
+    def add_api_references(blocks):
+        for block in blocks:
+            if isinstance(block, dict) and 'api' in block:
+                references['def-api'].add(
+                    parser.parse_function(block['api'])['func_name'])
+
+    test_blocks = [
+        item.get('test') for item in load_file(file_path)
+        if isinstance(item, dict)
+    ]
+    add_api_references(test_blocks)
+
+    for block in test_blocks:
+        if isinstance(block, dict) and 'suite' in block:
+            func_name = parser.parse_function(block['suite'])['func_name']
+            references['def-testcase'].add(func_name)
+            suite_block = project_mapping['def-testcase'].get(func_name, {})
+            add_api_references(suite_block.get('teststeps', []))
+
+    return references
+
+
+def get_project_snapshot():
+    '''
+    get read-only snapshot of project mapping. runners of concurrent threads
+    share the snapshot, so that loading or reloading project never mutates
+    mapping in use by a running test.
+    Returns:
+        types.MappingProxyType: read-only project mapping
+            {
+                'confcustom': {'variables': {}, 'functions': {}},
+                'env': {},
+                'def-api': {},
+                'def-testcase': {}
+            }
+    '''
+
+    confcustom = project_mapping['confcustom']
+    return types.MappingProxyType({
+        'confcustom': types.MappingProxyType({
+            'variables': types.MappingProxyType(
+                copy.deepcopy(dict(confcustom['variables']))),
+            'functions': types.MappingProxyType(dict(confcustom['functions']))
+        }),
+        'env': types.MappingProxyType(dict(project_mapping['env'])),
+        'def-api': types.MappingProxyType(
+            copy.deepcopy(project_mapping['def-api'])),
+        'def-testcase': types.MappingProxyType(
+            copy.deepcopy(project_mapping['def-testcase']))
+    })
+
+
 def reset_loader():
     '''
     reset project mapping.
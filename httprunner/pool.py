@@ -0,0 +1,406 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import threading
+import time
+
+import requests
+
+from httprunner import (abort, client, exceptions, loader, logger, runner, sla,
+                        stats)
+
+SCALING_THREADS = [1, 2, 4, 8, 16, 32, 64]
+# result of testcase not run or cancelled by abort rules
+TESTCASE_SKIPPED = 'skipped'
+
+
+class ThreadPoolRunner:
+    '''
+    run testcases on a pool of worker threads. each worker thread has its own
+    http session, and each testcase is run with its own context forked from
+    a read-only project snapshot, so confcustom functions never share state
+    through runner. testcases and validators are only read during run.
+    Args:
+        threads (int): worker threads count
+        latency_stats (stats.LatencyStats): shared by all worker threads
+        fixture_cache (fixture.FixtureCache): shared by all worker threads
+        coalescer (client.RequestCoalescer): shared by sessions of all threads
+        hedger (client.RequestHedger): shared by sessions of all threads
+        project_mapping (dict): project snapshot, taken from loader if not
+            specified.
+        abort_controller (abort.AbortController): abort rules, testcases
+            are no longer scheduled once run or their host is aborted.
+    Examples:
+        >>> pool_runner = ThreadPoolRunner(threads=16)
+        >>> pool_runner.run(testcases, iterations=100)
+            {
+                'total': 100,
+                'successes': 99,
+                'failures': 1,
+                'errors': [('smoketest', 'VaildationFailure()')],
+                'duration': 3.2
+            }
+    '''
+
+    def __init__(self,
+                 threads=8,
+                 latency_stats=None,
+                 fixture_cache=None,
+                 coalescer=None,
+                 project_mapping=None,
+                 abort_controller=None,
+                 hedger=None):
+        if threads < 1:
+            raise exceptions.ParamError(f'invalid threads count: {threads}')
+
+        self.threads = threads
+        self.latency_stats = latency_stats
+        self.fixture_cache = fixture_cache
+        self.coalescer = coalescer
+        self.hedger = hedger
+        self.project_mapping = project_mapping \
+            or loader.get_project_snapshot()
+        self.abort_controller = abort_controller
+        # rate limiters of current run, shared by sessions of all threads
+        self.rate_limiters = client.RateLimiters()
+        self.sessions = []
+        self._sessions_lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_session(self):
+        '''
+        get http session of current worker thread, created on first use.
+        '''
+
+        http_client_session = getattr(self._local, 'http_client_session',
+                                      None)
+        if http_client_session is None:
+            http_client_session = client.HttpSession(
+                coalescer=self.coalescer,
+                hedger=self.hedger,
+                rate_limiters=self.rate_limiters)
+            self._local.http_client_session = http_client_session
+            with self._sessions_lock:
+                self.sessions.append(http_client_session)
+
+        return http_client_session
+
+    def run_testcase(self,
+                     testcase,
+                     should_abort=None,
+                     latency_stats=None,
+                     start_delay=None):
+        '''
+        run testcase in current worker thread.
+        Args:
+            testcase (dict): testcase loaded by loader.load_testcases
+            should_abort (callable): checked before each teststep
+            latency_stats (stats.LatencyStats): latency stats of testcase,
+                latency stats of pool if not specified.
+            start_delay (float): seconds testcase started behind its
+                intended start time in fixed rate mode.
+        Returns:
+            runner.Runner: runner with context after all teststeps are run.
+        '''
+
+        http_client_session = self.get_session()
+        # base_url is taken from config of each testcase
+        http_client_session.base_url = ''
+        http_client_session.rate_limiters = self.rate_limiters
+        if latency_stats is None:
+            latency_stats = self.latency_stats
+
+        return runner.run_testcase(
+            testcase,
+            http_client_session,
+            latency_stats,
+            self.fixture_cache,
+            project_mapping=self.project_mapping,
+            should_abort=should_abort,
+            start_delay=start_delay)
+
+    def run_testcase_safely(self,
+                            testcase,
+                            latency_stats=None,
+                            start_delay=None):
+        '''
+        run testcase in current worker thread, with abort rules checked and
+        testcase failures caught.
+        Returns:
+            None if testcase passed, TESTCASE_SKIPPED if it is not run or
+            aborted, else (testcase name, failure repr).
+        '''
+
+        should_abort = None
+        if self.abort_controller is not None:
+            host = abort.get_testcase_host(testcase)
+            if self.abort_controller.is_aborted(host):
+                return TESTCASE_SKIPPED
+
+            def should_abort():
+                return self.abort_controller.is_aborted(host)
+
+        error = None
+        start_at = time.perf_counter()
+        try:
+            self.run_testcase(testcase, should_abort, latency_stats,
+                              start_delay)
+        except exceptions.RunAborted:
+            return TESTCASE_SKIPPED
+        except (exceptions.MyBaseFailure, exceptions.MyBaseError,
+                requests.RequestException) as err:
+            name = testcase.get('config', {}).get('name', '')
+            logger.log_error(f'testcase failed: {name}, {err!r}')
+            error = err
+
+        if self.abort_controller is not None:
+            self.abort_controller.record(host, error,
+                                         time.perf_counter() - start_at)
+
+        if error is None:
+            return None
+
+        return name, repr(error)
+
+    def get_testcases_stats(self, testcases):
+        '''
+        create latency stats of each testcase with SLA, recorded into
+        latency stats of pool as well if specified. SLA validators are
+        parsed here, so that typos fail before run.
+        Returns:
+            dict: {testcase index: stats.LatencyStats}
+        Raises:
+            exceptions.ParamError: invalid SLA validators or comparators.
+        '''
+
+        testcases_stats = {}
+        for index, testcase in enumerate(testcases):
+            if not testcase.get('config', {}).get('sla'):
+                continue
+
+            sla.check_testcase_sla(testcase, self.project_mapping)
+            if self.latency_stats is None:
+                testcases_stats[index] = stats.LatencyStats()
+            else:
+                testcases_stats[index] = stats.LatencyStats(
+                    self.latency_stats.significant_bits,
+                    self.latency_stats.expected_interval,
+                    parent=self.latency_stats)
+
+        return testcases_stats
+
+    def run(self, testcases, iterations=1, testcases_stats=None):
+        '''
+        run testcases on worker threads.
+        Args:
+            testcases (list): testcases loaded by loader.load_testcases
+            iterations (int): times each testcase is run
+            testcases_stats (dict): latency stats of testcases with SLA, keyed
+                by testcase index. if specified, SLA is left to caller, e.g.
+                coordinator evaluating it on stats merged from workers, and
+                result counts of these testcases are returned instead.
+        Returns:
+            dict: run result, with evaluated SLA validators if `sla` is
+                configured in testcases, and skipped testcases and tripped
+                abort rules if abort controller is specified. SLA validators
+                are evaluated against latency and result of their own
+                testcase, and runs of testcase with breached SLA are counted
+                as failures.
+                {
+                    'total': 100,
+                    'successes': 99,
+                    'failures': 1,
+                    'errors': [('smoketest', 'VaildationFailure()')],
+                    'duration': 3.2,
+                    'sla': [{'testcase': 'smoketest',
+                             'check': 'p99 of get_user', 'check_value': 120.5,
+                             'comparator': 'less_than', 'expect': 200,
+                             'check_result': 'pass'}],
+                    'sla_passed': True
+                }
+        '''
+
+        # rate limits configured in previous runs do not apply to this one
+        self.rate_limiters = client.RateLimiters()
+
+        # testcases with SLA record into their own latency stats as well
+        evaluate_sla = testcases_stats is None
+        if evaluate_sla:
+            testcases_stats = self.get_testcases_stats(testcases)
+
+        tasks = [(testcase, testcases_stats.get(index))
+                 for _ in range(iterations)
+                 for index, testcase in enumerate(testcases)]
+
+        start_at = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(self.threads) as executor:
+            results = list(
+                executor.map(lambda task: self.run_testcase_safely(*task),
+                             tasks))
+        duration = time.perf_counter() - start_at
+
+        skipped = results.count(TESTCASE_SKIPPED)
+        errors = [
+            result for result in results
+            if result is not None and result != TESTCASE_SKIPPED
+        ]
+        run_result = {
+            'total': len(tasks),
+            'successes': len(tasks) - len(errors) - skipped,
+            'failures': len(errors),
+            'errors': errors,
+            'duration': duration
+        }
+        if self.abort_controller is not None:
+            run_result['skipped'] = skipped
+            run_result['aborted'] = dict(self.abort_controller.tripped)
+
+        if not evaluate_sla:
+            run_result['testcases_results'] = {
+                index: get_testcase_result(results[index::len(testcases)])
+                for index in testcases_stats
+            }
+        elif testcases_stats:
+            run_result['sla'] = []
+            for index, testcase_stats in testcases_stats.items():
+                testcase_result = get_testcase_result(
+                    results[index::len(testcases)])
+                testcase_result['duration'] = duration
+                evaluate_testcase_sla(testcases[index], testcase_stats,
+                                      testcase_result, run_result,
+                                      self.project_mapping)
+            run_result['sla_passed'] = all(
+                validator['check_result'] == 'pass'
+                for validator in run_result['sla'])
+
+        return run_result
+
+    def close(self):
+        '''
+        close http sessions of all worker threads.
+        '''
+
+        with self._sessions_lock:
+            for http_client_session in self.sessions:
+                http_client_session.close()
+            self.sessions = []
+
+
+def get_testcase_result(results):
+    '''
+    count results of all runs of one testcase.
+    Args:
+        results (list): results returned by run_testcase_safely
+    Returns:
+        dict: {'total': 4, 'successes': 3, 'failures': 1}
+    '''
+
+    failures = len([
+        result for result in results
+        if result is not None and result != TESTCASE_SKIPPED
+    ])
+    return {
+        'total': len(results),
+        'successes': results.count(None),
+        'failures': failures
+    }
+
+
+def evaluate_testcase_sla(testcase,
+                          latency_stats,
+                          testcase_result,
+                          run_result,
+                          project_mapping=None):
+    '''
+    evaluate SLA validators of testcase and add them to run result. runs of
+    testcase with breached SLA are counted as failures.
+    Args:
+        testcase (dict): testcase with `sla` in config
+        latency_stats (stats.LatencyStats): latency stats of testcase
+        testcase_result (dict): total, successes, failures and duration of
+            testcase runs
+        run_result (dict): run result, with `sla` list
+        project_mapping (dict): project snapshot comparators are taken from
+    '''
+
+    config = testcase.get('config', {})
+    name = config.get('name', '')
+    evaluated_validators = sla.evaluate_sla(config['sla'], latency_stats,
+                                            testcase_result, project_mapping)
+
+    breached = False
+    for validator in evaluated_validators:
+        validator['testcase'] = name
+        run_result['sla'].append(validator)
+        if validator['check_result'] == 'fail':
+            breached = True
+            run_result['errors'].append(
+                (name, f"SLA breached: {validator['check']} "
+                 f"{validator['comparator']} {validator['expect']}, "
+                 f"check value: {validator['check_value']}"))
+
+    if breached:
+        # SLA is part of testcase, passed runs of it fail as well
+        run_result['successes'] -= testcase_result['successes']
+        run_result['failures'] += testcase_result['successes']
+
+
+def run_scaling_benchmark(testcases,
+                          threads_list=SCALING_THREADS,
+                          iterations=100):
+    '''
+    run testcases with increasing threads count and report throughput and
+    latency of each, to find where thread pool stops scaling.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        threads_list (list): threads counts to be benchmarked
+        iterations (int): times each testcase is run for each threads count
+    Returns:
+        list: benchmark result of each threads count, latency in milliseconds
+            [
+                {
+                    'threads': 1,
+                    'testcases': 100,
+                    'failures': 0,
+                    'duration': 2.1,
+                    'throughput': 47.6,
+                    'speedup': 1.0,
+                    'p50': 20.1,
+                    'p99': 25.3
+                }
+            ]
+    '''
+
+    benchmark = []
+    for threads in threads_list:
+        latency_stats = stats.LatencyStats()
+        pool_runner = ThreadPoolRunner(threads, latency_stats)
+        try:
+            result = pool_runner.run(testcases, iterations)
+        finally:
+            pool_runner.close()
+
+        histogram = stats.LatencyHistogram(latency_stats.significant_bits)
+        for teststep_histogram in latency_stats.teststeps_histograms.values():
+            histogram.merge(teststep_histogram)
+        p50, p99 = histogram.get_values_at_percentiles([50, 99])
+
+        throughput = result['total'] / result['duration'] \
+            if result['duration'] else 0
+        speedup = throughput / benchmark[0]['throughput'] \
+            if benchmark and benchmark[0]['throughput'] else 1.0
+
+        benchmark.append({
+            'threads': threads,
+            'testcases': result['total'],
+            'failures': result['failures'],
+            'duration': round(result['duration'], 3),
+            'throughput': round(throughput, 1),
+            'speedup': round(speedup, 2),
+            'p50': round(p50 / 1000, 3),
+            'p99': round(p99 / 1000, 3)
+        })
+        logger.log_info(f'benchmark: {benchmark[-1]}')
+
+    return benchmark
@@ -0,0 +1,207 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import gc
+import os
+import socket
+
+from httprunner import distributed, exceptions, loader, logger, pool, stats
+
+SMAPS_ROLLUP_PATH = '/proc/{}/smaps_rollup'
+
+
+def get_memory_usage(pid='self'):
+    '''
+    get shared and private memory of process from smaps_rollup, in kB.
+    shared memory is copy-on-write pages still shared with parent process.
+    Args:
+        pid (int/str): process id, 'self' for current process
+    Returns:
+        dict: memory usage, None if smaps_rollup is not supported.
+            {
+                'rss': 20480,
+                'pss': 12288,
+                'shared': 16384,
+                'private': 4096
+            }
+    '''
+
+    try:
+        with open(SMAPS_ROLLUP_PATH.format(pid), 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        value = value.split()
+        if value and value[0].isdigit():
+            fields[name] = int(value[0])
+
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get(
+            'Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get(
+            'Private_Dirty', 0)
+    }
+
+
+class PreforkRunner:
+    '''
+    process pool runner forking workers after project and testcases are
+    loaded. loaded objects are moved out of gc tracking with gc.freeze before
+    forking, so that gc in workers does not write to them and copy-on-write
+    pages stay shared with parent process.
+    Args:
+        workers (int): worker processes count
+        threads (int): threads count of each worker
+        freeze (bool): freeze loaded objects before forking, ignored before
+            python 3.7 which has no gc.freeze
+    Examples:
+        >>> loader.load_project_tests('tests')
+        >>> testcases = loader.load_testcases('tests/testcases')
+        >>> PreforkRunner(workers=4).run(testcases, iterations=100)
+            {
+                'workers': 4,
+                'total': 400,
+                'successes': 400,
+                'failures': 0,
+                'errors': [],
+                'frozen': 52341,
+                'memory': [{'pid': 1234, 'rss': 20480, 'pss': 12288,
+                            'shared': 16384, 'private': 4096}],
+                'stats': {}
+            }
+    '''
+
+    def __init__(self, workers=4, threads=1, freeze=True):
+        if not hasattr(os, 'fork'):
+            raise exceptions.ParamError('prefork mode requires os.fork')
+
+        if workers < 1:
+            raise exceptions.ParamError(f'invalid workers count: {workers}')
+
+        self.workers = workers
+        self.threads = threads
+        self.freeze = freeze
+        if freeze and not hasattr(gc, 'freeze'):
+            logger.log_warning(
+                'gc.freeze is not available, prefork without freezing.')
+            self.freeze = False
+
+    def _run_worker(self, sock, testcases, project_mapping):
+        latency_stats = stats.LatencyStats()
+        pool_runner = pool.ThreadPoolRunner(
+            self.threads, latency_stats, project_mapping=project_mapping)
+        try:
+            result = pool_runner.run(testcases)
+        finally:
+            pool_runner.close()
+
+        result['pid'] = os.getpid()
+        result['memory'] = get_memory_usage()
+        distributed.send_frame(sock, distributed.MESSAGE_METRICS,
+                               latency_stats.to_bytes())
+        distributed.send_frame(sock, distributed.MESSAGE_DONE,
+                               distributed.dump_json(result))
+
+    def _fork_worker(self, testcases, project_mapping):
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid != 0:
+            child_sock.close()
+            return pid, parent_sock
+
+        # worker process, never returns
+        exit_code = 0
+        try:
+            parent_sock.close()
+            gc.enable()
+            self._run_worker(child_sock, testcases, project_mapping)
+        except BaseException as err:
+            logger.log_error(f'prefork worker failed: {err!r}')
+            exit_code = 1
+        finally:
+            child_sock.close()
+            os._exit(exit_code)
+
+    def run(self, testcases, iterations=1):
+        '''
+        fork workers and run testcases in them, each worker runs a
+        contiguous range of all iterations.
+        Returns:
+            dict: merged report, with memory usage of each worker measured
+                before it exits.
+        Raises:
+            exceptions.WorkerError: worker exits without result.
+        '''
+
+        tasks = [
+            testcase for _ in range(iterations) for testcase in testcases
+        ]
+        ranges = distributed.split_range(len(tasks), self.workers)
+        # snapshot is taken in parent, so that it is shared by workers
+        project_mapping = loader.get_project_snapshot()
+
+        frozen = 0
+        gc_enabled = gc.isenabled()
+        if self.freeze:
+            # collect garbage once, then keep gc from touching loaded objects
+            gc.disable()
+            gc.collect()
+            gc.freeze()
+            frozen = gc.get_freeze_count()
+
+        workers = []
+        try:
+            for start, end in ranges:
+                workers.append(
+                    self._fork_worker(tasks[start:end], project_mapping))
+        finally:
+            if self.freeze:
+                gc.unfreeze()
+                if gc_enabled:
+                    gc.enable()
+
+        results = []
+        failed_pids = []
+        merged_stats = stats.LatencyStats()
+        for pid, sock in workers:
+            try:
+                with sock:
+                    _, payload = distributed.recv_frame(sock)
+                    merged_stats.merge(stats.LatencyStats.from_bytes(payload))
+                    _, payload = distributed.recv_frame(sock)
+                    results.append(distributed.load_json(payload))
+            except exceptions.WorkerError:
+                failed_pids.append(pid)
+            finally:
+                os.waitpid(pid, 0)
+
+        if failed_pids:
+            err_msg = f'prefork workers exited without result: {failed_pids}'
+            logger.log_error(err_msg)
+            raise exceptions.WorkerError(err_msg)
+
+        errors = []
+        for result in results:
+            errors.extend(tuple(error) for error in result['errors'])
+
+        memory = []
+        for result in results:
+            if result['memory'] is not None:
+                memory.append(dict(result['memory'], pid=result['pid']))
+
+        return {
+            'workers': self.workers,
+            'total': sum(result['total'] for result in results),
+            'successes': sum(result['successes'] for result in results),
+            'failures': sum(result['failures'] for result in results),
+            'errors': errors,
+            'frozen': frozen,
+            'memory': memory,
+            'stats': merged_stats.get_report()
+        }
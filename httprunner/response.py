@@ -0,0 +1,494 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import threading
+from collections import OrderedDict
+
+import requests
+
+from httprunner import exceptions, logger, parser, streaming, utils
+
+text_extractor_regexp_compile = re.compile(r'.*\(.*\).*')
+
+# mark json body not decoded yet, None is a valid json body
+NOT_DECODED = object()
+# mark body failed to be decoded as json, fallback to text at once
+NOT_JSON = object()
+
+STREAM_CHUNK_SIZE = 8192
+# raw body kept for fallback when no other content field is referenced
+STREAM_MAX_RAW_SIZE = 1024 * 1024
+
+
+###############################################################################
+#   compiled field accessors
+###############################################################################
+
+# check items and extractors compiled to accessor, shared by all responses,
+# least recently used ones are dropped over MAX_COMPILED_FIELDS
+MAX_COMPILED_FIELDS = 4096
+compiled_fields_mapping = OrderedDict()
+compiled_fields_lock = threading.Lock()
+
+RESPONSE_ATTRIBUTES = ['status_code', 'encoding', 'ok', 'reason', 'url']
+
+
+def _raise_error(err_msg, exception_type):
+    logger.log_error(err_msg)
+    raise exception_type(err_msg)
+
+
+def _compile_invalid_field(err_msg):
+    '''
+    invalid field fails when it is extracted, the same as before compiled.
+    '''
+
+    def accessor(resp_obj):
+        _raise_error(err_msg, exceptions.ParamError)
+
+    return accessor
+
+
+def _compile_regex_field(field):
+    try:
+        pattern = re.compile(field)
+    except re.error as err:
+        return _compile_invalid_field(
+            f'Invalid regex extractor! => {field}\n{err}')
+
+    def accessor(resp_obj):
+        matched = pattern.search(resp_obj.text)
+        if not matched:
+            err_msg = f'Failed to extract data with regex! => {field}\n'
+            err_msg += f'response body: {resp_obj.text}'
+            _raise_error(err_msg, exceptions.ExtractFailure)
+
+        return matched.group(1)
+
+    return accessor
+
+
+def _compile_attribute_field(attribute_name):
+    def accessor(resp_obj):
+        return getattr(resp_obj.resp_obj, attribute_name)
+
+    return accessor
+
+
+def _compile_mapping_field(field, mapping_name, key):
+    def accessor(resp_obj):
+        mapping = getattr(resp_obj, mapping_name)
+        try:
+            return mapping[key]
+        except KeyError:
+            err_msg = f'Failed to extract {mapping_name}! => {field}\n'
+            err_msg += f'response {mapping_name}: {mapping}\n'
+            _raise_error(err_msg, exceptions.ExtractFailure)
+
+    return accessor
+
+
+def _compile_elapsed_field(sub_query):
+    def accessor(resp_obj):
+        return getattr(resp_obj.resp_obj.elapsed, sub_query)
+
+    return accessor
+
+
+def _compile_content_field(field, sub_query):
+    content_path = utils.compile_content_path(sub_query)
+
+    def accessor(resp_obj):
+        body = resp_obj.get_body()
+        if not isinstance(body, (dict, list)) and not sub_query.isdigit():
+            err_msg = f'Failed to extract attribute from response body! => {field}\n'
+            err_msg += f'response body: {body}\n'
+            _raise_error(err_msg, exceptions.ExtractFailure)
+
+        try:
+            return utils.query_content(body, content_path)
+        except (KeyError, IndexError, TypeError):
+            err_msg = f'Failed to extract! => {field}\n'
+            err_msg += f'with json content: {body}'
+            _raise_error(err_msg, exceptions.ExtractFailure)
+
+    return accessor
+
+
+def _compile_field(field):
+    if text_extractor_regexp_compile.match(field):
+        return _compile_regex_field(field)
+
+    try:
+        top_query, sub_query = field.split('.', 1)
+    except ValueError:
+        top_query = field
+        sub_query = None
+
+    if top_query in RESPONSE_ATTRIBUTES:
+        if sub_query:
+            # status_code.XX
+            return _compile_invalid_field(f'Failed to extract: {field}\n')
+        return _compile_attribute_field(top_query)
+
+    elif top_query in ['cookies', 'headers']:
+        if not sub_query:
+            return lambda resp_obj: getattr(resp_obj, top_query)
+        return _compile_mapping_field(field, top_query, sub_query)
+
+    elif top_query == 'elapsed':
+        if not sub_query:
+            return _compile_attribute_field(top_query)
+        return _compile_elapsed_field(sub_query)
+
+    elif top_query in ['content', 'text', 'json']:
+        if not sub_query:
+            return lambda resp_obj: resp_obj.get_body()
+        return _compile_content_field(field, sub_query)
+
+    else:
+        err_msg = f'Failed to extract attribute from response! => {field}\n'
+        err_msg += 'available response attributes: status_code, cookies, elapsed, headers, content, text, json, encoding, ok, reason, url.'
+        return _compile_invalid_field(err_msg)
+
+
+def compile_field(field):
+    '''
+    compile check item or extractor to accessor, choose status, header,
+    cookie or content accessor by path prefix, and precompile regex pattern.
+    accessor is compiled once and shared across all executions.
+    Args:
+        field (str): check item or extractor.
+            e.g.
+                'status_code'
+                'headers.content-type'
+                'content.data.items.0.name'
+                'LB[\d]*(.*)RB[\d]*'
+    Returns:
+        function: accessor, takes ResponseObject and returns extracted value.
+            invalid field, e.g. bad regex, is compiled to accessor raising
+            exceptions.ParamError.
+    '''
+
+    with compiled_fields_lock:
+        accessor = compiled_fields_mapping.get(field)
+        if accessor is not None:
+            compiled_fields_mapping.move_to_end(field)
+            return accessor
+
+    accessor = _compile_field(field)
+    with compiled_fields_lock:
+        compiled_fields_mapping[field] = accessor
+        while len(compiled_fields_mapping) > MAX_COMPILED_FIELDS:
+            compiled_fields_mapping.popitem(last=False)
+
+    return accessor
+
+
+def get_teststep_fields(teststep):
+    '''
+    get response fields referenced by teststep validators and extractors,
+    variable/function references and dict/list check items are excluded.
+    Args:
+        teststep (dict): teststep with validate and extract
+    Returns:
+        list: response fields, e.g. ['status_code', 'content.token']
+    '''
+
+    fields = []
+    for validator in teststep.get('validate') or []:
+        try:
+            fields.append(parser.parse_validator(validator)['check'])
+        except exceptions.ParamError:
+            continue
+
+    for extractor in teststep.get('extract') or []:
+        if isinstance(extractor, dict):
+            fields.extend(extractor.values())
+
+    return [
+        field for field in fields
+        if isinstance(field, str) and not parser.extract_variables(field)
+        and not parser.extract_functions(field)
+    ]
+
+
+def get_stream_fields(fields):
+    '''
+    get content fields which can be extracted incrementally from json body.
+    Args:
+        fields (list): response fields, e.g. ['status_code', 'content.success']
+    Returns:
+        list: content fields with sub query, e.g. ['content.success']
+    '''
+
+    stream_fields = []
+    for field in fields:
+        if text_extractor_regexp_compile.match(field):
+            continue
+
+        top_query, _, sub_query = field.partition('.')
+        if top_query in ['content', 'json'] and sub_query \
+                and field not in stream_fields:
+            stream_fields.append(field)
+
+    return stream_fields
+
+
+def is_body_required(teststep, fields):
+    '''
+    check if response body is referenced by teststep.
+    Args:
+        teststep (dict): teststep
+        fields (list): response fields got by get_teststep_fields
+    Returns:
+        bool: False if validators and extractors only touch status code,
+            headers, cookies or elapsed, and teststep has no teardown hooks.
+    '''
+
+    if teststep.get('teardown_hooks'):
+        # teardown hooks may handle $response
+        return True
+
+    for field in fields:
+        if text_extractor_regexp_compile.match(field):
+            return True
+
+        top_query = field.split('.', 1)[0]
+        if top_query in ['content', 'text', 'json']:
+            return True
+
+    return False
+
+
+def compile_teststep_fields(teststep):
+    '''
+    compile response fields of teststep at load time, and mark how response
+    body should be handled.
+        skip_body: body is never referenced, skip buffering it.
+        stream_fields: content fields for streaming extraction.
+        keep_body: body is referenced besides stream fields, keep all of it
+            in streaming mode.
+    '''
+
+    fields = get_teststep_fields(teststep)
+    for field in fields:
+        compile_field(field)
+
+    stream_fields = get_stream_fields(fields)
+    teststep['skip_body'] = not is_body_required(teststep, fields)
+    teststep['stream_fields'] = stream_fields
+    teststep['keep_body'] = is_body_required(
+        teststep, [field for field in fields if field not in stream_fields])
+
+
+class ResponseObject:
+    '''
+    lazy wrapper of requests.Response for validate and extract.
+    response body is decoded at most once, and only when a content field is
+    requested; each resolved field is cached, so several validators and
+    extractors on the same field cost one lookup.
+    in streaming mode, the response is requested with stream=True, and the
+    stream fields are extracted incrementally from json body, reading stops
+    as soon as all of them are found; the rest of body is only read if any
+    other content field is requested, and is kept on the wrapper, the
+    wrapped response is left untouched.
+    Args:
+        resp_obj (requests.Response): response object
+        stream_fields (list): content fields to be extracted in streaming mode,
+            e.g. ['content.success', 'content.count']
+        keep_body (bool): keep the whole body read in streaming mode, only
+            STREAM_MAX_RAW_SIZE bytes of it are kept for fallback if False.
+    '''
+
+    def __init__(self, resp_obj, stream_fields=None, keep_body=True):
+        self.resp_obj = resp_obj
+        self.stream_fields = stream_fields
+        self.keep_body = keep_body
+        self._stream_extractor = None
+        # body read by streaming extraction, None if not read yet
+        self._content = None
+        self._text = None
+        self._json = NOT_DECODED
+        self._json_error = None
+        self._fields_cache = {}
+
+    @property
+    def status_code(self):
+        return self.resp_obj.status_code
+
+    @property
+    def headers(self):
+        return self.resp_obj.headers
+
+    @property
+    def cookies(self):
+        return self.resp_obj.cookies.get_dict()
+
+    def _is_body_kept(self):
+        '''
+        check if body is kept on wrapper instead of wrapped response: read by
+        streaming extraction, or empty if discarded without buffering.
+        '''
+
+        return self._stream_extractor is not None \
+            or getattr(self.resp_obj, 'body_discarded', False)
+
+    @property
+    def content(self):
+        if not self._is_body_kept():
+            return self.resp_obj.content
+
+        if self._content is None:
+            if self._stream_extractor is None:
+                self._content = b''
+            else:
+                # read the rest of body consumed partially by streaming
+                self._content = self._stream_extractor.read_body()
+
+        return self._content
+
+    def _get_encoding(self):
+        return self.resp_obj.encoding \
+            or requests.compat.chardet.detect(self.content)['encoding'] \
+            or 'utf-8'
+
+    @property
+    def text(self):
+        if not self._is_body_kept():
+            return self.resp_obj.text
+
+        if self._text is None:
+            try:
+                self._text = str(self.content, self._get_encoding(),
+                                 errors='replace')
+            except LookupError:
+                self._text = str(self.content, errors='replace')
+
+        return self._text
+
+    @property
+    def json(self):
+        '''
+        decoded json body, decoded only once, failure is cached as well.
+        Raises:
+            exceptions.JSONDecodeError: body is not in json format.
+        '''
+
+        if self._json is NOT_DECODED:
+            try:
+                if not self._is_body_kept():
+                    self._json = self.resp_obj.json()
+                else:
+                    self._json = json.loads(self.text)
+            except ValueError as err:
+                self._json = NOT_JSON
+                self._json_error = err
+
+        if self._json is NOT_JSON:
+            raise self._json_error
+
+        return self._json
+
+    def get_body(self):
+        '''
+        get json body if possible, otherwise text body.
+        '''
+
+        if self._json is NOT_JSON:
+            return self.text
+
+        try:
+            return self.json
+        except (exceptions.JSONDecodeError, ValueError):
+            return self.text
+
+    def _extract_stream_fields(self):
+        '''
+        extract all stream fields from json body incrementally.
+        '''
+
+        content_paths_mapping = {
+            field: utils.compile_content_path(field.split('.', 1)[1])
+            for field in self.stream_fields
+        }
+        self._stream_extractor = streaming.StreamingJsonExtractor(
+            self.resp_obj.iter_content(STREAM_CHUNK_SIZE),
+            content_paths_mapping.values(),
+            None if self.keep_body else STREAM_MAX_RAW_SIZE)
+
+        try:
+            found_values_mapping = self._stream_extractor.extract()
+        except ValueError:
+            # body is not json, fallback to extract from whole body
+            logger.log_debug('response body is not streamable json.')
+            return
+
+        for field, content_path in content_paths_mapping.items():
+            if content_path in found_values_mapping:
+                self._fields_cache[field] = found_values_mapping[content_path]
+
+    def extract_field(self, field):
+        '''
+        extract value from response, resolved value is cached by field.
+        Args:
+            field (str): check item in validator or extractor.
+                e.g.
+                    'status_code'
+                    'headers.content-type'
+                    'content.token'
+                    'LB[\\d]*(.*)RB[\\d]*'
+        Returns:
+            extracted value.
+        '''
+
+        if not isinstance(field, str):
+            err_msg = f'Invalid extractor! => {field}\n'
+            logger.log_error(err_msg)
+            raise exceptions.ParamError(err_msg)
+
+        if self.stream_fields and self._stream_extractor is None \
+                and field in self.stream_fields:
+            self._extract_stream_fields()
+
+        if field in self._fields_cache:
+            return self._fields_cache[field]
+
+        value = compile_field(field)(self)
+        self._fields_cache[field] = value
+        logger.log_debug(f'extract: {field}\t=> {value}')
+        return value
+
+    def extract_response(self, extractors):
+        '''
+        extract value from response and save in variables mapping.
+        Args:
+            extractors (list):
+                [
+                    {'resp_status_code': 'status_code'},
+                    {'resp_headers_content_type': 'headers.content-type'},
+                    {'resp_content_person_first_name': 'content.person.name.first_name'}
+                ]
+        Returns:
+            OrderedDict: variables mapping extracted from response
+                OrderedDict({
+                    'resp_status_code': 200,
+                    'resp_headers_content_type': 'application/json',
+                    'resp_content_person_first_name': 'Leo'
+                })
+        '''
+
+        extracted_variables_mapping = OrderedDict()
+        if not extractors:
+            return extracted_variables_mapping
+
+        logger.log_info('start to extract from response object.')
+        extract_binds_order_dict = utils.convert_mappinglist_to_OrderedDict(
+            extractors)
+
+        for key, field in extract_binds_order_dict.items():
+            extracted_variables_mapping[key] = self.extract_field(field)
+
+        return extracted_variables_mapping
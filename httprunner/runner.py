@@ -0,0 +1,389 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from httprunner import (client, context, exceptions, loader, logger, parser,
+                        response, scheduler, stats)
+
+
+class Runner:
+    '''
+    run teststeps of one testcase with shared context and http session.
+    Args:
+        config (dict): testcase config
+            {
+                'name': 'smoketest',
+                'variables': [{'device_sn': '${gen_random_string(15)}'}],
+                'request': {
+                    'base_url': 'http://127.0.0.1:5000',
+                    'headers': {'device_sn': '$device_sn'},
+                    'rate_limit': {
+                        'rate': 10,
+                        'burst': 5,
+                        'apis': {'get_user': 2}
+                    }
+                }
+            }
+            rate_limit caps requests per second to host of base_url, and
+            to each api definition in apis. limiters are taken from
+            rate_limiters of http session, shared by runners of one run.
+        http_client_session (client.HttpSession): http session, created with
+            config base_url if not specified.
+        latency_stats (stats.LatencyStats): teststeps latency is recorded into
+            it, created for runner if not specified, so that latency of each
+            teststep is always recorded.
+        fixture_cache (fixture.FixtureCache): output of cacheable fixture suites
+            is reused from it.
+        project_mapping (dict): project mapping snapshot, loader.project_mapping
+            is used if not specified.
+        start_delay (float): seconds testcase started behind its intended
+            start time in fixed rate mode, every teststep is shifted by it in
+            corrected latency.
+    '''
+
+    def __init__(self,
+                 config=None,
+                 http_client_session=None,
+                 latency_stats=None,
+                 fixture_cache=None,
+                 project_mapping=None,
+                 start_delay=None):
+        config = config or {}
+        project_mapping = project_mapping or loader.project_mapping
+        confcustom_module = project_mapping['confcustom']
+
+        self.context = context.Context(
+            OrderedDict(confcustom_module['variables']),
+            confcustom_module['functions'])
+        self.http_client_session = http_client_session
+        self.latency_stats = latency_stats or stats.LatencyStats()
+        self.fixture_cache = fixture_cache
+        self.start_delay = start_delay
+        self.rate_limit = None
+        self.init_test(config, 'testcase')
+
+    def init_test(self, test_dict, level):
+        '''
+        create/update context variables binds, and parse request.
+        Args:
+            test_dict (dict): testcase config or teststep
+            level (enum): 'testcase' or 'teststep'
+        Returns:
+            dict: parsed request dict
+        '''
+
+        self.context.init_context_variables(level)
+        variables = test_dict.get('variables') or OrderedDict()
+        self.context.update_context_variables(variables, level)
+
+        request_config = test_dict.get('request', {})
+        parsed_request = self.context.get_parsed_request(
+            request_config, level)
+
+        base_url = self.context.eval_content(
+            parsed_request.pop('base_url', None))
+        if level == 'testcase':
+            self.init_rate_limit(
+                self.context.eval_content(
+                    parsed_request.pop('rate_limit', None)), base_url)
+
+        if self.http_client_session is None:
+            self.http_client_session = client.HttpSession(base_url)
+        elif base_url and not self.http_client_session.base_url:
+            self.http_client_session.base_url = base_url
+
+        return parsed_request
+
+    def init_rate_limit(self, rate_limit, base_url):
+        '''
+        parse rate limit config of testcase.
+        '''
+
+        if not rate_limit:
+            return
+
+        if not isinstance(rate_limit, dict):
+            rate_limit = {'rate': rate_limit}
+
+        self.rate_limit = {
+            'host': urlparse(base_url or '').netloc,
+            'apis': {
+                api_name: client.parse_rate_limit(api_rate_limit)
+                for api_name, api_rate_limit in rate_limit.get(
+                    'apis', {}).items()
+            }
+        }
+        if rate_limit.get('rate'):
+            self.rate_limit['rate'] = client.parse_rate_limit(rate_limit)
+
+    def get_rate_limiters(self, url, api_name):
+        '''
+        get rate limiters request should wait on.
+        Returns:
+            list: (limiter name, client.TokenBucket) tuples
+        '''
+
+        if self.rate_limit is None:
+            return []
+
+        rate_limiters = []
+        host = self.rate_limit['host']
+        if 'rate' in self.rate_limit and host and urlparse(
+                client.build_url(self.http_client_session.base_url,
+                                 url)).netloc == host:
+            name = f'host:{host}'
+            rate_limiters.append(
+                (name,
+                 self.http_client_session.rate_limiters.get(
+                     name, *self.rate_limit['rate'])))
+
+        if api_name in self.rate_limit['apis']:
+            name = f'api:{api_name}'
+            rate_limiters.append(
+                (name,
+                 self.http_client_session.rate_limiters.get(
+                     name, *self.rate_limit['apis'][api_name])))
+
+        return rate_limiters
+
+    def do_hook_actions(self, actions):
+        '''
+        evaluate setup/teardown hook actions with context.
+        '''
+
+        for action in actions or []:
+            logger.log_debug(f'call hook: {action}')
+            self.context.eval_content(action)
+
+    def _send_request(self, teststep, parsed_request):
+        try:
+            url = parsed_request.pop('url')
+            method = parsed_request.pop('method')
+        except KeyError:
+            raise exceptions.ParamError('URL or METHOD missed!')
+
+        teststep_name, api_name = stats.get_teststep_names(teststep)
+        stream_fields = teststep.get('stream_fields') \
+            if parsed_request.get('stream') else None
+
+        resp = self.http_client_session.request(
+            method,
+            url,
+            name=teststep_name,
+            skip_body=teststep.get('skip_body', False),
+            rate_limiters=self.get_rate_limiters(url, api_name),
+            hedge=teststep.get('hedge', False),
+            **parsed_request)
+
+        intended_start = actual_start = None
+        if self.start_delay is not None:
+            actual_start = resp.started_at
+            intended_start = actual_start - self.start_delay
+        self.latency_stats.record(teststep_name, api_name,
+                                  resp.elapsed_seconds, intended_start,
+                                  actual_start)
+        for limiter_name, waited in resp.rate_limit_waits:
+            self.latency_stats.record_rate_limit_wait(limiter_name, waited)
+
+        return response.ResponseObject(resp, stream_fields,
+                                       teststep.get('keep_body', True))
+
+    def run_test(self, teststep):
+        '''
+        run single teststep.
+        Args:
+            teststep (dict): teststep info
+                {
+                    'name': 'get user 1000',
+                    'variables': [],
+                    'request': {'url': '/api/users/1000', 'method': 'GET'},
+                    'extract': [{'token': 'content.token'}],
+                    'validate': [{'eq': ['status_code', 200]}],
+                    'setup_hooks': [],
+                    'teardown_hooks': [],
+                    'hedge': False
+                }
+        Raises:
+            exceptions.ParamError
+            exceptions.ExtractFailure
+            exceptions.VaildationFailure
+        '''
+
+        if 'teststeps' in teststep:
+            self.run_fixture(teststep)
+            return
+
+        extractors = teststep.get('extract', [])
+        validators = teststep.get('validate', [])
+
+        parsed_request = self.init_test(teststep, 'teststep')
+        self.context.update_teststep_variables_mapping(
+            'request', parsed_request)
+        self.do_hook_actions(teststep.get('setup_hooks'))
+
+        resp_obj = self._send_request(teststep, parsed_request)
+        try:
+            if teststep.get('teardown_hooks'):
+                self.context.update_teststep_variables_mapping(
+                    'response', resp_obj)
+                self.do_hook_actions(teststep['teardown_hooks'])
+
+            extracted_variables_mapping = resp_obj.extract_response(
+                extractors)
+            self.context.update_testcase_runtime_variables_mapping(
+                extracted_variables_mapping)
+
+            self.context.validate(validators, resp_obj)
+        finally:
+            # release connection of partially read streaming response
+            resp_obj.resp_obj.close()
+
+    def fork(self):
+        '''
+        fork runner with a snapshot of current context, sharing http session
+        and stats, so that teststep can be run concurrently with others.
+        '''
+
+        forked_runner = copy.copy(self)
+        forked_context = copy.copy(self.context)
+        forked_context.testcase_runtime_variables_mapping = copy.copy(
+            self.context.testcase_runtime_variables_mapping)
+        forked_context.teststep_variables_mapping = copy.copy(
+            self.context.teststep_variables_mapping)
+        forked_context.evaluated_validators = []
+        forked_runner.context = forked_context
+        return forked_runner
+
+    def merge_outputs(self, forked_runner, outputs=None):
+        '''
+        merge variables output by teststep run in forked runner.
+        Args:
+            forked_runner (Runner): runner forked by fork()
+            outputs (set): output variable names, all runtime variables
+                are merged if None.
+        '''
+
+        variables_mapping = \
+            forked_runner.context.testcase_runtime_variables_mapping
+        if outputs is None:
+            outputs = variables_mapping.keys()
+
+        self.context.update_testcase_runtime_variables_mapping(
+            OrderedDict((name, variables_mapping[name]) for name in outputs
+                        if name in variables_mapping))
+
+    def get_fixture_key(self, fixture):
+        '''
+        get fixture name and cache key. with 'args' scope, key is evaluated
+        suite reference args, with 'suite' scope, fixture is shared by all
+        testcases whatever args are.
+        Returns:
+            tuple: (fixture name, cache key)
+        '''
+
+        function_meta = parser.parse_function(fixture['suite'])
+        args = []
+        if fixture['cache']['scope'] == 'args':
+            args = self.context.eval_content(function_meta['args'])
+
+        return function_meta['func_name'], json.dumps(args, default=str)
+
+    def run_fixture(self, fixture):
+        '''
+        run fixture teststep loaded from cacheable suite reference. output
+        variables are taken from fixture cache if cached, otherwise suite
+        teststeps are run and output variables are cached. runners missing
+        cache of the same key at the same time run suite only once.
+        Args:
+            fixture (dict): fixture teststep
+                {
+                    'name': 'setup and reset all.',
+                    'suite': 'setup_and_reset($device_sn)',
+                    'cache': {'ttl': 300, 'scope': 'suite'},
+                    'output': ['token', 'device_sn'],
+                    'teststeps': [teststep1, teststep2]
+                }
+        Raises:
+            exceptions.VariableNotFound: output variable is not found.
+        '''
+
+        if self.fixture_cache is None:
+            for teststep in fixture['teststeps']:
+                self.run_test(teststep)
+            return
+
+        def run():
+            for teststep in fixture['teststeps']:
+                self.run_test(teststep)
+
+            output = OrderedDict()
+            variables_mapping = self.context.testcase_runtime_variables_mapping
+            for variable_name in fixture['output']:
+                if variable_name not in variables_mapping:
+                    err_msg = \
+                        f'fixture output variable not found: {variable_name}'
+                    logger.log_error(err_msg)
+                    raise exceptions.VariableNotFound(err_msg)
+                output[variable_name] = variables_mapping[variable_name]
+
+            return output
+
+        name, key = self.get_fixture_key(fixture)
+        output, reused = self.fixture_cache.get_or_run(
+            name, key, run, fixture['cache']['ttl'])
+        if reused:
+            logger.log_debug(f'reuse fixture output: {name}')
+            self.context.update_testcase_runtime_variables_mapping(output)
+
+
+def run_testcase(testcase,
+                 http_client_session=None,
+                 latency_stats=None,
+                 fixture_cache=None,
+                 parallel=False,
+                 max_workers=8,
+                 project_mapping=None,
+                 should_abort=None,
+                 start_delay=None):
+    '''
+    run all teststeps of testcase, in order by default.
+    Args:
+        testcase (dict): testcase loaded by loader.load_testcases
+            {
+                'config': {},
+                'teststeps': [teststep1, teststep2]
+            }
+        parallel (bool): run independent teststeps concurrently by variables
+            dependency graph, non-idempotent requests, hooks and fixtures
+            are kept in order as barriers.
+        max_workers (int): max teststeps run concurrently in parallel mode.
+        project_mapping (dict): project mapping snapshot shared by runners.
+        should_abort (callable): checked before each teststep in sequential
+            mode, remaining teststeps are cancelled once it returns True.
+        start_delay (float): seconds testcase started behind its intended
+            start time in fixed rate mode.
+    Returns:
+        Runner: runner with context after all teststeps are run, and
+            latency of each teststep in its latency_stats.
+    Raises:
+        exceptions.RunAborted: teststeps are cancelled by should_abort.
+    '''
+
+    test_runner = Runner(testcase.get('config'), http_client_session,
+                         latency_stats, fixture_cache, project_mapping,
+                         start_delay)
+    if parallel:
+        scheduler.run_teststeps_parallel(test_runner, testcase['teststeps'],
+                                         max_workers)
+    else:
+        for teststep in testcase['teststeps']:
+            if should_abort is not None and should_abort():
+                raise exceptions.RunAborted(
+                    f"testcase aborted before teststep: {teststep.get('name')}")
+            test_runner.run_test(teststep)
+
+    return test_runner
@@ -0,0 +1,203 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+
+from httprunner import logger, parser, utils
+
+# methods without side effects, teststeps with other methods are barriers
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS']
+
+###############################################################################
+#   teststeps dependency analysis
+###############################################################################
+
+
+def _extract_content_variables(content, variables):
+    if isinstance(content, dict):
+        for key, value in content.items():
+            _extract_content_variables(key, variables)
+            _extract_content_variables(value, variables)
+    elif isinstance(content, (list, tuple, set)):
+        for item in content:
+            _extract_content_variables(item, variables)
+    elif isinstance(content, str):
+        variables.update(parser.extract_variables(content))
+
+
+def get_teststep_references(teststep, shared_request=None):
+    '''
+    get variables referenced by teststep, variables defined in teststep
+    itself are excluded.
+    Args:
+        teststep (dict): teststep
+            {
+                'name': 'get user $uid',
+                'variables': [{'uid': 1000}],
+                'request': {'url': '/api/users/$uid', 'headers': {'token': '$token'}},
+                'validate': [{'eq': ['content.uid', '$uid']}]
+            }
+        shared_request (dict): request in testcase config, merged into
+            request of every teststep, e.g. {'headers': {'token': '$token'}}
+    Returns:
+        set: referenced variable names, e.g. {'token'}
+    '''
+
+    references = set()
+    for key, value in teststep.items():
+        if key in ['name', 'function_meta', 'skip_body', 'stream_fields']:
+            continue
+        _extract_content_variables(value, references)
+
+    if shared_request:
+        _extract_content_variables(shared_request, references)
+
+    variables = teststep.get('variables') or {}
+    if isinstance(variables, list):
+        variables = utils.convert_mappinglist_to_OrderedDict(variables)
+
+    return references - set(variables)
+
+
+def get_teststep_outputs(teststep):
+    '''
+    get variables teststep outputs to testcase context.
+    Returns:
+        set: extracted variables and fixture output variables.
+    '''
+
+    outputs = set(teststep.get('output') or [])
+    for extractor in teststep.get('extract') or []:
+        outputs.update(extractor)
+
+    return outputs
+
+
+def is_barrier(teststep):
+    '''
+    teststep is a barrier if it may have side effects: non-idempotent
+    request, hooks, or fixture suite. barrier runs after all teststeps
+    before it, and all teststeps after it wait for it.
+    '''
+
+    if 'teststeps' in teststep:
+        return True
+
+    if teststep.get('setup_hooks') or teststep.get('teardown_hooks'):
+        return True
+
+    method = teststep.get('request', {}).get('method', 'GET')
+    return not isinstance(method, str) \
+        or method.upper() not in IDEMPOTENT_METHODS
+
+
+def build_teststeps_dependencies(teststeps, shared_request=None):
+    '''
+    build dependency graph of teststeps. a teststep depends on an earlier
+    teststep if it references variables output by it, outputs variables
+    referenced or output by it, or either of them is a barrier.
+    Args:
+        teststeps (list): teststeps of testcase
+        shared_request (dict): request in testcase config, variables in it
+            are referenced by every teststep.
+    Returns:
+        list: predecessor indexes set of each teststep.
+            e.g. [set(), {0}, {0}, {0, 1, 2}]
+    '''
+
+    dependencies = []
+    teststeps_meta = []
+    last_barrier = None
+
+    for index, teststep in enumerate(teststeps):
+        references = get_teststep_references(teststep, shared_request)
+        outputs = get_teststep_outputs(teststep)
+        barrier = is_barrier(teststep)
+
+        if barrier:
+            predecessors = set(range(index))
+        else:
+            predecessors = set() if last_barrier is None else {last_barrier}
+            for prev_index, (prev_references, prev_outputs) in enumerate(
+                    teststeps_meta):
+                if prev_outputs & (references | outputs) \
+                        or outputs & prev_references:
+                    predecessors.add(prev_index)
+
+        if barrier:
+            last_barrier = index
+
+        dependencies.append(predecessors)
+        teststeps_meta.append((references, outputs))
+
+    return dependencies
+
+
+###############################################################################
+#   parallel teststeps execution
+###############################################################################
+
+
+def run_teststeps_parallel(test_runner, teststeps, max_workers=8):
+    '''
+    run independent teststeps concurrently by dependency graph. each
+    teststep is run by runner forked with current context, and its output
+    variables are merged back into testcase context once it finishes.
+    Args:
+        test_runner (runner.Runner): testcase runner
+        teststeps (list): teststeps of testcase
+        max_workers (int): max teststeps run concurrently
+    Raises:
+        exception raised by the first failed teststep, teststeps not
+        started yet are cancelled.
+    '''
+
+    dependencies = build_teststeps_dependencies(
+        teststeps, test_runner.context.TESTCASE_SHARED_REQUSET_MAPPING)
+    pending = list(range(len(teststeps)))
+    finished = set()
+    running = {}
+    error = None
+
+    def run_forked(forked_runner, teststep):
+        forked_runner.run_test(teststep)
+        return forked_runner
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        while pending or running:
+            if error is None:
+                for index in list(pending):
+                    if dependencies[index] <= finished:
+                        pending.remove(index)
+                        future = executor.submit(run_forked,
+                                                 test_runner.fork(),
+                                                 teststeps[index])
+                        running[future] = index
+            else:
+                pending = []
+
+            if not running:
+                break
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    forked_runner = future.result()
+                except Exception as err:
+                    logger.log_error(
+                        f"teststep failed: {teststeps[index].get('name')}")
+                    if error is None:
+                        error = err
+                    continue
+
+                teststep = teststeps[index]
+                # barrier may change any variable, as if run in sequence
+                outputs = None if is_barrier(teststep) \
+                    else get_teststep_outputs(teststep)
+                test_runner.merge_outputs(forked_runner, outputs)
+                finished.add(index)
+
+    if error is not None:
+        raise error
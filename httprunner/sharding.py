@@ -0,0 +1,216 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import heapq
+import json
+import os
+import statistics
+import threading
+import time
+
+from httprunner import exceptions, loader, logger, pool
+
+DURATION_STORE_PATH = '.httprunner_durations.json'
+DEFAULT_DURATION = 1.0
+
+
+def get_testcase_key(testcase):
+    '''
+    get duration key of testcase: path of testcase file relative to project
+    working directory, so that testcases sharing the same name are kept
+    apart, and keys are the same in every checkout. config name is used
+    for testcase not loaded from file.
+    '''
+
+    path = testcase.get('path')
+    if not path:
+        return testcase.get('config', {}).get('name', '')
+
+    if loader.project_working_directory:
+        path = os.path.relpath(path, loader.project_working_directory)
+    return path.replace(os.sep, '/')
+
+
+class DurationStore:
+    '''
+    small local store of testcase durations measured in previous runs.
+    durations are smoothed with exponential moving average, so that one slow
+    run does not reorder shards much.
+    Args:
+        path (str): json file path, created on save if not exists
+        alpha (float): weight of latest duration
+    Examples:
+        >>> duration_store = DurationStore('.httprunner_durations.json')
+        >>> duration_store.update('testcases/smoketest.yml', 1.2)
+        >>> duration_store.save()
+    '''
+
+    def __init__(self, path=DURATION_STORE_PATH, alpha=0.5):
+        if not 0 < alpha <= 1:
+            raise exceptions.ParamError(f'invalid alpha: {alpha}')
+
+        self.path = path
+        self.alpha = alpha
+        self.durations = {}
+        self.lock = threading.Lock()
+
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.durations = json.load(f)
+            except ValueError:
+                logger.log_warning(f'invalid duration store, ignored: {path}')
+
+    def get(self, key, default=None):
+        return self.durations.get(key, default)
+
+    def get_default(self):
+        '''
+        duration estimated for testcase never run: median of known durations.
+        '''
+
+        if not self.durations:
+            return DEFAULT_DURATION
+
+        return statistics.median(self.durations.values())
+
+    def update(self, key, duration):
+        with self.lock:
+            if key in self.durations:
+                duration = self.alpha * duration \
+                    + (1 - self.alpha) * self.durations[key]
+            self.durations[key] = duration
+
+    def save(self):
+        with self.lock:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.durations, f, indent=2, sort_keys=True)
+
+
+def assign_shards(testcases, shards, duration_store=None):
+    '''
+    assign testcases to shards longest-processing-time-first: testcases are
+    sorted by expected duration descending, and each is assigned to the shard
+    with least expected load so far.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        shards (int): shards count
+        duration_store (DurationStore): durations of previous runs, all
+            testcases are expected to take the same time if not specified.
+    Returns:
+        list: assigned testcases and expected load of each shard
+            [
+                {'testcases': [testcase1, testcase3], 'predicted': 2.5},
+                {'testcases': [testcase2], 'predicted': 2.1}
+            ]
+    '''
+
+    if shards < 1:
+        raise exceptions.ParamError(f'invalid shards count: {shards}')
+
+    default_duration = duration_store.get_default() \
+        if duration_store else DEFAULT_DURATION
+
+    def get_duration(testcase):
+        if duration_store is None:
+            return default_duration
+        return duration_store.get(get_testcase_key(testcase),
+                                  default_duration)
+
+    # stable for equal durations, so that assignment is reproducible
+    jobs = sorted(enumerate(testcases),
+                  key=lambda item: (-get_duration(item[1]), item[0]))
+
+    assignment = [{'testcases': [], 'predicted': 0} for _ in range(shards)]
+    loads = [(0, index) for index in range(shards)]
+    for _, testcase in jobs:
+        load, index = heapq.heappop(loads)
+        load += get_duration(testcase)
+        assignment[index]['testcases'].append(testcase)
+        assignment[index]['predicted'] = load
+        heapq.heappush(loads, (load, index))
+
+    return assignment
+
+
+def get_shard(testcases, shard_index, shards, duration_store=None):
+    '''
+    get testcases of one shard, e.g. for the CI job running this shard.
+    every job computes the same assignment from the same duration store.
+    '''
+
+    if not 0 <= shard_index < shards:
+        raise exceptions.ParamError(
+            f'invalid shard index: {shard_index} of {shards}')
+
+    return assign_shards(testcases, shards,
+                         duration_store)[shard_index]['testcases']
+
+
+def run_sharded(testcases, shards, duration_store=None, save=True):
+    '''
+    run shards in parallel, one worker thread each, and record duration of
+    each testcase into duration store.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+        shards (int): shards count
+        duration_store (DurationStore): durations of previous runs
+        save (bool): save duration store after run
+    Returns:
+        dict: run result, durations in seconds
+            {
+                'total': 4,
+                'successes': 4,
+                'failures': 0,
+                'errors': [],
+                'predicted_makespan': 2.5,
+                'actual_makespan': 2.7,
+                'shards': [{'testcases': 2, 'predicted': 2.5, 'actual': 2.7}]
+            }
+    '''
+
+    assignment = assign_shards(testcases, shards, duration_store)
+    pool_runner = pool.ThreadPoolRunner(shards)
+
+    def run_shard(shard):
+        errors = []
+        start_at = time.perf_counter()
+        for testcase in shard['testcases']:
+            testcase_start_at = time.perf_counter()
+            error = pool_runner.run_testcase_safely(testcase)
+            if error is not None:
+                errors.append(error)
+            if duration_store is not None:
+                duration_store.update(
+                    get_testcase_key(testcase),
+                    time.perf_counter() - testcase_start_at)
+
+        return errors, time.perf_counter() - start_at
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(shards) as executor:
+            results = list(executor.map(run_shard, assignment))
+    finally:
+        pool_runner.close()
+
+    if duration_store is not None and save:
+        duration_store.save()
+
+    errors = [error for shard_errors, _ in results for error in shard_errors]
+    report = {
+        'total': len(testcases),
+        'successes': len(testcases) - len(errors),
+        'failures': len(errors),
+        'errors': errors,
+        'predicted_makespan': max(shard['predicted'] for shard in assignment),
+        'actual_makespan': max(duration for _, duration in results),
+        'shards': [{
+            'testcases': len(shard['testcases']),
+            'predicted': shard['predicted'],
+            'actual': duration
+        } for shard, (_, duration) in zip(assignment, results)]
+    }
+    logger.log_info(f'predicted makespan: {report["predicted_makespan"]:.3f}s, '
+                    f'actual makespan: {report["actual_makespan"]:.3f}s')
+    return report
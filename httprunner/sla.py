@@ -0,0 +1,234 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from httprunner import exceptions, loader, logger, stats, utils
+
+LATENCY_METRICS = ['min', 'mean', 'p50', 'p90', 'p99', 'p99.9', 'max']
+RUN_METRICS = ['error_rate', 'throughput', 'count']
+
+
+def parse_sla_validator(validator):
+    '''
+    parse testcase level SLA validator in config.
+    key is metric name joined with comparator alias by underscore, and value
+    is expect value, or [teststep/api name, expect value] for one teststep.
+    Args:
+        validator (dict): SLA validator
+            {'p99_lt': ['get_user', 200]}
+            {'error_rate_lt': 0.01}
+    Returns:
+        dict: parsed validator
+            {
+                'metric': 'p99',
+                'name': 'get_user',
+                'comparator': 'less_than',
+                'expect': 200
+            }
+    Raises:
+        exceptions.ParamError: validator format error or unknown metric.
+    '''
+
+    if not isinstance(validator, dict) or len(validator) != 1:
+        raise exceptions.ParamError(f'invalid SLA validator: {validator}')
+
+    key, value = list(validator.items())[0]
+    for metric in sorted(LATENCY_METRICS + RUN_METRICS,
+                         key=len,
+                         reverse=True):
+        if key.startswith(metric + '_'):
+            comparator = key[len(metric) + 1:]
+            break
+    else:
+        raise exceptions.ParamError(f'unknown SLA metric: {key}')
+
+    if isinstance(value, list):
+        if len(value) != 2:
+            raise exceptions.ParamError(f'invalid SLA validator: {validator}')
+        name, expect = value
+        if metric == 'error_rate':
+            raise exceptions.ParamError(
+                f'error rate is only measured for whole run: {validator}')
+    else:
+        name, expect = None, value
+
+    return {
+        'metric': metric,
+        'name': name,
+        'comparator': utils.get_uniform_comparator(comparator),
+        'expect': expect
+    }
+
+
+def parse_sla(validators):
+    '''
+    parse SLA validators in testcase config, so that typos are reported
+    before run instead of after it.
+    Args:
+        validators (list): SLA validators in testcase config
+    Returns:
+        list: parsed validators
+    Raises:
+        exceptions.ParamError: validators format error or unknown metric.
+    '''
+
+    if not isinstance(validators, list):
+        raise exceptions.ParamError(
+            f'SLA validators should be list: {validators}')
+
+    return [parse_sla_validator(validator) for validator in validators]
+
+
+def check_testcase_sla(testcase, project_mapping=None):
+    '''
+    check SLA validators of testcase and their comparators before run.
+    Args:
+        testcase (dict): testcase with `sla` in config
+        project_mapping (dict): project snapshot comparators are taken from,
+            loader.project_mapping if not specified.
+    Raises:
+        exceptions.ParamError: invalid SLA validators or comparators.
+    '''
+
+    config = testcase.get('config', {})
+    name = config.get('name', '')
+    try:
+        parsed_validators = parse_sla(config['sla'])
+    except exceptions.ParamError as err:
+        err_msg = f'invalid SLA of testcase {name}: {err}'
+        logger.log_error(err_msg)
+        raise exceptions.ParamError(err_msg)
+
+    project_mapping = project_mapping or loader.project_mapping
+    functions = project_mapping['confcustom']['functions']
+    for parsed_validator in parsed_validators:
+        if parsed_validator['comparator'] not in functions:
+            err_msg = f'invalid SLA of testcase {name}, comparator not ' \
+                f"found: {parsed_validator['comparator']}"
+            logger.log_error(err_msg)
+            raise exceptions.ParamError(err_msg)
+
+
+def get_metric_value(metric, name, latency_stats, result):
+    '''
+    get metric value of testcase, latency in milliseconds.
+    Args:
+        metric (str): metric name
+        name (str): teststep or api name, whole testcase if None
+        latency_stats (stats.LatencyStats): latency stats of testcase
+        result (dict): run result of testcase, with total, failures and
+            duration.
+    Raises:
+        exceptions.NotFoundError: teststep or api has no samples.
+    '''
+
+    if name is None:
+        if metric == 'error_rate':
+            return result['failures'] / result['total'] \
+                if result['total'] else 0
+        elif metric in ['throughput', 'count']:
+            count = result['total']
+            if metric == 'count':
+                return count
+            return count / result['duration'] if result['duration'] else 0
+
+        histogram = stats.LatencyHistogram(latency_stats.significant_bits)
+        with latency_stats.lock:
+            for teststep_histogram in \
+                    latency_stats.teststeps_histograms.values():
+                histogram.merge(teststep_histogram)
+    else:
+        with latency_stats.lock:
+            histogram = latency_stats.teststeps_histograms.get(name) \
+                or latency_stats.apis_histograms.get(name)
+        if histogram is None:
+            raise exceptions.NotFoundError(
+                f'teststep or api not found in latency stats: {name}')
+
+    return histogram.get_summary(result.get('duration'))[metric]
+
+
+def evaluate_sla(validators, latency_stats, result, project_mapping=None):
+    '''
+    evaluate SLA validators of one testcase against its latency stats and
+    result. validator of teststep or api without samples fails.
+    Args:
+        validators (list): SLA validators in testcase config
+        latency_stats (stats.LatencyStats): latency stats of testcase
+        result (dict): run result of testcase, with total, failures and
+            duration.
+        project_mapping (dict): project snapshot comparators are taken from,
+            loader.project_mapping if not specified.
+    Returns:
+        list: evaluated validators, with check_value and check_result
+            [
+                {
+                    'check': 'p99 of get_user',
+                    'check_value': 120.5,
+                    'comparator': 'less_than',
+                    'expect': 200,
+                    'check_result': 'pass'
+                }
+            ]
+    '''
+
+    project_mapping = project_mapping or loader.project_mapping
+    functions = project_mapping['confcustom']['functions']
+    evaluated_validators = []
+
+    for validator in validators:
+        parsed_validator = parse_sla_validator(validator)
+        metric = parsed_validator['metric']
+        name = parsed_validator['name']
+        comparator = parsed_validator['comparator']
+        expect_value = parsed_validator['expect']
+
+        validate_func = functions.get(comparator)
+        if not validate_func:
+            raise exceptions.FunctionNotFound(
+                f'comparator not found: {comparator}')
+
+        check_item = f'{metric} of {name}' if name else metric
+        validate_msg = f'SLA validator: {check_item} {comparator} {expect_value}'
+
+        try:
+            check_value = get_metric_value(metric, name, latency_stats,
+                                           result)
+        except exceptions.NotFoundError:
+            check_value = None
+            check_result = 'fail'
+            logger.log_error(validate_msg + '\t==> fail, no samples')
+        else:
+            try:
+                validate_func(check_value, expect_value)
+                check_result = 'pass'
+                logger.log_debug(validate_msg + '\t==> pass')
+            except (AssertionError, TypeError):
+                check_result = 'fail'
+                logger.log_error(
+                    validate_msg + f'\t==> fail, check value: {check_value}')
+
+        evaluated_validators.append({
+            'check': check_item,
+            'check_value': check_value,
+            'comparator': comparator,
+            'expect': expect_value,
+            'check_result': check_result
+        })
+
+    return evaluated_validators
+
+
+def validate_sla(validators, latency_stats, result, project_mapping=None):
+    '''
+    evaluate SLA validators and fail if any of them fails.
+    Raises:
+        exceptions.VaildationFailure: any SLA validator fails.
+    '''
+
+    evaluated_validators = evaluate_sla(validators, latency_stats, result,
+                                        project_mapping)
+    if any(validator['check_result'] == 'fail'
+           for validator in evaluated_validators):
+        raise exceptions.VaildationFailure
+
+    return evaluated_validators
@@ -0,0 +1,173 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import importlib
+import io
+import pickle
+import struct
+import sys
+import types
+import zlib
+
+from httprunner import exceptions, loader, logger, utils
+
+# snapshot layout:
+#   MAGIC
+#   project working directory length (uint16) + project working directory
+#   zlib compressed pickle of project mapping and testcases
+MAGIC = b'HRSNAPSHOT1\n'
+PATH_HEADER = struct.Struct('<H')
+FUNCTION_TYPES = (types.FunctionType, types.BuiltinFunctionType)
+
+
+class _SnapshotPickler(pickle.Pickler):
+    '''
+    pickler recording functions by module reference, so that snapshot only
+    carries module and qualified name of each function.
+    '''
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, FUNCTION_TYPES):
+            return None
+
+        module_name = getattr(obj, '__module__', None)
+        qualname = getattr(obj, '__qualname__', None)
+        try:
+            resolved = _resolve_function(module_name, qualname)
+        except exceptions.FunctionNotFound:
+            resolved = None
+
+        if resolved is not obj:
+            err_msg = f'function can not be referenced by module: {obj!r}'
+            logger.log_error(err_msg)
+            raise exceptions.ParamError(err_msg)
+
+        return ('function', module_name, qualname)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        _, module_name, qualname = pid
+        return _resolve_function(module_name, qualname)
+
+
+def _resolve_function(module_name, qualname):
+    '''
+    import function by module name and qualified name.
+    Raises:
+        exceptions.FunctionNotFound: module or function not found.
+    '''
+
+    if not module_name or not qualname or '<' in qualname:
+        raise exceptions.FunctionNotFound(f'{module_name}.{qualname}')
+
+    try:
+        item = importlib.import_module(module_name)
+        for attr in qualname.split('.'):
+            item = getattr(item, attr)
+    except (ImportError, AttributeError):
+        raise exceptions.FunctionNotFound(f'{module_name}.{qualname}')
+
+    return item
+
+
+def dump_snapshot(testcases=None):
+    '''
+    dump loaded project mapping and expanded testcases into compact bytes.
+    functions of confcustom.py and built_in module are recorded by module
+    reference instead of being re-discovered by worker.
+    Args:
+        testcases (list): testcases loaded by loader.load_testcases
+    Returns:
+        bytes: project snapshot
+    Raises:
+        exceptions.ParamError: function or variable can not be serialized.
+    '''
+
+    content = {
+        'project_mapping': {
+            'confcustom': {
+                'variables': dict(
+                    loader.project_mapping['confcustom']['variables']),
+                'functions': dict(
+                    loader.project_mapping['confcustom']['functions'])
+            },
+            'env': dict(loader.project_mapping['env']),
+            'def-api': loader.project_mapping['def-api'],
+            'def-testcase': loader.project_mapping['def-testcase']
+        },
+        'testcases': testcases or []
+    }
+
+    buffer = io.BytesIO()
+    try:
+        _SnapshotPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(content)
+    except (pickle.PicklingError, TypeError, AttributeError) as err:
+        err_msg = f'project can not be serialized: {err}'
+        logger.log_error(err_msg)
+        raise exceptions.ParamError(err_msg)
+
+    path_bytes = loader.project_working_directory.encode('utf-8')
+    return MAGIC + PATH_HEADER.pack(len(path_bytes)) + path_bytes \
+        + zlib.compress(buffer.getvalue())
+
+
+def load_snapshot(data):
+    '''
+    boot project from snapshot without locating and loading project files.
+    loader.project_mapping is replaced by snapshot content.
+    Args:
+        data (bytes): snapshot dumped by dump_snapshot
+    Returns:
+        list: expanded testcases in snapshot
+    Raises:
+        exceptions.FileFormatError: data is not project snapshot.
+        exceptions.FunctionNotFound: referenced function can not be imported.
+    '''
+
+    try:
+        if not data.startswith(MAGIC):
+            raise ValueError
+        offset = len(MAGIC)
+        path_length, = PATH_HEADER.unpack_from(data, offset)
+        offset += PATH_HEADER.size
+        project_working_directory = data[offset:offset +
+                                         path_length].decode('utf-8')
+        content = zlib.decompress(data[offset + path_length:])
+    except (ValueError, struct.error, zlib.error):
+        err_msg = 'project snapshot format error'
+        logger.log_error(err_msg)
+        raise exceptions.FileFormatError(err_msg)
+
+    # confcustom.py is imported from project working directory
+    if project_working_directory not in sys.path:
+        sys.path.insert(0, project_working_directory)
+    snapshot = _SnapshotUnpickler(io.BytesIO(content)).load()
+
+    loader.reset_loader()
+    loader.project_working_directory = project_working_directory
+    for key, value in snapshot['project_mapping'].items():
+        loader.project_mapping[key] = value
+    utils.set_os_environ(snapshot['project_mapping']['env'])
+
+    return snapshot['testcases']
+
+
+def save_snapshot(path, testcases=None):
+    '''
+    dump project snapshot into file.
+    '''
+
+    with open(path, 'wb') as f:
+        f.write(dump_snapshot(testcases))
+
+
+def load_snapshot_file(path):
+    '''
+    boot project from snapshot file.
+    Returns:
+        list: expanded testcases in snapshot
+    '''
+
+    with open(path, 'rb') as f:
+        return load_snapshot(f.read())
@@ -0,0 +1,707 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from httprunner import exceptions
+
+REPORT_PERCENTILES = [50, 90, 99, 99.9]
+
+# version, significant_bits, highest_trackable_value, total_count,
+# total_value, min_value, max_value, buckets count
+HISTOGRAM_HEADER = struct.Struct('<BBQQQQQI')
+HISTOGRAM_VERSION = 1
+
+# version, significant_bits, start_at, last_record_at
+STATS_HEADER = struct.Struct('<BBdd')
+STATS_VERSION = 2
+STATS_HISTOGRAMS_MAPPINGS = [
+    'teststeps_histograms', 'apis_histograms',
+    'corrected_teststeps_histograms', 'corrected_apis_histograms',
+    'rate_limit_waits_histograms'
+]
+
+###############################################################################
+#   varint encoding
+###############################################################################
+
+
+def _encode_varint(value, buffer):
+    '''
+    append unsigned integer to bytearray buffer in LEB128 varint format.
+    '''
+
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _decode_varint(data, offset):
+    '''
+    decode LEB128 varint from data at offset.
+    Returns:
+        tuple: (decoded value, next offset)
+    '''
+
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+###############################################################################
+#   latency histogram
+###############################################################################
+
+
+class LatencyHistogram:
+    '''
+    fixed memory log-linear latency histogram, in HDR histogram style.
+    values are recorded in microseconds. values below 2 ** significant_bits are
+    counted exactly, each following power of two range is split into
+    2 ** (significant_bits - 1) linear sub buckets, so any reported value is
+    within 1 / 2 ** (significant_bits - 1) of the recorded value.
+    Args:
+        significant_bits (int): sub bucket precision, between 2 and 15.
+            default 8, relative error < 0.79%
+        highest_trackable_value (int): values above it are clamped,
+            default 1 hour in microseconds.
+    '''
+
+    def __init__(self, significant_bits=8, highest_trackable_value=3600 * 10**6):
+        if not 1 < significant_bits < 16:
+            raise exceptions.ParamError(
+                f'significant_bits should be between 2 and 15: {significant_bits}'
+            )
+
+        self.significant_bits = significant_bits
+        self.highest_trackable_value = highest_trackable_value
+        self._sub_bucket_count = 1 << significant_bits
+        self._half_bucket_bits = significant_bits - 1
+
+        counts_len = self._get_bucket_index(highest_trackable_value) + 1
+        self._counts = array('Q', bytes(8 * counts_len))
+
+        self.total_count = 0
+        self.total_value = 0
+        self.min_value = highest_trackable_value
+        self.max_value = 0
+
+    @property
+    def relative_error(self):
+        '''
+        upper bound of relative error of any reported value.
+        '''
+        return 1 / (1 << self._half_bucket_bits)
+
+    def _get_bucket_index(self, value):
+        '''
+        get counts index of value, O(1) with integer arithmetic only.
+        '''
+
+        if value < self._sub_bucket_count:
+            return value
+
+        exponent = value.bit_length() - self.significant_bits
+        return (exponent << self._half_bucket_bits) + (value >> exponent)
+
+    def _get_bucket_range(self, index):
+        '''
+        get lowest and highest equivalent value of bucket index.
+        '''
+
+        if index < self._sub_bucket_count:
+            return index, index
+
+        exponent = (index >> self._half_bucket_bits) - 1
+        mantissa = index - (exponent << self._half_bucket_bits)
+        lowest_value = mantissa << exponent
+        return lowest_value, lowest_value + (1 << exponent) - 1
+
+    def record(self, value):
+        '''
+        record one latency value in microseconds.
+        '''
+
+        if value < 0:
+            value = 0
+        elif value > self.highest_trackable_value:
+            value = self.highest_trackable_value
+
+        self._counts[self._get_bucket_index(value)] += 1
+        self.total_count += 1
+        self.total_value += value
+
+        if value > self.max_value:
+            self.max_value = value
+        if value < self.min_value:
+            self.min_value = value
+
+    def record_corrected(self, value, expected_interval):
+        '''
+        record one latency value and back-fill the samples which a fixed rate
+        runner would have sent while waiting for it, to correct coordinated omission.
+        Args:
+            value (int): latency in microseconds
+            expected_interval (int): expected interval between requests in microseconds
+        '''
+
+        self.record(value)
+        if expected_interval <= 0:
+            return
+
+        # missing values are value - k * expected_interval for k in
+        # 1..last_k, added per bucket in closed form instead of one by one
+        last_k = value // expected_interval - 1
+        k = 1
+        while k <= last_k:
+            missing_value = value - k * expected_interval
+            if missing_value > self.highest_trackable_value:
+                # clamped into highest bucket, as record does
+                end_k = min(
+                    (value - self.highest_trackable_value - 1) //
+                    expected_interval, last_k)
+                count = end_k - k + 1
+                index = self._get_bucket_index(self.highest_trackable_value)
+                total_value = count * self.highest_trackable_value
+            else:
+                index = self._get_bucket_index(missing_value)
+                lowest_value = self._get_bucket_range(index)[0]
+                end_k = min((value - lowest_value) // expected_interval,
+                            last_k)
+                count = end_k - k + 1
+                total_value = count * value \
+                    - expected_interval * (k + end_k) * count // 2
+
+            self._counts[index] += count
+            self.total_count += count
+            self.total_value += total_value
+            k = end_k + 1
+
+        if last_k >= 1:
+            self.min_value = min(
+                self.min_value,
+                min(value - last_k * expected_interval,
+                    self.highest_trackable_value))
+
+    def merge(self, other):
+        '''
+        merge other histogram counts into this histogram.
+        merging is associative and commutative, merged percentiles keep the
+        same relative error bound as recording all values in one histogram.
+        Raises:
+            exceptions.ParamError: histograms are not in the same layout.
+        '''
+
+        if other.significant_bits != self.significant_bits \
+                or other.highest_trackable_value != self.highest_trackable_value:
+            raise exceptions.ParamError(
+                'only histograms with same significant_bits and highest_trackable_value can be merged'
+            )
+
+        if not other.total_count:
+            return self
+
+        counts = self._counts
+        for index, count in enumerate(other._counts):
+            if count:
+                counts[index] += count
+
+        self.total_count += other.total_count
+        self.total_value += other.total_value
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        return self
+
+    def to_bytes(self):
+        '''
+        serialize histogram to compact bytes, only non-empty buckets are
+        stored as varint encoded (index gap, count) pairs.
+        '''
+
+        buffer = bytearray()
+        buckets_count = 0
+        last_index = 0
+        for index, count in enumerate(self._counts):
+            if not count:
+                continue
+
+            _encode_varint(index - last_index, buffer)
+            _encode_varint(count, buffer)
+            last_index = index
+            buckets_count += 1
+
+        header = HISTOGRAM_HEADER.pack(
+            HISTOGRAM_VERSION, self.significant_bits,
+            self.highest_trackable_value, self.total_count, self.total_value,
+            self.min_value, self.max_value, buckets_count)
+        return header + bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        '''
+        deserialize histogram from bytes generated by to_bytes.
+        Raises:
+            exceptions.ParamError: data is not a serialized histogram.
+        '''
+
+        try:
+            (version, significant_bits, highest_trackable_value, total_count,
+             total_value, min_value, max_value,
+             buckets_count) = HISTOGRAM_HEADER.unpack_from(data)
+        except struct.error:
+            raise exceptions.ParamError('invalid histogram data')
+
+        if version != HISTOGRAM_VERSION:
+            raise exceptions.ParamError(
+                f'unsupported histogram version: {version}')
+
+        histogram = cls(significant_bits, highest_trackable_value)
+        histogram.total_count = total_count
+        histogram.total_value = total_value
+        histogram.min_value = min_value
+        histogram.max_value = max_value
+
+        offset = HISTOGRAM_HEADER.size
+        index = 0
+        for _ in range(buckets_count):
+            index_gap, offset = _decode_varint(data, offset)
+            count, offset = _decode_varint(data, offset)
+            index += index_gap
+            histogram._counts[index] = count
+
+        return histogram
+
+    def get_values_at_percentiles(self, percentiles):
+        '''
+        get values at percentiles in one pass over buckets.
+        Args:
+            percentiles (list): ascending percentiles, e.g. [50, 90, 99, 99.9]
+        Returns:
+            list: highest equivalent values in microseconds, capped by max value.
+        '''
+
+        if not self.total_count:
+            return [0 for _ in percentiles]
+
+        values = []
+        targets = [
+            max(1, -(-self.total_count * percentile // 100))
+            for percentile in percentiles
+        ]
+        target_index = 0
+        accumulated_count = 0
+
+        for index, count in enumerate(self._counts):
+            if not count:
+                continue
+
+            accumulated_count += count
+            while target_index < len(targets) \
+                    and accumulated_count >= targets[target_index]:
+                highest_value = self._get_bucket_range(index)[1]
+                values.append(min(highest_value, self.max_value))
+                target_index += 1
+
+            if target_index == len(targets):
+                break
+
+        return values
+
+    def get_value_at_percentile(self, percentile):
+        return self.get_values_at_percentiles([percentile])[0]
+
+    def get_summary(self, duration=None):
+        '''
+        get latency summary, latency values are in milliseconds.
+        Args:
+            duration (float): run duration in seconds, used to calculate throughput.
+        Returns:
+            dict: latency summary
+                {
+                    'count': 1000,
+                    'min': 1.2,
+                    'mean': 3.4,
+                    'p50': 3.1,
+                    'p90': 5.2,
+                    'p99': 8.9,
+                    'p99.9': 12.0,
+                    'max': 13.5,
+                    'throughput': 250.0
+                }
+        '''
+
+        summary = {'count': self.total_count}
+
+        if self.total_count:
+            summary['min'] = self.min_value / 1000
+            summary['mean'] = self.total_value / self.total_count / 1000
+        else:
+            summary['min'] = summary['mean'] = 0
+
+        percentile_values = self.get_values_at_percentiles(REPORT_PERCENTILES)
+        for percentile, value in zip(REPORT_PERCENTILES, percentile_values):
+            summary[f'p{percentile}'] = value / 1000
+
+        summary['max'] = self.max_value / 1000
+        summary['throughput'] = self.total_count / duration if duration else 0
+
+        return summary
+
+
+###############################################################################
+#   teststep latency stats
+###############################################################################
+
+
+def get_teststep_names(teststep):
+    '''
+    get teststep name and api name which latency is grouped by.
+    Args:
+        teststep (dict): teststep extended with api definition.
+            {
+                'name':'get user 1000',
+                'function_meta':{'func_name':'get_user','args':[],'kwargs':{}},
+                'request':{}
+            }
+    Returns:
+        tuple: (teststep name, api name), api name is None if teststep is not api reference.
+            ('get user 1000', 'get_user')
+    '''
+
+    api_name = teststep.get('function_meta', {}).get('func_name')
+    teststep_name = teststep.get('name') or api_name or ''
+    return teststep_name, api_name
+
+
+class LatencyStats:
+    '''
+    per-teststep and per-api latency statistics.
+    histograms are created once for each teststep/api name, then recording is
+    O(1) and does not grow memory, so it can stay on during long load runs.
+    in fixed rate modes, latency is also recorded from the intended start time
+    into corrected histograms, so that server stalls are not hidden by
+    coordinated omission.
+    Args:
+        significant_bits (int): histogram precision.
+        expected_interval (float): expected interval seconds between requests
+            in fixed rate mode, used to correct latency recorded without
+            intended start time.
+        parent (LatencyStats): latency stats records are also forwarded to,
+            e.g. stats of whole run for stats of one testcase.
+    '''
+
+    def __init__(self, significant_bits=8, expected_interval=None,
+                 parent=None):
+        self.significant_bits = significant_bits
+        self.expected_interval = expected_interval
+        self.parent = parent
+        self.teststeps_histograms = OrderedDict()
+        self.apis_histograms = OrderedDict()
+        self.corrected_teststeps_histograms = OrderedDict()
+        self.corrected_apis_histograms = OrderedDict()
+        # time waited on rate limiters, kept apart from server latency
+        self.rate_limit_waits_histograms = OrderedDict()
+        self.start_at = None
+        self.last_record_at = None
+        # teststeps may be recorded concurrently by parallel runners
+        self.lock = threading.Lock()
+
+    def _get_histogram(self, histograms_mapping, name):
+        histogram = histograms_mapping.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram(self.significant_bits)
+            histograms_mapping[name] = histogram
+
+        return histogram
+
+    def _record_corrected(self, histograms_mapping, name, value,
+                          corrected_value):
+        histogram = self._get_histogram(histograms_mapping, name)
+        if corrected_value is not None:
+            histogram.record(corrected_value)
+        else:
+            histogram.record_corrected(
+                value, round(self.expected_interval * 1000000))
+
+    def record(self,
+               teststep_name,
+               api_name,
+               elapsed,
+               intended_start=None,
+               actual_start=None):
+        '''
+        record teststep latency.
+        Args:
+            teststep_name (str): teststep name
+            api_name (str): api definition name, None if teststep is not api reference.
+            elapsed (float): elapsed seconds from actual start
+            intended_start (float): start time planned by fixed rate schedule
+            actual_start (float): start time when request is actually sent,
+                in the same clock with intended_start.
+        '''
+
+        if self.parent is not None:
+            self.parent.record(teststep_name, api_name, elapsed,
+                               intended_start, actual_start)
+
+        with self.lock:
+            now = time.time()
+            if self.start_at is None:
+                self.start_at = now - elapsed
+            self.last_record_at = now
+
+            value = round(elapsed * 1000000)
+            self._get_histogram(self.teststeps_histograms,
+                                teststep_name).record(value)
+            if api_name:
+                self._get_histogram(self.apis_histograms,
+                                    api_name).record(value)
+
+            if intended_start is not None and actual_start is not None:
+                # latency measured from intended start time
+                corrected_value = value + round(
+                    max(actual_start - intended_start, 0) * 1000000)
+            elif self.expected_interval:
+                corrected_value = None
+            else:
+                return
+
+            self._record_corrected(self.corrected_teststeps_histograms,
+                                   teststep_name, value, corrected_value)
+            if api_name:
+                self._record_corrected(self.corrected_apis_histograms,
+                                       api_name, value, corrected_value)
+
+    def record_rate_limit_wait(self, limiter_name, waited):
+        '''
+        record seconds waited on rate limiter before sending request.
+        '''
+
+        if self.parent is not None:
+            self.parent.record_rate_limit_wait(limiter_name, waited)
+
+        with self.lock:
+            self._get_histogram(self.rate_limit_waits_histograms,
+                                limiter_name).record(round(waited * 1000000))
+
+    @property
+    def duration(self):
+        if self.start_at is None:
+            return 0
+
+        return self.last_record_at - self.start_at
+
+    def swap(self):
+        '''
+        take out latency recorded so far as new latency stats, and go on
+        recording from empty. swapped under lock of recorders, so that no
+        record of in-flight teststeps is lost between windows.
+        Returns:
+            LatencyStats: latency recorded before swap
+        '''
+
+        swapped = LatencyStats(self.significant_bits, self.expected_interval)
+        with self.lock:
+            for mapping_name in STATS_HISTOGRAMS_MAPPINGS:
+                setattr(swapped, mapping_name, getattr(self, mapping_name))
+                setattr(self, mapping_name, OrderedDict())
+            swapped.start_at = self.start_at
+            swapped.last_record_at = self.last_record_at
+            self.start_at = self.last_record_at = None
+
+        return swapped
+
+    def merge(self, other):
+        '''
+        merge latency stats collected by other worker process or node.
+        merged duration spans from the earliest start to the latest record.
+        '''
+
+        for mapping_name in STATS_HISTOGRAMS_MAPPINGS:
+            histograms_mapping = getattr(self, mapping_name)
+            for name, histogram in getattr(other, mapping_name).items():
+                self._get_histogram(histograms_mapping, name).merge(histogram)
+
+        if other.start_at is not None:
+            if self.start_at is None:
+                self.start_at = other.start_at
+                self.last_record_at = other.last_record_at
+            else:
+                self.start_at = min(self.start_at, other.start_at)
+                self.last_record_at = max(self.last_record_at,
+                                          other.last_record_at)
+
+        return self
+
+    def to_bytes(self):
+        '''
+        serialize latency stats to compact bytes, to be shipped to coordinator.
+        '''
+
+        with self.lock:
+            buffer = bytearray(
+                STATS_HEADER.pack(STATS_VERSION, self.significant_bits,
+                                  self.start_at or 0, self.last_record_at
+                                  or 0))
+
+            for mapping_name in STATS_HISTOGRAMS_MAPPINGS:
+                histograms_mapping = getattr(self, mapping_name)
+                _encode_varint(len(histograms_mapping), buffer)
+                for name, histogram in histograms_mapping.items():
+                    name_bytes = name.encode('utf-8')
+                    histogram_bytes = histogram.to_bytes()
+                    _encode_varint(len(name_bytes), buffer)
+                    buffer.extend(name_bytes)
+                    _encode_varint(len(histogram_bytes), buffer)
+                    buffer.extend(histogram_bytes)
+
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        '''
+        deserialize latency stats from bytes generated by to_bytes.
+        Raises:
+            exceptions.ParamError: data is not serialized latency stats.
+        '''
+
+        try:
+            version, significant_bits, start_at, last_record_at = \
+                STATS_HEADER.unpack_from(data)
+        except struct.error:
+            raise exceptions.ParamError('invalid latency stats data')
+
+        if version != STATS_VERSION:
+            raise exceptions.ParamError(
+                f'unsupported latency stats version: {version}')
+
+        latency_stats = cls(significant_bits)
+        if last_record_at:
+            latency_stats.start_at = start_at
+            latency_stats.last_record_at = last_record_at
+
+        offset = STATS_HEADER.size
+        for mapping_name in STATS_HISTOGRAMS_MAPPINGS:
+            histograms_mapping = getattr(latency_stats, mapping_name)
+            histograms_count, offset = _decode_varint(data, offset)
+            for _ in range(histograms_count):
+                name_length, offset = _decode_varint(data, offset)
+                name = bytes(data[offset:offset + name_length]).decode('utf-8')
+                offset += name_length
+                histogram_length, offset = _decode_varint(data, offset)
+                histograms_mapping[name] = LatencyHistogram.from_bytes(
+                    data[offset:offset + histogram_length])
+                offset += histogram_length
+
+        return latency_stats
+
+    def _get_summaries(self, histograms_mapping, corrected_histograms_mapping,
+                       duration):
+        summaries = {}
+        for name, histogram in histograms_mapping.items():
+            summary = histogram.get_summary(duration)
+            corrected_histogram = corrected_histograms_mapping.get(name)
+            if corrected_histogram is not None:
+                summary['corrected'] = corrected_histogram.get_summary(
+                    duration)
+            summaries[name] = summary
+
+        return summaries
+
+    def get_report(self):
+        '''
+        get latency report grouped by teststep and api.
+        raw and coordinated omission corrected summaries are reported side by
+        side, corrected summary only exists in fixed rate modes.
+        Returns:
+            dict: latency report
+                {
+                    'duration': 10.2,
+                    'relative_error': 0.0078125,
+                    'teststeps': {
+                        'get user 1000': {'p99': 8.9, ..., 'corrected': {'p99': 120.4, ...}}
+                    },
+                    'apis': {'get_user': summary},
+                    'rate_limiters': {'host:127.0.0.1:5000': summary}
+                }
+        '''
+
+        duration = self.duration
+        return {
+            'duration':
+            duration,
+            'relative_error':
+            1 / (1 << (self.significant_bits - 1)),
+            'teststeps':
+            self._get_summaries(self.teststeps_histograms,
+                                self.corrected_teststeps_histograms, duration),
+            'apis':
+            self._get_summaries(self.apis_histograms,
+                                self.corrected_apis_histograms, duration),
+            'rate_limiters':
+            self._get_summaries(self.rate_limit_waits_histograms, {},
+                                duration)
+        }
+
+
+###############################################################################
+#   fixed rate schedule
+###############################################################################
+
+
+class FixedRateSchedule:
+    '''
+    plan intended start time of each request at fixed rate.
+    a stalled request does not postpone the plan, so the delay of following
+    requests is kept and can be recorded as coordinated omission.
+    Args:
+        rate (float): requests per second
+        clock (module): clock with perf_counter() and sleep(), time module
+            if not specified.
+    Examples:
+        >>> schedule = FixedRateSchedule(100)
+        >>> intended_start = schedule.wait()
+        >>> actual_start = time.perf_counter()
+        >>> # send request
+        >>> elapsed = time.perf_counter() - actual_start
+        >>> latency_stats.record(name, api_name, elapsed, intended_start, actual_start)
+    '''
+
+    def __init__(self, rate, clock=time):
+        if not rate or rate <= 0:
+            raise exceptions.ParamError(f'invalid fixed rate: {rate}')
+
+        self.rate = rate
+        self.clock = clock
+        self.interval = 1 / rate
+        self.start_at = None
+        self.scheduled_count = 0
+
+    def wait(self):
+        '''
+        sleep until next intended start time, return at once if behind schedule.
+        Returns:
+            float: intended start time in clock.perf_counter() clock.
+        '''
+
+        now = self.clock.perf_counter()
+        if self.start_at is None:
+            self.start_at = now
+
+        intended_start = self.start_at + self.scheduled_count * self.interval
+        self.scheduled_count += 1
+
+        if intended_start > now:
+            self.clock.sleep(intended_start - now)
+
+        return intended_start
@@ -0,0 +1,364 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import codecs
+import json
+import re
+
+from httprunner import exceptions, logger, utils
+
+WHITESPACE_REGEXP = re.compile(r'[ \t\n\r]*')
+# string chars up to closing quote, resumed from where last chunk ended
+STRING_BODY_REGEXP = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+SCALAR_REGEXP = re.compile(r'[^,:\]\}\s]+')
+# skip plain chars and complete strings until next bracket
+SKIP_REGEXP = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+LITERAL_REGEXP = re.compile(
+    r'(?:true|false|null|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)$')
+
+# consumed text is dropped from buffer when it grows over this size
+BUFFER_TRIM_SIZE = 64 * 1024
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class StreamingJsonExtractor:
+    '''
+    incremental json extractor. json body is parsed chunk by chunk, values
+    not on required paths are skipped without being decoded, and parsing
+    stops as soon as every required path is found or known to be missing.
+    raw chunks read are kept for read_body, at most max_raw_size bytes, and
+    dropped once body grows over it.
+    Args:
+        chunks (iterable): body chunks in bytes, e.g. resp.iter_content(8192)
+        content_paths (list): paths compiled by utils.compile_content_path
+            [
+                (('success', None),),
+                (('data', None), ('items', None), ('0', 0))
+            ]
+        max_raw_size (int): max bytes of raw chunks kept, all raw chunks are
+            kept if not specified.
+    Examples:
+        >>> extractor = StreamingJsonExtractor(resp.iter_content(8192), content_paths)
+        >>> extractor.extract()
+            {(('success', None),): True}
+    '''
+
+    def __init__(self, chunks, content_paths, max_raw_size=None):
+        self.chunks = iter(chunks)
+        self.raw_chunks = []
+        self.raw_size = 0
+        self.max_raw_size = max_raw_size
+        self.raw_dropped = False
+        self.buffer = ''
+        self.pos = 0
+        # start of value being scanned, buffer is not trimmed beyond it
+        self.mark = None
+        self.eof = False
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+
+        # trie of required keys, paths ending at node are saved with None key
+        self.trie = {}
+        content_paths = set(content_paths)
+        for content_path in content_paths:
+            node = self.trie
+            for key, _ in content_path:
+                node = node.setdefault(key, {})
+            node.setdefault(None, []).append(content_path)
+
+        self.pending_count = len(content_paths)
+        self.found = {}
+        self.missing = set()
+
+    ###########################################################################
+    #   buffer
+    ###########################################################################
+
+    def _read_chunk(self):
+        '''
+        read next chunk into buffer.
+        Returns:
+            bool: False if body is exhausted.
+        '''
+
+        if self.eof:
+            return False
+
+        trim_pos = self.pos if self.mark is None else self.mark
+        if trim_pos > BUFFER_TRIM_SIZE:
+            self.buffer = self.buffer[trim_pos:]
+            self.pos -= trim_pos
+            if self.mark is not None:
+                self.mark -= trim_pos
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buffer += self._text_decoder.decode(b'', final=True)
+            return False
+
+        self._keep_raw_chunk(chunk)
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk)
+        self.buffer += chunk
+        return True
+
+    def _keep_raw_chunk(self, chunk):
+        if self.raw_dropped:
+            return
+
+        self.raw_chunks.append(chunk)
+        self.raw_size += len(chunk)
+        if self.max_raw_size is not None and self.raw_size > self.max_raw_size:
+            self.raw_chunks = []
+            self.raw_dropped = True
+
+    def read_body(self):
+        '''
+        read the whole raw body, including chunks consumed by extraction.
+        Raises:
+            exceptions.ExtractFailure: raw chunks over max_raw_size are
+                dropped, body can not be read again.
+        '''
+
+        if self.raw_dropped:
+            err_msg = f'response body over {self.max_raw_size} bytes is ' \
+                'dropped by streaming extraction, and can not be read again.'
+            logger.log_error(err_msg)
+            raise exceptions.ExtractFailure(err_msg)
+
+        self.raw_chunks.extend(self.chunks)
+        self.eof = True
+        return b''.join(
+            chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            for chunk in self.raw_chunks)
+
+    def _peek(self):
+        '''
+        skip whitespace and return next char.
+        '''
+
+        while True:
+            self.pos = WHITESPACE_REGEXP.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._read_chunk():
+                raise ValueError('unexpected end of json body')
+
+    def _match_string(self):
+        '''
+        match string at current position, scanning resumes from where last
+        chunk ended instead of from string start.
+        '''
+
+        outer_mark = self.mark
+        if outer_mark is None:
+            self.mark = self.pos
+        start = self.pos - self.mark
+        scanned = start + 1
+        try:
+            while True:
+                end = STRING_BODY_REGEXP.match(self.buffer,
+                                               self.mark + scanned).end()
+                if end < len(self.buffer) and self.buffer[end] == '"':
+                    self.pos = end + 1
+                    return self.buffer[self.mark + start:self.pos]
+
+                # buffer ends inside string, or right after backslash
+                scanned = end - self.mark
+                if not self._read_chunk():
+                    raise ValueError(
+                        f'unterminated string at {self.mark + start}')
+        finally:
+            self.mark = outer_mark
+
+    ###########################################################################
+    #   skip values
+    ###########################################################################
+
+    def _skip_value(self):
+        char = self._peek()
+        if char == '"':
+            self._match_string()
+        elif char in '{[':
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def _skip_scalar(self):
+        while True:
+            matched = SCALAR_REGEXP.match(self.buffer, self.pos)
+            if not matched:
+                raise ValueError(f'invalid json value at {self.pos}')
+
+            if matched.end() < len(self.buffer) or not self._read_chunk():
+                if not LITERAL_REGEXP.match(matched.group()):
+                    raise ValueError(f'invalid json value at {self.pos}')
+                self.pos = matched.end()
+                return
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            self.pos = SKIP_REGEXP.match(self.buffer, self.pos).end()
+            if self.pos == len(self.buffer):
+                if not self._read_chunk():
+                    raise ValueError('unexpected end of json body')
+                continue
+
+            if self.buffer[self.pos] == '"':
+                # string split by chunk boundary
+                self._match_string()
+                continue
+
+            depth += 1 if self.buffer[self.pos] in '{[' else -1
+            self.pos += 1
+            if depth == 0:
+                return
+
+    ###########################################################################
+    #   required values
+    ###########################################################################
+
+    def _resolve(self, content_path, value):
+        self.found[content_path] = value
+        self._settle()
+
+    def _mark_missing(self, node):
+        collected = []
+        self._collect_subtree(node, collected)
+        for content_path in collected:
+            self.missing.add(content_path)
+            self._settle()
+
+    def _settle(self):
+        self.pending_count -= 1
+        if self.pending_count <= 0:
+            raise _StopParsing
+
+    def _decode_value(self):
+        '''
+        scan to the end of value incrementally, then decode it at once.
+        '''
+
+        self._peek()
+        self.mark = self.pos
+        try:
+            self._skip_value()
+            value, _ = self._json_decoder.raw_decode(self.buffer, self.mark)
+        finally:
+            self.mark = None
+
+        return value
+
+    def _collect_subtree(self, node, collected):
+        for key, child in node.items():
+            if key is None:
+                collected.extend(child)
+            else:
+                self._collect_subtree(child, collected)
+
+    def _parse_value(self, node, depth):
+        '''
+        parse value at current position.
+        Args:
+            node (dict): trie node of value, None if value is not required.
+            depth (int): depth of value in json body.
+        '''
+
+        if node is None:
+            self._skip_value()
+            return
+
+        if None in node:
+            # value is required, decode it and resolve all paths under it
+            value = self._decode_value()
+            collected = []
+            self._collect_subtree(node, collected)
+            for content_path in collected:
+                try:
+                    found_value = utils.query_content(value,
+                                                      content_path[depth:])
+                except (KeyError, IndexError, TypeError):
+                    self.missing.add(content_path)
+                    self._settle()
+                    continue
+                self._resolve(content_path, found_value)
+            return
+
+        char = self._peek()
+        if char == '{':
+            self._parse_object(node, depth)
+        elif char == '[':
+            self._parse_array(node, depth)
+        else:
+            self._skip_value()
+            self._mark_missing(node)
+
+    def _parse_members(self, node, depth, end_char, get_key):
+        self.pos += 1
+        seen_keys = set()
+
+        if self._peek() == end_char:
+            self.pos += 1
+        else:
+            index = 0
+            while True:
+                key = get_key(index)
+                child = node.get(key)
+                if child is not None:
+                    seen_keys.add(key)
+
+                self._parse_value(child, depth + 1)
+                index += 1
+
+                char = self._peek()
+                self.pos += 1
+                if char == end_char:
+                    break
+                elif char != ',':
+                    raise ValueError(f'invalid json delimiter at {self.pos}')
+
+        for key, child in node.items():
+            if key is not None and key not in seen_keys:
+                self._mark_missing(child)
+
+    def _parse_object(self, node, depth):
+        def get_key(index):
+            if self._peek() != '"':
+                raise ValueError(f'invalid json object key at {self.pos}')
+            key = self._match_string()
+            key = json.loads(key) if '\\' in key else key[1:-1]
+            if self._peek() != ':':
+                raise ValueError(f'invalid json object at {self.pos}')
+            self.pos += 1
+            return key
+
+        self._parse_members(node, depth, '}', get_key)
+
+    def _parse_array(self, node, depth):
+        self._parse_members(node, depth, ']', str)
+
+    def extract(self):
+        '''
+        parse body until all required paths are resolved.
+        Returns:
+            dict: found values mapping, missing paths are not included.
+                {(('success', None),): True}
+        Raises:
+            ValueError: body is not valid json.
+        '''
+
+        if self.pending_count > 0:
+            try:
+                self._parse_value(self.trie, 0)
+            except _StopParsing:
+                pass
+
+        return self.found
+
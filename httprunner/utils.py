@@ -142,4 +142,36 @@ def get_uniform_comparator(comparator):
     ]:
         return 'length_less_than_or_equals'
     else:
-        return comparator
\ No newline at end of file
+        return comparator
+
+
+def compile_content_path(sub_query):
+    '''
+    compile dotted content path to keys list, numeric key may be list index.
+    Args:
+        sub_query (str): e.g. 'data.items.0.name'
+    Returns:
+        tuple: ((key, index), ...)
+            (('data', None), ('items', None), ('0', 0), ('name', None))
+    '''
+
+    return tuple((key, int(key) if key.isdigit() else None)
+                 for key in sub_query.split('.'))
+
+
+def query_content(body, content_path):
+    '''
+    query body with compiled content path.
+    Raises:
+        KeyError/IndexError/TypeError: path not found in body.
+    '''
+
+    for key, index in content_path:
+        if isinstance(body, dict):
+            body = body[key]
+        elif index is not None and isinstance(body, (list, str)):
+            body = body[index]
+        else:
+            raise TypeError(key)
+
+    return body
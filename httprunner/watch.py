@@ -0,0 +1,246 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from httprunner import loader, logger, pool, stats
+
+DEFINITION_FOLDERS = {'def-api': 'api', 'def-testcase': 'suite'}
+
+
+class ProjectWatcher:
+    '''
+    watch api/suite definitions and testcase files, and re-run only
+    testcases affected by changes. each changed file is re-parsed alone,
+    definitions are replaced entry by entry, and only testcases referencing
+    changed definitions are expanded again.
+    Args:
+        project_path (str): project path, located as load_project_tests does
+        testcase_paths (list): watched testcase files or folders
+    Examples:
+        >>> watcher = ProjectWatcher('tests', ['tests/testcases'])
+        >>> watcher.watch(poll_interval=0.5)
+    '''
+
+    def __init__(self, project_path, testcase_paths):
+        self.project_path = os.path.abspath(project_path)
+        self.testcase_paths = [
+            os.path.abspath(path) for path in testcase_paths
+        ]
+        loader.load_project_tests(self.project_path)
+
+        # definition type => {file path: (mtime, definitions mapping)}
+        self.definition_files = {}
+        # definition type => {name: files defining it, last loaded last}
+        self.definition_owners = {}
+        for ref_type, folder in DEFINITION_FOLDERS.items():
+            self.definition_files[ref_type] = {}
+            self.definition_owners[ref_type] = {}
+            for file_path in self.get_definition_files(ref_type):
+                definitions_mapping = self._load_definition_file(
+                    ref_type, file_path) or {}
+                for name in definitions_mapping:
+                    self.definition_owners[ref_type].setdefault(
+                        name, []).append(file_path)
+
+        # testcase file path => (mtime, testcase, references)
+        self.testcases_mapping = {}
+        for file_path in self.get_testcase_files():
+            self._load_testcase_file(file_path)
+
+    def get_definition_files(self, ref_type):
+        folder_path = os.path.join(loader.project_working_directory,
+                                   DEFINITION_FOLDERS[ref_type])
+        return loader.load_folder_files(folder_path)
+
+    def get_testcase_files(self):
+        files = []
+        for path in self.testcase_paths:
+            if os.path.isdir(path):
+                files.extend(loader.load_folder_files(path))
+            elif os.path.isfile(path):
+                files.append(path)
+
+        return sorted(set(files))
+
+    def _load_definition_file(self, ref_type, file_path):
+        '''
+        parse definition file, previous definitions of file are kept if it
+        fails to parse, until it is changed again.
+        Returns:
+            dict: definitions mapping of file, None if failed to parse.
+        '''
+
+        mtime = os.stat(file_path).st_mtime_ns
+        try:
+            if ref_type == 'def-api':
+                definitions_mapping = loader.load_api_file(file_path)
+            else:
+                definitions_mapping = loader.load_test_definition_file(
+                    file_path)
+        except Exception as err:
+            # e.g. yaml syntax errors while file is being edited
+            logger.log_error(
+                f'failed to load definition file {file_path}: {err!r}')
+            _, old_mapping = self.definition_files[ref_type].get(
+                file_path, (None, {}))
+            self.definition_files[ref_type][file_path] = (mtime, old_mapping)
+            return None
+
+        self.definition_files[ref_type][file_path] = (mtime,
+                                                      definitions_mapping)
+        return definitions_mapping
+
+    def _load_testcase_file(self, file_path):
+        mtime = os.stat(file_path).st_mtime_ns
+        try:
+            testcase = loader._load_test_file(file_path)
+            references = loader.get_test_file_references(file_path)
+        except Exception as err:
+            logger.log_error(f'failed to load testcase {file_path}: {err!r}')
+            testcase, references = None, None
+
+        self.testcases_mapping[file_path] = (mtime, testcase, references)
+
+    def reload_definitions(self, ref_type):
+        '''
+        re-parse changed definition files of type, and replace changed
+        definitions in project_mapping. definition removed from one file
+        falls back to another file still defining it.
+        Returns:
+            set: names of definitions added, removed or changed.
+        '''
+
+        definitions = loader.project_mapping[ref_type]
+        loaded_files = self.definition_files[ref_type]
+        owners = self.definition_owners[ref_type]
+        current_files = set(self.get_definition_files(ref_type))
+        changed_names = set()
+
+        for file_path in sorted(current_files | set(loaded_files)):
+            mtime, old_mapping = loaded_files.get(file_path, (None, {}))
+            if file_path in current_files:
+                if os.stat(file_path).st_mtime_ns == mtime:
+                    continue
+                logger.log_info(f'reload definition file: {file_path}')
+                new_mapping = self._load_definition_file(ref_type, file_path)
+                if new_mapping is None:
+                    continue
+            else:
+                logger.log_info(f'definition file removed: {file_path}')
+                del loaded_files[file_path]
+                new_mapping = {}
+
+            for name in set(old_mapping) | set(new_mapping):
+                if old_mapping.get(name) == new_mapping.get(name):
+                    continue
+                changed_names.add(name)
+                name_owners = owners.setdefault(name, [])
+                if file_path in name_owners:
+                    name_owners.remove(file_path)
+
+                if name in new_mapping:
+                    name_owners.append(file_path)
+                    definitions[name] = new_mapping[name]
+                elif name_owners:
+                    # still defined by another file
+                    definitions[name] = loaded_files[name_owners[-1]][1][name]
+                else:
+                    del owners[name]
+                    definitions.pop(name, None)
+
+        return changed_names
+
+    def poll(self):
+        '''
+        reload changed files once.
+        Returns:
+            list: affected testcase files, sorted.
+        '''
+
+        changed_mapping = {
+            ref_type: self.reload_definitions(ref_type)
+            for ref_type in DEFINITION_FOLDERS
+        }
+
+        current_files = self.get_testcase_files()
+        for file_path in set(self.testcases_mapping) - set(current_files):
+            del self.testcases_mapping[file_path]
+
+        affected = set()
+        for file_path in current_files:
+            loaded = self.testcases_mapping.get(file_path)
+            if loaded is None or loaded[0] != os.stat(file_path).st_mtime_ns:
+                affected.add(file_path)
+                continue
+
+            references = loaded[2]
+            if references is None:
+                continue
+            for ref_type, changed_names in changed_mapping.items():
+                if references[ref_type] & changed_names:
+                    affected.add(file_path)
+
+        for file_path in affected:
+            self._load_testcase_file(file_path)
+
+        return sorted(affected)
+
+    def run(self, file_paths, iterations=1):
+        '''
+        run loaded testcases of files.
+        Returns:
+            dict: run result of pool.ThreadPoolRunner, with stats report.
+        '''
+
+        testcases = []
+        for file_path in file_paths:
+            testcase = self.testcases_mapping[file_path][1]
+            if testcase and testcase['teststeps']:
+                testcases.append(testcase)
+
+        latency_stats = stats.LatencyStats()
+        pool_runner = pool.ThreadPoolRunner(1, latency_stats)
+        try:
+            result = pool_runner.run(testcases, iterations)
+        finally:
+            pool_runner.close()
+
+        result['testcases'] = file_paths
+        result['stats'] = latency_stats.get_report()
+        return result
+
+    def run_affected(self):
+        '''
+        reload changed files and run affected testcases.
+        Returns:
+            dict: run result, None if no testcase is affected.
+        '''
+
+        affected = self.poll()
+        if not affected:
+            return None
+
+        logger.log_info(f'run affected testcases: {affected}')
+        return self.run(affected)
+
+    def watch(self, poll_interval=0.5, callback=None, max_polls=None):
+        '''
+        poll files and run affected testcases until interrupted.
+        Args:
+            poll_interval (float): seconds between polls
+            callback (callable): called with run result of each run
+            max_polls (int): stop after polls, run forever if None
+        '''
+
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                polls += 1
+                result = self.run_affected()
+                if result is not None and callback is not None:
+                    callback(result)
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            logger.log_info('watch stopped.')
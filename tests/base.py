@@ -1,4 +1,5 @@
 import multiprocessing
+import threading
 import time
 
 import requests
@@ -7,6 +8,53 @@ from tests.api_server import app as flask_app
 from tests.api_server import gen_md5, gen_random_string, get_sign, httpbin_app
 
 
+def make_testcase(name, base_url='', url='/', teststep_name='index', **config):
+    '''
+    make testcase of one GET teststep validating status code 200, extra
+    config items such as sla are added into config.
+    '''
+
+    return {
+        'config': dict({
+            'name': name,
+            'request': {
+                'base_url': base_url
+            }
+        }, **config),
+        'teststeps': [{
+            'name': teststep_name,
+            'request': {
+                'url': url,
+                'method': 'GET'
+            },
+            'validate': [{
+                'eq': ['status_code', 200]
+            }]
+        }]
+    }
+
+
+class FakeClock:
+    '''
+    virtual clock with the same interface as time module, sleep advances
+    time at once instead of blocking.
+    '''
+
+    def __init__(self, start=100.0):
+        self.now = start
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def perf_counter(self):
+        with self.lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += max(seconds, 0)
+
+
 def run_flask():
     flask_app.run(port=FLASK_APP_PORT)
 
@@ -0,0 +1,130 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import pytest
+
+from httprunner import abort, exceptions, loader, pool, runner
+from tests.base import TestApiServerBase
+
+
+class TestAbortController:
+    def test_get_testcase_host(self):
+        assert abort.get_testcase_host({
+            'config': {
+                'request': {
+                    'base_url': 'http://127.0.0.1:5000'
+                }
+            }
+        }) == '127.0.0.1:5000'
+        assert abort.get_testcase_host({
+            'teststeps': [{
+                'request': {
+                    'url': 'https://example.com/api'
+                }
+            }]
+        }) == 'example.com'
+        assert abort.get_testcase_host({}) == ''
+
+    def test_error_rate(self):
+        abort_controller = abort.AbortController(max_error_rate=0.5,
+                                                 window=4)
+        error = exceptions.ParamError()
+        assert abort_controller.record('a', None, 0.1) is False
+        assert abort_controller.record('a', error, 0.1) is False
+        assert abort_controller.record('a', None, 0.1) is False
+        # window is not full yet
+        assert abort_controller.record('b', error, 0.1) is False
+        assert abort_controller.record('b', error, 0.1) is True
+        assert list(abort_controller.tripped) == ['']
+        assert abort_controller.is_aborted('c')
+
+    def test_host_level(self):
+        abort_controller = abort.AbortController(max_consecutive_failures=2)
+        failure = exceptions.VaildationFailure()
+        abort_controller.record('a', failure, 0.1)
+        abort_controller.record('b', None, 0.1)
+        abort_controller.record('a', failure, 0.1)
+        # failures of host a are not consecutive for whole run
+        assert list(abort_controller.tripped) == ['a']
+        assert abort_controller.is_aborted('a')
+        assert not abort_controller.is_aborted('b')
+
+        # only validation failures are counted as consecutive
+        abort_controller.record('b', exceptions.ParamError(), 0.1)
+        abort_controller.record('b', failure, 0.1)
+        assert not abort_controller.is_aborted('b')
+
+    def test_latency_budget(self):
+        abort_controller = abort.AbortController(latency_budget=100,
+                                                 window=10,
+                                                 min_samples=2)
+        abort_controller.record('a', None, 0.05)
+        abort_controller.record('a', None, 0.05)
+        assert not abort_controller.is_aborted()
+        abort_controller.record('a', None, 0.2)
+        assert 'p99 latency' in abort_controller.tripped['']
+
+    def test_invalid_params(self):
+        with pytest.raises(exceptions.ParamError):
+            abort.AbortController()
+        with pytest.raises(exceptions.ParamError):
+            abort.AbortController(max_error_rate=0.1, window=0)
+
+
+class TestAbortRun(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.testcase = {
+            'config': {
+                'name': 'abort test',
+                'request': {
+                    'base_url': self.host
+                }
+            },
+            'teststeps': [{
+                'name': 'get users without token',
+                'request': {
+                    'url': '/api/users',
+                    'method': 'GET'
+                },
+                'validate': [{
+                    'eq': ['status_code', 200]
+                }]
+            }, {
+                'name': 'index',
+                'request': {
+                    'url': '/',
+                    'method': 'GET'
+                }
+            }]
+        }
+
+    def test_run_aborted(self):
+        abort_controller = abort.AbortController(max_consecutive_failures=3)
+        pool_runner = pool.ThreadPoolRunner(1,
+                                            abort_controller=abort_controller)
+        result = pool_runner.run([self.testcase], iterations=20)
+        pool_runner.close()
+
+        assert result['total'] == 20
+        assert result['failures'] == 3
+        assert result['skipped'] == 17
+        assert result['successes'] == 0
+        host = abort.get_testcase_host(self.testcase)
+        assert set(result['aborted']) == {'', host}
+        assert 'consecutive' in result['aborted']['']
+
+    def test_cancel_in_flight(self):
+        abort_event = threading.Event()
+        abort_event.set()
+        with pytest.raises(exceptions.RunAborted):
+            runner.run_testcase(self.testcase,
+                                should_abort=abort_event.is_set)
+
+        self.testcase['teststeps'].pop(0)
+        test_runner = runner.run_testcase(self.testcase,
+                                          should_abort=lambda: False)
+        assert test_runner is not None
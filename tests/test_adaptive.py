@@ -0,0 +1,122 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+from httprunner import adaptive, exceptions, loader
+from tests.base import FakeClock, TestApiServerBase, make_testcase
+
+
+class TestAimdController:
+    def test_update(self):
+        controller = adaptive.AimdController(target_p99=100, max_users=8)
+        assert controller.users == 1
+
+        assert [controller.update(50, 0) for _ in range(4)] == [2, 3, 4, 5]
+        # latency over SLO cuts users by half
+        assert controller.update(150, 0) == 2
+        # error rate over SLO
+        assert controller.update(50, 0.5) == 1
+        assert controller.update(50, 0.5) == 1
+
+        for _ in range(10):
+            controller.update(50, 0)
+        assert controller.users == 8
+
+    def test_invalid_params(self):
+        with pytest.raises(exceptions.ParamError):
+            adaptive.AimdController(target_p99=0)
+        with pytest.raises(exceptions.ParamError):
+            adaptive.AimdController(100, min_users=4, max_users=2)
+        with pytest.raises(exceptions.ParamError):
+            adaptive.AimdController(100, decrease=1)
+
+
+class WindowClock(FakeClock):
+    '''
+    virtual clock of adaptive runner, window ends once testcases are
+    finished in it, instead of after window seconds.
+    '''
+
+    def __init__(self, testcases_per_window=2):
+        super().__init__()
+        self.testcases_per_window = testcases_per_window
+        self.load_runner = None
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            with self.load_runner.lock:
+                finished = self.load_runner.successes \
+                    + self.load_runner.failures
+            if finished >= self.testcases_per_window:
+                break
+            time.sleep(0.001)
+        super().sleep(seconds)
+
+
+class TestAdaptiveLoadRunner(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def get_load_runner(self, url, controller):
+        clock = WindowClock()
+        load_runner = adaptive.AdaptiveLoadRunner(
+            [make_testcase('adaptive test', self.host, url)],
+            controller,
+            window=5,
+            clock=clock)
+        clock.load_runner = load_runner
+        return load_runner
+
+    def test_run(self):
+        controller = adaptive.AimdController(target_p99=10000, max_users=4)
+        load_runner = self.get_load_runner('/', controller)
+        report = load_runner.run(windows=3)
+
+        assert [metrics['users'] for metrics in report['windows']] \
+            == [1, 2, 3]
+        assert load_runner.clock.sleeps == [5, 5, 5]
+        for metrics in report['windows']:
+            assert metrics['within_slo']
+            assert metrics['throughput'] == metrics['testcases'] / 5
+        assert report['max_throughput'] > 0
+        assert report['max_throughput_users'] in [1, 2, 3]
+
+    def test_run_over_slo(self):
+        controller = adaptive.AimdController(target_p99=10000,
+                                             min_users=2,
+                                             max_users=4)
+        load_runner = self.get_load_runner('/api/users', controller)
+        report = load_runner.run(windows=2)
+
+        assert [metrics['users'] for metrics in report['windows']] == [2, 2]
+        assert report['windows'][0]['error_rate'] == 1
+        assert report['max_throughput'] == 0
+
+        with pytest.raises(exceptions.ParamError):
+            adaptive.AdaptiveLoadRunner([], controller)
+
+    def test_measure_window(self):
+        controller = adaptive.AimdController(target_p99=100)
+        clock = FakeClock()
+        load_runner = adaptive.AdaptiveLoadRunner(
+            [make_testcase('adaptive test', self.host)],
+            controller,
+            window=5,
+            clock=clock)
+        load_runner.window_start_at = clock.perf_counter()
+        # recorded by runner started in previous window
+        load_runner.pool_runner.latency_stats.record('index', None, 0.05)
+        load_runner.successes = 1
+        clock.sleep(2)
+
+        metrics = load_runner.measure_window()
+        assert metrics['testcases'] == 1
+        assert metrics['throughput'] == 0.5
+        assert metrics['p99'] >= 49
+        assert load_runner.latency_stats.teststeps_histograms == {}
+        load_runner.pool_runner.close()
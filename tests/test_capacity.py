@@ -0,0 +1,96 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from httprunner import capacity, exceptions, loader, pool
+from tests.base import FakeClock, TestApiServerBase, make_testcase
+
+
+class TestCapacity(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def get_testcase(self, url):
+        return make_testcase('capacity test', self.host, url)
+
+    def test_run_at_rate(self):
+        clock = FakeClock()
+        metrics = capacity.run_at_rate([self.get_testcase('/')],
+                                       20,
+                                       0.25,
+                                       clock=clock)
+        assert metrics['testcases'] == 5
+        assert metrics['failures'] == 0
+        # testcases are started 50ms apart
+        assert clock.sleeps == pytest.approx([0.05] * 4)
+        assert metrics['throughput'] == 25
+        assert 0 <= metrics['p50'] <= metrics['p99']
+        summary = metrics['latency']['teststeps']['index']
+        assert summary['count'] == 5
+        assert summary['corrected']['count'] == 5
+
+        metrics = capacity.run_at_rate([self.get_testcase('/api/users')],
+                                       20,
+                                       0.1,
+                                       clock=FakeClock())
+        assert metrics['error_rate'] == 1
+
+    def test_run_at_rate_crashed(self, monkeypatch):
+        def run_testcase_safely(pool_runner,
+                                testcase,
+                                latency_stats=None,
+                                start_delay=None):
+            raise KeyError('request')
+
+        monkeypatch.setattr(pool.ThreadPoolRunner, 'run_testcase_safely',
+                            run_testcase_safely)
+        metrics = capacity.run_at_rate([self.get_testcase('/')],
+                                       20,
+                                       0.1,
+                                       clock=FakeClock())
+        assert metrics['testcases'] == 2
+        assert metrics['failures'] == 2
+        assert metrics['error_rate'] == 1
+
+    def test_search_capacity(self):
+        report = capacity.search_capacity([self.get_testcase('/')],
+                                          target_p99=10000,
+                                          min_rate=5,
+                                          max_rate=10,
+                                          duration=0.2,
+                                          clock=FakeClock())
+        assert report['capacity'] == 10
+        assert [metrics['rate'] for metrics in report['curve']] == [5, 10]
+
+        report = capacity.search_capacity([self.get_testcase('/api/users')],
+                                          target_p99=10000,
+                                          min_rate=5,
+                                          max_rate=10,
+                                          duration=0.2,
+                                          clock=FakeClock())
+        assert report['capacity'] == 0
+        assert len(report['curve']) == 1
+
+    def test_binary_search(self, monkeypatch):
+        # latency grows over capacity of 180 per second
+        def run_at_rate(testcases, rate, duration, max_in_flight, clock):
+            return {
+                'rate': rate,
+                'error_rate': 0,
+                'p99': 100 if rate <= 180 else 1000
+            }
+
+        monkeypatch.setattr(capacity, 'run_at_rate', run_at_rate)
+        report = capacity.search_capacity([{}], target_p99=200)
+        assert 180 * 0.95 <= report['capacity'] <= 180
+        rates = [metrics['rate'] for metrics in report['curve']]
+        assert rates == sorted(rates)
+        assert rates[0] == 1 and rates[-1] == 1000
+
+        with pytest.raises(exceptions.ParamError):
+            capacity.search_capacity([], target_p99=200)
+        with pytest.raises(exceptions.ParamError):
+            capacity.search_capacity([{}], 200, min_rate=10, max_rate=5)
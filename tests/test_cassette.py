@@ -0,0 +1,158 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import os
+
+import pytest
+import requests
+
+from httprunner import cassette, client, exceptions, loader, response, runner
+from tests.base import TestApiServerBase
+
+
+class TestCassette(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.cassette_path = os.path.join(os.getcwd(), 'tests', 'data',
+                                          'tmp.cassette')
+        self.testcase = {
+            'config': {
+                'name': 'cassette test',
+                'request': {
+                    'base_url': self.host
+                }
+            },
+            'teststeps': [{
+                'name': 'index',
+                'request': {
+                    'url': '/',
+                    'method': 'GET'
+                },
+                'validate': [{
+                    'eq': ['status_code', 200]
+                }]
+            }, {
+                'name': 'get token without sign',
+                'request': {
+                    'url': '/api/get-token',
+                    'method': 'POST',
+                    'json': {
+                        'sign': 'abc',
+                        'ts': '${get_timestamp()}'
+                    }
+                },
+                'extract': [{
+                    'msg': 'content.msg'
+                }],
+                'validate': [{
+                    'eq': ['status_code', 403]
+                }, {
+                    'eq': ['content.success', False]
+                }]
+            }, {
+                'name': 'get users without token',
+                'request': {
+                    'url': '/api/users?b=2&a=1',
+                    'method': 'GET',
+                    'stream': True
+                },
+                'validate': [{
+                    'eq': ['status_code', 401]
+                }, {
+                    'eq': ['content.success', False]
+                }]
+            }]
+        }
+        for teststep in self.testcase['teststeps']:
+            response.compile_teststep_fields(teststep)
+
+    def teardown_method(self):
+        if os.path.isfile(self.cassette_path):
+            os.remove(self.cassette_path)
+
+    def test_record_and_replay(self):
+        with cassette.Cassette(
+                self.cassette_path, 'record',
+                match_body_fields=['sign']) as recorder:
+            runner.run_testcase(self.testcase,
+                                client.HttpSession(cassette=recorder))
+            assert len(recorder.index) == 3
+
+        self.testcase['config']['request']['base_url'] = self.host
+        with cassette.Cassette(
+                self.cassette_path, 'replay',
+                match_body_fields=['sign']) as player:
+            http_client_session = client.HttpSession(cassette=player)
+            for adapter in http_client_session.adapters.values():
+                assert isinstance(adapter, cassette.ReplayAdapter)
+
+            self.testcase['teststeps'][2]['request'][
+                'url'] = '/api/users?a=1&b=2'
+            test_runner = runner.run_testcase(self.testcase,
+                                              http_client_session)
+            assert test_runner.context.testcase_runtime_variables_mapping[
+                'msg'] == 'Authorzation failed!'
+
+            with pytest.raises(exceptions.RecordNotFound):
+                http_client_session.request('GET', f'{self.host}/not-exist')
+
+    def gen_response(self, body, set_cookies=None):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = f'{self.host}/'
+        resp._content = body
+        resp.raw = cassette.ReplayBody(body, set_cookies or [])
+        return resp
+
+    def test_replay_cookies(self):
+        request = requests.Request('GET', f'{self.host}/').prepare()
+        with cassette.Cassette(self.cassette_path, 'record') as recorder:
+            recorder.record(
+                request,
+                self.gen_response(b'ok', ['token=abc; Path=/', 'sid=1']))
+
+        with cassette.Cassette(self.cassette_path, 'replay') as player:
+            http_client_session = client.HttpSession(cassette=player)
+            resp = http_client_session.request('GET', f'{self.host}/')
+            assert resp.content == b'ok'
+            assert http_client_session.cookies.get_dict() == {
+                'token': 'abc',
+                'sid': '1'
+            }
+
+    def test_record_concurrently(self):
+        def record(index):
+            request = requests.Request('GET',
+                                       f'{self.host}/{index % 10}').prepare()
+            recorder.record(request,
+                            self.gen_response(str(index).encode() * 1000))
+
+        with cassette.Cassette(self.cassette_path, 'record') as recorder:
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                list(executor.map(record, range(200)))
+
+        with cassette.Cassette(self.cassette_path, 'replay') as player:
+            for index in range(10):
+                request = requests.Request('GET',
+                                           f'{self.host}/{index}').prepare()
+                for _ in range(20):
+                    body = player.play(request).content
+                    assert int(body[:len(body) // 1000]) % 10 == index
+
+    def test_cassette_errors(self):
+        with pytest.raises(exceptions.ParamError):
+            cassette.Cassette(self.cassette_path, 'rewind')
+
+        with pytest.raises(exceptions.FileNotFound):
+            cassette.Cassette(self.cassette_path, 'replay')
+
+        with open(self.cassette_path, 'wb') as f:
+            f.write(b'not a cassette')
+        with pytest.raises(exceptions.FileFormatError):
+            cassette.Cassette(self.cassette_path, 'replay')
+
+    def test_normalize_url(self):
+        assert cassette.normalize_url(
+            'http://127.0.0.1:5000/api/users?b=2&a=1#top'
+        ) == 'http://127.0.0.1:5000/api/users?a=1&b=2'
@@ -0,0 +1,341 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import io
+import threading
+import time
+
+import pytest
+import requests
+
+from httprunner import client, exceptions
+from tests.base import TestApiServerBase
+
+
+class TestHttpClient(TestApiServerBase):
+    def setup_method(self):
+        self.http_client_session = client.HttpSession(self.host)
+
+    def test_build_url(self):
+        assert client.build_url('http://127.0.0.1:5000',
+                                '/api/users') == 'http://127.0.0.1:5000/api/users'
+        assert client.build_url('http://127.0.0.1:5000/',
+                                'api/users') == 'http://127.0.0.1:5000/api/users'
+        assert client.build_url(
+            'http://127.0.0.1:5000',
+            'http://127.0.0.1:3458/headers') == 'http://127.0.0.1:3458/headers'
+        assert client.build_url('', '/api/users') == '/api/users'
+
+    def test_request(self):
+        resp = self.http_client_session.request('GET', '/')
+        assert resp.status_code == 200
+        assert resp.text == 'Hello world!'
+        assert resp.elapsed_seconds > 0
+
+    def test_request_skip_body(self):
+        resp = self.http_client_session.request('GET', '/', skip_body=True)
+        assert resp.status_code == 200
+        assert resp.content == b''
+        assert resp.headers['Content-Length'] == '12'
+
+        # connection is reusable after body is discarded
+        resp = self.http_client_session.request('GET', '/')
+        assert resp.text == 'Hello world!'
+
+    def test_request_cached(self):
+        coalescer = client.RequestCoalescer(cache_ttl=60)
+        http_client_session = client.HttpSession(
+            self.host, coalescer=coalescer)
+        for _ in range(3):
+            resp = http_client_session.request('GET', '/', name='index')
+            assert resp.text == 'Hello world!'
+            assert resp.elapsed_seconds >= 0
+
+        resp = http_client_session.request('POST', '/api/get-token', json={})
+        assert resp.status_code == 403
+        assert coalescer.get_report() == {
+            'index': {
+                'requests': 3,
+                'upstream': 1,
+                'coalesced': 0,
+                'cached': 2,
+                'hit_rate': 0.6667
+            }
+        }
+
+    def test_discard_body(self):
+        resp = requests.Response()
+        resp.raw = io.BytesIO(b'a' * 200000)
+        client.discard_body(resp)
+        assert resp.raw.tell() == 200000
+        assert resp.body_discarded
+        assert resp._content is False
+
+
+class TestRequestCoalescer:
+    def gen_response(self):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b'{"success": true}'
+        return resp
+
+    def test_get_request_key(self):
+        get_key = client.RequestCoalescer.get_request_key
+        assert get_key('GET', '/api/users', {'headers': {'token': 'a'}}) \
+            == get_key('get', '/api/users', {'headers': {'token': 'a'}})
+        assert get_key('GET', '/api/users', {'headers': {'token': 'a'}}) \
+            != get_key('GET', '/api/users', {'headers': {'token': 'b'}})
+        assert get_key('POST', '/api/users', {}) is None
+        assert get_key('GET', '/api/users', {'json': {'a': 1}}) is None
+        assert get_key('GET', '/api/users', {'stream': True}) is None
+        assert get_key('GET', '/api/users', {}) \
+            != get_key('GET', '/api/users', {}, skip_body=True)
+
+        # effective headers, cookies and auth of session are part of key
+        session_a = requests.Session()
+        session_a.headers['Token'] = 'a'
+        session_b = requests.Session()
+        session_b.headers['Token'] = 'b'
+        assert get_key('GET', '/api/users', {}, session_a) \
+            != get_key('GET', '/api/users', {}, session_b)
+        assert get_key('GET', '/api/users', {}, session_a) \
+            == get_key('GET', '/api/users', {'headers': {'token': 'a'}},
+                       requests.Session())
+        session_b.headers['Token'] = 'a'
+        session_b.cookies.set('sid', '1')
+        assert get_key('GET', '/api/users', {}, session_a) \
+            != get_key('GET', '/api/users', {}, session_b)
+        assert get_key('GET', '/api/users', {'auth': ('a', '1')}) \
+            != get_key('GET', '/api/users', {'auth': ('b', '1')})
+
+    def test_cache_eviction(self):
+        coalescer = client.RequestCoalescer(cache_ttl=60, max_cache_size=2)
+        for key in ['a', 'b', 'c']:
+            coalescer.request(key, 'get users', self.gen_response)
+        assert list(coalescer.cache) == ['b', 'c']
+
+        coalescer.cache_ttl = 0.01
+        coalescer.request('d', 'get users', self.gen_response)
+        time.sleep(0.02)
+        coalescer.request('e', 'get users', self.gen_response)
+        # expired responses are evicted first
+        assert list(coalescer.cache) == ['c', 'e']
+
+    def test_coalesce_concurrent_requests(self):
+        coalescer = client.RequestCoalescer()
+        upstream_count = []
+
+        def send_request():
+            upstream_count.append(1)
+            time.sleep(0.2)
+            return self.gen_response()
+
+        responses = []
+
+        def worker():
+            responses.append(
+                coalescer.request('key', 'get users', send_request))
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(upstream_count) == 1
+        assert len(responses) == 10
+        assert len(set(id(resp) for resp in responses)) == 10
+        assert all(resp.json() == {'success': True} for resp in responses)
+
+        report = coalescer.get_report()['get users']
+        assert report['upstream'] == 1
+        assert report['coalesced'] == 9
+        assert report['hit_rate'] == 0.9
+
+        # finished request is not cached without ttl
+        coalescer.request('key', 'get users', send_request)
+        assert len(upstream_count) == 2
+
+    def test_coalesce_error(self):
+        coalescer = client.RequestCoalescer(cache_ttl=60)
+
+        def send_request():
+            raise requests.ConnectionError('refused')
+
+        with pytest.raises(requests.ConnectionError):
+            coalescer.request('key', 'get users', send_request)
+        assert coalescer.flights == {}
+        assert coalescer.cache == {}
+
+
+class TestTokenBucket:
+    def test_acquire(self):
+        token_bucket = client.TokenBucket(rate=50, burst=2)
+        # burst is served at once
+        assert token_bucket.acquire() == 0
+        assert token_bucket.acquire() == 0
+
+        start_at = time.perf_counter()
+        waits = [token_bucket.acquire() for _ in range(3)]
+        elapsed = time.perf_counter() - start_at
+        assert all(wait > 0 for wait in waits)
+        assert 0.05 <= elapsed < 0.1
+
+    def test_reserve_concurrently(self):
+        token_bucket = client.TokenBucket(rate=100)
+        waits = []
+        threads = [
+            threading.Thread(target=lambda: waits.append(token_bucket.reserve()))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # each caller is given its own slot
+        assert sorted(round(wait, 2) for wait in waits) == \
+            [0, 0.01, 0.02, 0.03, 0.04]
+
+    def test_rate_limiters(self):
+        rate_limiters = client.RateLimiters()
+        rate_limiter = rate_limiters.get('api:test', 10)
+        assert rate_limiters.get('api:test', 10) is rate_limiter
+
+        # one bucket for each name, lowest limits win in any order
+        assert rate_limiters.get('api:test', 10, 5) is rate_limiter
+        assert (rate_limiter.rate, rate_limiter.burst) == (10, 1)
+        assert rate_limiters.get('api:test', 5, 3) is rate_limiter
+        assert (rate_limiter.rate, rate_limiter.burst) == (5, 1)
+        assert rate_limiters.get('api:test', 20) is rate_limiter
+        assert rate_limiter.rate == 5
+
+        rate_limiter = rate_limiters.get('api:test_reversed', 5, 3)
+        rate_limiters.get('api:test_reversed', 10)
+        assert (rate_limiter.rate, rate_limiter.burst) == (5, 1)
+
+        # limits of another run are not tightened by this one
+        other_rate_limiter = client.RateLimiters().get('api:test', 20)
+        assert other_rate_limiter is not rate_limiters.get('api:test', 5)
+        assert other_rate_limiter.rate == 20
+        assert client.HttpSession().rate_limiters is not \
+            client.HttpSession().rate_limiters
+        assert client.parse_rate_limit({'rate': 10, 'burst': 5}) == (10, 5)
+        assert client.parse_rate_limit(10) == (10, 1)
+
+        with pytest.raises(exceptions.ParamError):
+            client.TokenBucket(0)
+        with pytest.raises(exceptions.ParamError):
+            rate_limiter.tighten(10, 0)
+
+
+class FakeResponse:
+    def __init__(self, value):
+        self.value = value
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestRequestHedger:
+    def setup_method(self):
+        self.hedger = client.RequestHedger(percentile=50, min_samples=3)
+        self.session = requests.Session()
+
+    def teardown_method(self):
+        self.hedger.close()
+
+    def warm_up(self, name, elapsed):
+        for _ in range(3):
+            self.hedger.request(name, self.session,
+                                lambda attempt_session: time.sleep(elapsed))
+
+    def test_hedge_slow_request(self):
+        assert self.hedger.get_hedge_delay('get user') is None
+        self.warm_up('get user', 0.01)
+        assert 0.005 < self.hedger.get_hedge_delay('get user') < 0.05
+
+        responses = []
+        attempt_sessions = []
+        self.session.cookies.set('token', 'abc')
+
+        def send_request(attempt_session):
+            # original request stalls, duplicate is fast
+            resp = FakeResponse(len(responses))
+            responses.append(resp)
+            attempt_sessions.append(attempt_session)
+            attempt_session.cookies.set('attempt', str(resp.value))
+            time.sleep(0.3 if resp.value == 0 else 0.01)
+            return resp
+
+        rate_limiter = client.TokenBucket(rate=1000, burst=10)
+        start_at = time.perf_counter()
+        resp = self.hedger.request('get user', self.session, send_request,
+                                   [('api:get_user', rate_limiter)])
+        assert time.perf_counter() - start_at < 0.2
+        assert resp.value == 1
+        # duplicate takes its own token
+        assert rate_limiter.tokens < 10
+
+        # attempts never use caller session, cookies of winner are merged
+        assert len(set(map(id, attempt_sessions))) == 2
+        assert self.session not in attempt_sessions
+        assert attempt_sessions[0].cookies.get('token') == 'abc'
+        assert self.session.cookies.get('attempt') == '1'
+
+        report = self.hedger.get_report()['get user']
+        assert report['requests'] == 4
+        assert report['hedged'] == 1
+        assert report['hedge_wins'] == 1
+
+        # losing response is closed once it arrives
+        time.sleep(0.4)
+        assert responses[0].closed
+
+    def test_no_hedge_for_fast_request(self):
+        self.warm_up('get users', 0.05)
+        resp = self.hedger.request('get users', self.session,
+                                   lambda attempt_session: FakeResponse(0))
+        assert resp.value == 0
+        assert self.hedger.get_report()['get users']['hedged'] == 0
+
+    def test_hedge_failure(self):
+        self.warm_up('get user', 0.01)
+        calls = []
+
+        def send_request(attempt_session):
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise requests.ConnectionError('refused')
+            time.sleep(0.1)
+            return FakeResponse(len(calls))
+
+        # failed original request does not win
+        assert self.hedger.request('get user', self.session,
+                                   send_request).value == 2
+
+    def test_is_hedgeable(self):
+        assert client.RequestHedger.is_hedgeable('get', {})
+        assert not client.RequestHedger.is_hedgeable('POST', {})
+        assert not client.RequestHedger.is_hedgeable('GET', {'stream': True})
+        with pytest.raises(exceptions.ParamError):
+            client.RequestHedger(percentile=100)
+
+
+class TestHedgedSession(TestApiServerBase):
+    def test_request_hedged(self):
+        hedger = client.RequestHedger(min_samples=1)
+        http_client_session = client.HttpSession(self.host, hedger=hedger)
+        for _ in range(3):
+            resp = http_client_session.request('GET',
+                                               '/',
+                                               name='index',
+                                               hedge=True)
+            assert resp.status_code == 200
+        # not opted in
+        http_client_session.request('GET', '/', name='index')
+        hedger.close()
+
+        assert hedger.get_report()['index']['requests'] == 3
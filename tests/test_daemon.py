@@ -0,0 +1,215 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from httprunner import daemon, daemon_client, distributed, exceptions, loader
+from tests.base import TestApiServerBase
+
+TESTCASE_CONTENT = '''
+- config:
+    name: daemon test
+    request:
+      base_url: {host}
+- test:
+    name: index
+    request:
+      url: /
+      method: GET
+    validate:
+      - eq: [status_code, {status_code}]
+'''
+
+
+class TestRunnerDaemon(TestApiServerBase):
+    def setup_method(self):
+        self.project_path = os.path.join(os.getcwd(), 'tests')
+        self.socket_path = os.path.join(self.project_path, 'data',
+                                        'tmp_daemon.sock')
+        self.testcase_path = os.path.join(self.project_path, 'data',
+                                          'tmp_daemon.yml')
+        self.write_testcase(200)
+        self.runner_daemon = daemon.RunnerDaemon(self.project_path,
+                                                 self.socket_path)
+
+    def teardown_method(self):
+        os.remove(self.testcase_path)
+        loader.load_project_tests(self.project_path)
+
+    def write_testcase(self, status_code):
+        with open(self.testcase_path, 'w', encoding='utf-8') as f:
+            f.write(
+                TESTCASE_CONTENT.format(host=self.host,
+                                        status_code=status_code))
+
+    def touch(self, path):
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_run(self):
+        report = self.runner_daemon.run([self.testcase_path])
+        assert report['successes'] == 1
+        assert report['reloaded'] == []
+        assert report['reloaded_testcases'] == [self.testcase_path]
+        assert report['stats']['teststeps']['index']['count'] == 1
+
+        # unchanged testcase is reused
+        report = self.runner_daemon.run([self.testcase_path], iterations=2)
+        assert report['successes'] == 2
+        assert report['reloaded_testcases'] == []
+
+        self.write_testcase(201)
+        self.touch(self.testcase_path)
+        report = self.runner_daemon.run([self.testcase_path])
+        assert report['failures'] == 1
+        assert report['reloaded_testcases'] == [self.testcase_path]
+
+    def test_reload_changed(self):
+        self.runner_daemon.run([self.testcase_path])
+        assert self.runner_daemon.reload_changed() == []
+
+        api_path = os.path.join(self.project_path, 'api', 'basic.yml')
+        confcustom_path = os.path.join(self.project_path, 'confcustom.py')
+        stat_api = os.stat(api_path)
+        stat_confcustom = os.stat(confcustom_path)
+        try:
+            self.touch(api_path)
+            self.touch(confcustom_path)
+            assert self.runner_daemon.reload_changed() == [
+                'confcustom', 'api'
+            ]
+            assert self.runner_daemon.testcases_mapping == {}
+            assert 'get_token' in loader.project_mapping['def-api']
+            assert 'is_status_code_200' in loader.project_mapping[
+                'confcustom']['functions']
+            assert 'gen_random_string' in loader.project_mapping[
+                'confcustom']['functions']
+        finally:
+            os.utime(api_path, ns=(stat_api.st_atime_ns,
+                                   stat_api.st_mtime_ns))
+            os.utime(confcustom_path,
+                     ns=(stat_confcustom.st_atime_ns,
+                         stat_confcustom.st_mtime_ns))
+
+    def test_load_testcases_not_found(self):
+        with pytest.raises(exceptions.FileNotFound):
+            self.runner_daemon.load_testcases(['not_exist.yml'])
+
+    def test_load_testcases_relative_to_cwd(self):
+        testcases, _ = self.runner_daemon.load_testcases(
+            [os.path.join('data', 'tmp_daemon.yml')], self.project_path)
+        assert testcases[0]['config']['name'] == 'daemon test'
+
+    def test_load_invalid_testcase(self):
+        invalid_path = os.path.join(self.project_path, 'data',
+                                    'tmp_daemon_invalid.yml')
+        with open(invalid_path, 'w', encoding='utf-8') as f:
+            f.write('foo: bar\n')
+        try:
+            # named file is reported, also when loaded from cache
+            for _ in range(2):
+                response = self.runner_daemon.handle_request({
+                    'command': 'run',
+                    'paths': [invalid_path]
+                })
+                assert 'FileFormatError' in response['error']
+                assert invalid_path in response['error']
+        finally:
+            os.remove(invalid_path)
+
+    def test_handle_request_error(self, monkeypatch):
+        def reload_changed():
+            raise SyntaxError('invalid syntax in confcustom.py')
+
+        monkeypatch.setattr(self.runner_daemon, 'reload_changed',
+                            reload_changed)
+        response = self.runner_daemon.handle_request({
+            'command': 'run',
+            'paths': [self.testcase_path]
+        })
+        assert 'SyntaxError' in response['error']
+
+        response = self.runner_daemon.handle_payload(
+            daemon.MESSAGE_REQUEST, b'not zlib')
+        assert 'invalid request payload' in response['error']
+        response = self.runner_daemon.handle_payload(
+            daemon.MESSAGE_REQUEST, distributed.dump_json(['run']))
+        assert 'invalid request' in response['error']
+
+    def test_serve(self):
+        thread = threading.Thread(target=self.runner_daemon.serve_forever)
+        self.runner_daemon.listen()
+        thread.start()
+        try:
+            assert daemon_client.send_request(self.socket_path, {
+                'command': 'ping'
+            }, timeout=5) == {'pong': True}
+
+            response = daemon_client.send_request(self.socket_path, {
+                'command': 'run',
+                'paths': [self.testcase_path]
+            }, timeout=30)
+            assert response['successes'] == 1
+            assert response['duration'] < 1
+
+            # relative to cwd of client
+            response = daemon_client.send_request(self.socket_path, {
+                'command': 'run',
+                'paths': [os.path.relpath(self.testcase_path)]
+            }, timeout=30)
+            assert response['successes'] == 1
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5)
+                sock.connect(self.socket_path)
+                distributed.send_frame(sock, daemon.MESSAGE_REQUEST, b'bad')
+                _, payload = distributed.recv_frame(sock)
+                assert 'error' in distributed.load_json(payload)
+
+            response = daemon_client.send_request(self.socket_path, {
+                'command': 'unknown'
+            }, timeout=5)
+            assert 'ParamError' in response['error']
+        finally:
+            daemon_client.send_request(self.socket_path,
+                                       {'command': 'shutdown'},
+                                       timeout=5)
+            thread.join(5)
+
+        assert not os.path.exists(self.socket_path)
+
+    def test_listen(self):
+        # stale socket file of previous daemon is replaced
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(self.socket_path)
+        self.runner_daemon.listen()
+        try:
+            mode = os.stat(self.socket_path).st_mode
+            assert mode & 0o077 == 0
+        finally:
+            self.runner_daemon.server_socket.close()
+            os.remove(self.socket_path)
+
+        with open(self.socket_path, 'w') as f:
+            f.write('not socket')
+        try:
+            with pytest.raises(exceptions.ParamError):
+                self.runner_daemon.listen()
+            assert os.path.isfile(self.socket_path)
+        finally:
+            os.remove(self.socket_path)
+
+    def test_client_imports(self):
+        code = 'import sys; import httprunner.daemon_client; ' \
+            'print(" ".join(sorted(m for m in sys.modules ' \
+            'if m.startswith("httprunner"))))'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        assert output.decode('utf-8').split() == [
+            'httprunner', 'httprunner.daemon_client', 'httprunner.exceptions'
+        ]
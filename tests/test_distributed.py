@@ -0,0 +1,284 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import socket
+import threading
+
+import pytest
+
+from httprunner import distributed, exceptions, loader, stats
+from tests.base import TestApiServerBase
+
+
+class TestDistributed(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.testcase = {
+            'config': {
+                'name': 'distributed test',
+                'variables': [{
+                    'uid': 0
+                }],
+                'request': {
+                    'base_url': self.host
+                }
+            },
+            'teststeps': [{
+                'name': 'index $uid',
+                'request': {
+                    'url': '/',
+                    'method': 'GET',
+                    'params': {
+                        'uid': '$uid'
+                    }
+                },
+                'validate': [{
+                    'eq': ['status_code', 200]
+                }]
+            }]
+        }
+
+    def start_workers(self, port, secret, workers_count):
+        workers = [
+            multiprocessing.Process(
+                target=distributed.run_worker,
+                args=('127.0.0.1', port, secret, 0.1))
+            for _ in range(workers_count)
+        ]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def test_split_range(self):
+        assert distributed.split_range(10, 3) == [(0, 4), (4, 7), (7, 10)]
+        assert distributed.split_range(1, 2) == [(0, 1), (1, 1)]
+
+    def test_get_plan_testcases(self):
+        plan = {
+            'testcases': [self.testcase],
+            'parameters': [{
+                'uid': 1000
+            }, {
+                'uid': 1001
+            }],
+            'range': [4, 6]
+        }
+        testcases = distributed.get_plan_testcases(plan)
+        assert len(testcases) == 2
+        assert testcases[1]['config']['variables'] == [{
+            'uid': 0
+        }, {
+            'uid': 1001
+        }]
+        assert self.testcase['config']['variables'] == [{'uid': 0}]
+
+        testcase = dict(self.testcase,
+                        config=dict(self.testcase['config'],
+                                    variables={
+                                        'uid': 0,
+                                        'token': 'abc'
+                                    }))
+        plan['testcases'] = [testcase]
+        testcases = distributed.get_plan_testcases(plan)
+        assert testcases[0]['config']['variables'] == [{
+            'uid': 0
+        }, {
+            'token': 'abc'
+        }, {
+            'uid': 1000
+        }]
+
+        plan = {'testcases': [self.testcase], 'range': [0, 3]}
+        assert len(distributed.get_plan_testcases(plan)) == 3
+
+    def test_frames(self):
+        sock_a, sock_b = socket.socketpair()
+        with sock_a, sock_b:
+            distributed.send_frame(sock_a, distributed.MESSAGE_PLAN,
+                                   distributed.dump_json({'a': 1}))
+            message_type, payload = distributed.recv_frame(sock_b)
+            assert message_type == distributed.MESSAGE_PLAN
+            assert distributed.load_json(payload) == {'a': 1}
+
+            sock_a.close()
+            with pytest.raises(exceptions.WorkerError):
+                distributed.recv_frame(sock_b)
+
+    def test_sign_payload(self):
+        nonce = os.urandom(distributed.NONCE_SIZE)
+        signed_payload = distributed.sign_payload(
+            'secret', nonce, distributed.MESSAGE_SNAPSHOT, b'snapshot')
+        assert distributed.verify_payload('secret', nonce,
+                                          distributed.MESSAGE_SNAPSHOT,
+                                          signed_payload) == b'snapshot'
+
+        with pytest.raises(exceptions.WorkerError):
+            distributed.verify_payload('other', nonce,
+                                       distributed.MESSAGE_SNAPSHOT,
+                                       signed_payload)
+        # replayed to another worker
+        with pytest.raises(exceptions.WorkerError):
+            distributed.verify_payload('secret',
+                                       os.urandom(distributed.NONCE_SIZE),
+                                       distributed.MESSAGE_SNAPSHOT,
+                                       signed_payload)
+        with pytest.raises(exceptions.WorkerError):
+            distributed.verify_payload('secret', nonce,
+                                       distributed.MESSAGE_PLAN,
+                                       signed_payload)
+        with pytest.raises(exceptions.ParamError):
+            distributed.sign_payload('', nonce, distributed.MESSAGE_PLAN, b'')
+
+    def test_worker_rejects_unauthenticated_snapshot(self):
+        coordinator = distributed.Coordinator([self.testcase])
+        coordinator.listen()
+        worker_errors = []
+
+        def run_worker():
+            try:
+                distributed.run_worker('127.0.0.1', coordinator.port, 'wrong')
+            except exceptions.WorkerError as err:
+                worker_errors.append(err)
+
+        worker_thread = threading.Thread(target=run_worker)
+        worker_thread.start()
+        try:
+            with pytest.raises(exceptions.WorkerError):
+                coordinator.run(1, timeout=10)
+        finally:
+            coordinator.close()
+            worker_thread.join(5)
+
+        assert len(worker_errors) == 1
+
+    def test_run_with_parameters(self):
+        coordinator = distributed.Coordinator(
+            [self.testcase],
+            parameters=[{
+                'uid': uid
+            } for uid in range(1000, 1010)],
+            threads=2)
+        coordinator.listen()
+        workers = self.start_workers(coordinator.port, coordinator.secret,
+                                     3)
+        try:
+            report = coordinator.run(3, timeout=30)
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(5)
+
+        assert report['workers'] == 3
+        assert report['total'] == 10
+        assert report['successes'] == 10
+        assert len(coordinator.workers_stats) == 3
+        assert report['stats']['teststeps']['index $uid']['count'] == 10
+
+    def test_run_with_iterations(self):
+        self.testcase['teststeps'][0]['validate'].append({
+            'eq': ['status_code', 201]
+        })
+        coordinator = distributed.Coordinator([self.testcase],
+                                              iterations=4,
+                                              threads=2)
+        coordinator.listen()
+        workers = self.start_workers(coordinator.port, coordinator.secret,
+                                     2)
+        try:
+            report = coordinator.run(2, timeout=30)
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(5)
+
+        assert report['total'] == 4
+        assert report['failures'] == 4
+        assert report['errors'][0][0] == 'distributed test'
+        merged_stats = coordinator.get_merged_stats()
+        assert isinstance(merged_stats, stats.LatencyStats)
+        assert merged_stats.teststeps_histograms['index $uid'].total_count == 4
+
+    def test_run_with_sla(self):
+        # SLA holds only on results merged from both workers
+        self.testcase['config']['sla'] = [{
+            'count_eq': 4
+        }, {
+            'count_eq': ['index $uid', 4]
+        }]
+        coordinator = distributed.Coordinator([self.testcase],
+                                              iterations=4,
+                                              threads=2)
+        coordinator.listen()
+        workers = self.start_workers(coordinator.port, coordinator.secret,
+                                     2)
+        try:
+            report = coordinator.run(2, timeout=30)
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(5)
+
+        assert report['sla_passed'] is True
+        assert [validator['check_value'] for validator in report['sla']
+                ] == [4, 4]
+        assert report['successes'] == 4
+
+        self.testcase['config']['sla'] = [{'count_eq': 5}]
+        coordinator = distributed.Coordinator([self.testcase],
+                                              iterations=4,
+                                              threads=2)
+        coordinator.listen()
+        workers = self.start_workers(coordinator.port, coordinator.secret,
+                                     2)
+        try:
+            report = coordinator.run(2, timeout=30)
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(5)
+
+        assert report['sla_passed'] is False
+        assert report['successes'] == 0
+        assert report['failures'] == 4
+
+    def test_run_with_invalid_sla(self):
+        self.testcase['config']['sla'] = [{'p98_lt': 200}]
+        coordinator = distributed.Coordinator([self.testcase])
+        with pytest.raises(exceptions.ParamError):
+            coordinator.run(1, timeout=0.2)
+        assert coordinator.server_socket is None
+
+    def test_run_worker_error(self):
+        # invalid threads count fails worker run
+        coordinator = distributed.Coordinator([self.testcase], threads=0)
+        coordinator.listen()
+        workers = self.start_workers(coordinator.port, coordinator.secret, 1)
+        try:
+            with pytest.raises(exceptions.WorkerError) as excinfo:
+                coordinator.run(1, timeout=30)
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.join(5)
+
+        assert 'worker 0 failed' in str(excinfo.value)
+        assert 'ParamError' in str(excinfo.value)
+
+    def test_listen(self):
+        coordinator = distributed.Coordinator([self.testcase])
+        coordinator.listen()
+        try:
+            assert coordinator.port > 0
+            with socket.create_connection(('127.0.0.1', coordinator.port)):
+                pass
+        finally:
+            coordinator.close()
+        assert coordinator.server_socket is None
+
+    def test_run_timeout(self):
+        coordinator = distributed.Coordinator([self.testcase])
+        with pytest.raises(exceptions.WorkerError):
+            coordinator.run(1, timeout=0.2)
+        coordinator.close()
@@ -0,0 +1,108 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from httprunner import fixture
+
+
+class TestFixtureCache:
+    def test_get_and_set(self):
+        fixture_cache = fixture.FixtureCache()
+        assert fixture_cache.get('setup_and_reset', '[]') is None
+
+        output = {'token': 'abc'}
+        fixture_cache.set('setup_and_reset', '[]', output)
+        output['token'] = 'xyz'
+
+        cached = fixture_cache.get('setup_and_reset', '[]')
+        assert cached == {'token': 'abc'}
+        cached['token'] = 'xyz'
+        assert fixture_cache.get('setup_and_reset', '[]') == {'token': 'abc'}
+        assert fixture_cache.get('setup_and_reset', '["sn"]') is None
+
+        assert fixture_cache.get_report() == {
+            'setup_and_reset': {
+                'runs': 1,
+                'reused': 2
+            }
+        }
+
+    def test_ttl(self):
+        fixture_cache = fixture.FixtureCache(default_ttl=0.05)
+        fixture_cache.set('setup_and_reset', '[]', {'token': 'abc'})
+        fixture_cache.set('create_and_check', '[]', {'token': 'abc'}, ttl=60)
+        time.sleep(0.1)
+        assert fixture_cache.get('setup_and_reset', '[]') is None
+        assert fixture_cache.get('create_and_check', '[]') is not None
+
+    def test_max_size(self):
+        fixture_cache = fixture.FixtureCache(max_size=2)
+        fixture_cache.set('setup_and_reset', '["a"]', {'token': 'a'}, ttl=0)
+        fixture_cache.set('setup_and_reset', '["b"]', {'token': 'b'})
+        # expired output is evicted on set
+        assert list(fixture_cache.fixtures_mapping) == [
+            ('setup_and_reset', '["b"]')
+        ]
+
+        fixture_cache.set('setup_and_reset', '["c"]', {'token': 'c'})
+        # recently used output is kept
+        fixture_cache.get('setup_and_reset', '["b"]')
+        fixture_cache.set('setup_and_reset', '["d"]', {'token': 'd'})
+        assert list(fixture_cache.fixtures_mapping) == [
+            ('setup_and_reset', '["b"]'), ('setup_and_reset', '["d"]')
+        ]
+
+    def test_invalidate(self):
+        fixture_cache = fixture.FixtureCache()
+        fixture_cache.set('setup_and_reset', '["a"]', {'token': 'a'})
+        fixture_cache.set('setup_and_reset', '["b"]', {'token': 'b'})
+        fixture_cache.set('create_and_check', '[]', {'token': 'c'})
+
+        fixture_cache.invalidate('setup_and_reset')
+        assert fixture_cache.get('setup_and_reset', '["a"]') is None
+        assert fixture_cache.get('create_and_check', '[]') is not None
+
+        fixture_cache.invalidate()
+        assert fixture_cache.fixtures_mapping == {}
+
+    def test_get_or_run_single_flight(self):
+        fixture_cache = fixture.FixtureCache()
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def run():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return {'token': 'abc'}
+
+        results = []
+
+        def get_or_run():
+            results.append(
+                fixture_cache.get_or_run('setup_and_reset', '[]', run))
+
+        threads = [threading.Thread(target=get_or_run) for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(runs) == 1
+        assert sorted(reused for _, reused in results) == [
+            False, True, True, True
+        ]
+        assert all(output == {'token': 'abc'} for output, _ in results)
+        assert fixture_cache.running_locks == {}
+        assert fixture_cache.get_report() == {
+            'setup_and_reset': {
+                'runs': 1,
+                'reused': 3
+            }
+        }
@@ -0,0 +1,229 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+from httprunner import exceptions, impact, loader
+
+API_CONTENT = '''
+- api:
+    def: get_index()
+    request:
+      url: /
+      method: GET
+    validate:
+      - eq: [status_code, {index_status_code}]
+- api:
+    def: get_users()
+    request:
+      url: /api/users
+      method: GET
+'''
+
+SUITE_CONTENT = '''
+- config:
+    name: index suite
+    def: index_suite()
+- test:
+    name: suite index
+    api: get_index()
+'''
+
+TESTCASE_CONTENT = '''
+- config:
+    name: {name}
+- test:
+    name: {name} step
+    {ref_type}: {ref_call}
+'''
+
+
+class TestImpact:
+    def setup_method(self):
+        # confcustom module is imported once, keep it the one of tests
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.project_path = tempfile.mkdtemp()
+        for folder in ['api', 'suite', 'testcases']:
+            os.mkdir(os.path.join(self.project_path, folder))
+
+        self.write('confcustom.py', '')
+        self.write('api/user.yml', API_CONTENT.format(index_status_code=200))
+        self.write('suite/index.yml', SUITE_CONTENT)
+        self.write_testcase('a', 'api', 'get_index()')
+        self.write_testcase('b', 'api', 'get_users()')
+        self.write_testcase('c', 'suite', 'index_suite()')
+
+        self.index = impact.build_index(
+            self.project_path, [os.path.join(self.project_path, 'testcases')])
+
+    def teardown_method(self):
+        shutil.rmtree(self.project_path)
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def get_path(self, relative_path):
+        return os.path.join(self.project_path, relative_path)
+
+    def write(self, relative_path, content):
+        with open(self.get_path(relative_path), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def write_testcase(self, name, ref_type, ref_call):
+        self.write(
+            f'testcases/{name}.yml',
+            TESTCASE_CONTENT.format(name=name,
+                                    ref_type=ref_type,
+                                    ref_call=ref_call))
+
+    def select(self, *relative_paths):
+        return impact.select_testcases(
+            self.index, self.project_path,
+            [self.get_path(path) for path in relative_paths])
+
+    def test_build_index(self):
+        assert self.index['testcases']['testcases/c.yml'] == {
+            'def-api': ['get_index'],
+            'def-testcase': ['index_suite'],
+            'functions': [],
+            'variables': []
+        }
+        assert self.index['def-api']['get_users'][0] == 'api/user.yml'
+        assert self.index['def-testcase']['index_suite'][0] == \
+            'suite/index.yml'
+
+    def test_select_changed_definitions(self):
+        # rewritten without change
+        assert self.select('api/user.yml') == []
+
+        self.write('api/user.yml', API_CONTENT.format(index_status_code=201))
+        assert self.select('api/user.yml') == [
+            self.get_path('testcases/a.yml'),
+            self.get_path('testcases/c.yml')
+        ]
+
+        self.write('suite/index.yml',
+                   SUITE_CONTENT.replace('suite index', 'index step'))
+        assert self.select('suite/index.yml') == [
+            self.get_path('testcases/c.yml')
+        ]
+
+    def test_select_changed_testcases(self):
+        self.write_testcase('d', 'api', 'get_users()')
+        assert self.select('testcases/b.yml', 'testcases/d.yml') == [
+            self.get_path('testcases/b.yml'),
+            self.get_path('testcases/d.yml')
+        ]
+
+        os.remove(self.get_path('testcases/a.yml'))
+        assert self.select('testcases/a.yml') == []
+
+        self.write('.env', 'UserName=debugtalk')
+        assert len(self.select('.env')) == 2
+
+    def test_save_and_load_index(self):
+        index_path = self.get_path('.impact.json')
+        impact.save_index(self.index, index_path)
+        assert impact.load_index(index_path) == self.index
+
+        self.write('.impact.json', '{"version": 0}')
+        with pytest.raises(exceptions.FileFormatError):
+            impact.load_index(index_path)
+
+        with pytest.raises(exceptions.FileNotFound):
+            impact.load_index(self.get_path('missing.json'))
+
+
+class TestImpactFunctions:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, 'functions.py')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_hashes(self, content):
+        with open(self.file_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return impact.get_python_functions_hashes(self.file_path)
+
+    def test_get_python_functions_hashes(self):
+        content = '''
+SECRET_KEY = 'a'
+
+
+def helper(value):
+    return value + SECRET_KEY
+
+
+@staticmethod
+def get_sign(value):
+    return helper(value)
+
+
+def hook_print(msg):
+    print(msg)
+'''
+        hashes = self.get_hashes(content)
+        assert sorted(hashes) == ['get_sign', 'helper', 'hook_print']
+
+        # module state, e.g. constants, is covered
+        changed = self.get_hashes(content.replace("'a'", "'b'"))
+        assert changed['get_sign'] != hashes['get_sign']
+
+        # helpers called are covered, callers are not
+        changed = self.get_hashes(content.replace('value + ', 'value * '))
+        assert changed['get_sign'] != hashes['get_sign']
+        assert changed['hook_print'] == hashes['hook_print']
+
+        # decorators are covered
+        changed = self.get_hashes(content.replace('@staticmethod', ''))
+        assert changed['get_sign'] != hashes['get_sign']
+        assert changed['helper'] == hashes['helper']
+
+        assert self.get_hashes('def broken(:') == {}
+
+    def test_select_changed_variables(self):
+        index = impact.build_index('tests', ['tests/testcases'])
+        assert index['variables']['SECRET_KEY'][0] == 'confcustom.py'
+        # built-in variables are not project variables
+        assert all(name in vars(sys.modules['confcustom'])
+                   for name in index['variables'])
+
+        index['testcases']['testcases/smoketest.yml']['variables'] = [
+            'SECRET_KEY'
+        ]
+        assert impact.select_testcases(index, 'tests',
+                                       ['tests/confcustom.py']) == []
+
+        index['variables']['SECRET_KEY'][1] = 'outdated'
+        assert impact.select_testcases(index, 'tests',
+                                       ['tests/confcustom.py']) == [
+                                           os.path.abspath(
+                                               'tests/testcases/smoketest.yml')
+                                       ]
+
+    def test_select_changed_functions(self):
+        index = impact.build_index('tests', ['tests/testcases'])
+        assert index['testcases']['testcases/smoketest.yml']['functions'] \
+            == ['get_sign']
+        assert index['functions']['get_sign'][0] == 'api_server.py'
+        # built-in functions are not project files
+        assert 'get_timestamp' not in index['functions']
+
+        assert impact.select_testcases(index, 'tests',
+                                       ['tests/api_server.py']) == []
+
+        # function source changed since index is built
+        index['functions']['get_sign'][1] = 'outdated'
+        assert impact.select_testcases(index, 'tests',
+                                       ['tests/api_server.py']) == [
+                                           os.path.abspath(
+                                               'tests/testcases/smoketest.yml')
+                                       ]
+        index['functions']['sum_status_code'][1] = 'outdated'
+        assert impact.select_testcases(index, 'tests',
+                                       ['tests/confcustom.py']) == []
@@ -236,6 +236,54 @@ class TestSuiteLoader:
         assert len(testcase['teststeps']) == 8
         assert testcase['teststeps'][0]['name'] == "get token"
 
+    def test_load_test_file_keeps_definitions(self):
+        loader._load_test_file('tests/testcases/smoketest.yml')
+        suite_def = loader.project_mapping['def-testcase']['setup_and_reset']
+        assert 'skip_body' not in suite_def['teststeps'][0]
+        assert 'request' not in suite_def['teststeps'][0]
+
+        snapshot = loader.get_project_snapshot()
+        assert snapshot['def-testcase']['setup_and_reset'] == suite_def
+        with pytest.raises(TypeError):
+            snapshot['env']['PROJECT_KEY'] = 'abc'
+
+    def test_load_test_file_fixture(self):
+        testcase = loader._load_test_file(
+            'tests/data/demo_testcase_fixture.yml')
+        assert len(testcase['teststeps']) == 4
+
+        fixture = testcase['teststeps'][0]
+        assert fixture['suite'] == 'setup_and_reset($device_sn)'
+        assert fixture['cache'] == {'ttl': 300, 'scope': 'suite'}
+        assert fixture['output'] == ['token', 'device_sn']
+        assert len(fixture['teststeps']) == 2
+        assert fixture['teststeps'][0]['name'] == 'get token'
+        assert 'skip_body' in fixture['teststeps'][0]
+
+    def test_load_fixture_teststep_default(self):
+        fixture = loader._load_fixture_teststep(
+            {
+                'suite': 'setup_and_reset($device_sn)',
+                'cache': True
+            }, {
+                'config': {
+                    'output': ['token']
+                },
+                'teststeps': []
+            })
+        assert fixture['name'] == 'setup_and_reset($device_sn)'
+        assert fixture['cache'] == {'ttl': None, 'scope': 'args'}
+        assert fixture['output'] == ['token']
+
+        with pytest.raises(exceptions.ParamError):
+            loader._load_fixture_teststep(
+                {
+                    'suite': 'setup_and_reset($device_sn)',
+                    'cache': {
+                        'scope': 'worker'
+                    }
+                }, {'teststeps': []})
+
     def test_get_block_by_name(self):
         ref_call = "get_user($uid,$token)"
         block = loader._get_block_by_name(ref_call, "def-api")
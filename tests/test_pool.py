@@ -0,0 +1,118 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from httprunner import exceptions, loader, pool, stats
+from tests.base import TestApiServerBase
+
+
+class TestThreadPoolRunner(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.testcase = {
+            'config': {
+                'name': 'pool test',
+                'variables': [{
+                    'device_sn': '${gen_random_string(15)}'
+                }],
+                'request': {
+                    'base_url': self.host
+                }
+            },
+            'teststeps': [{
+                'name': 'index',
+                'request': {
+                    'url': '/',
+                    'method': 'GET',
+                    'headers': {
+                        'sn': '$device_sn'
+                    }
+                },
+                'validate': [{
+                    'eq': ['status_code', 200]
+                }]
+            }, {
+                'name': 'get users without token',
+                'request': {
+                    'url': '/api/users',
+                    'method': 'GET'
+                },
+                'validate': [{
+                    'eq': ['content.success', False]
+                }]
+            }]
+        }
+
+    def test_run(self):
+        latency_stats = stats.LatencyStats()
+        pool_runner = pool.ThreadPoolRunner(4, latency_stats)
+        result = pool_runner.run([self.testcase], iterations=20)
+
+        assert result['total'] == 20
+        assert result['successes'] == 20
+        assert 1 <= len(pool_runner.sessions) <= 4
+        assert len(set(id(session) for session in pool_runner.sessions)) \
+            == len(pool_runner.sessions)
+        assert latency_stats.get_report()['teststeps']['index']['count'] == 20
+
+        pool_runner.close()
+        assert pool_runner.sessions == []
+
+    def test_run_failures(self):
+        self.testcase['teststeps'][1]['validate'].append({
+            'eq': ['status_code', 200]
+        })
+        pool_runner = pool.ThreadPoolRunner(2)
+        result = pool_runner.run([self.testcase], iterations=4)
+        assert result['failures'] == 4
+        assert result['errors'][0][0] == 'pool test'
+        pool_runner.close()
+
+    def test_run_rate_limiters(self):
+        self.testcase['config']['request']['rate_limit'] = 1000
+        pool_runner = pool.ThreadPoolRunner(2)
+        pool_runner.run([self.testcase], iterations=2)
+        rate_limiters = pool_runner.rate_limiters
+        assert rate_limiters.mapping
+        assert all(session.rate_limiters is rate_limiters
+                   for session in pool_runner.sessions)
+
+        # lowered limit of one run is not kept by the next one
+        self.testcase['config']['request']['rate_limit'] = 500
+        pool_runner.run([self.testcase])
+        self.testcase['config']['request']['rate_limit'] = 1000
+        result = pool_runner.run([self.testcase])
+        assert result['successes'] == 1
+        assert pool_runner.rate_limiters is not rate_limiters
+        assert [rate_limiter.rate for rate_limiter in
+                pool_runner.rate_limiters.mapping.values()] == [1000]
+        pool_runner.close()
+
+    def test_project_snapshot(self):
+        pool_runner = pool.ThreadPoolRunner(2)
+        functions = pool_runner.project_mapping['confcustom']['functions']
+        assert 'gen_random_string' in functions
+        with pytest.raises(TypeError):
+            functions['gen_random_string'] = None
+
+        # reloading project does not affect snapshot in use
+        loader.reset_loader()
+        result = pool_runner.run([self.testcase], iterations=2)
+        assert result['successes'] == 2
+        pool_runner.close()
+
+    def test_invalid_threads(self):
+        with pytest.raises(exceptions.ParamError):
+            pool.ThreadPoolRunner(0)
+
+    def test_run_scaling_benchmark(self):
+        benchmark = pool.run_scaling_benchmark([self.testcase],
+                                               threads_list=[1, 4],
+                                               iterations=8)
+        assert [item['threads'] for item in benchmark] == [1, 4]
+        assert benchmark[0]['speedup'] == 1.0
+        assert all(item['failures'] == 0 for item in benchmark)
+        assert all(item['p99'] >= item['p50'] > 0 for item in benchmark)
@@ -0,0 +1,84 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import gc
+import os
+import sys
+
+import pytest
+
+from httprunner import exceptions, loader, prefork
+from tests.base import TestApiServerBase
+
+
+class TestPreforkRunner(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.testcase = {
+            'config': {
+                'name': 'prefork test',
+                'request': {
+                    'base_url': self.host
+                }
+            },
+            'teststeps': [{
+                'name': 'index',
+                'request': {
+                    'url': '/',
+                    'method': 'GET'
+                },
+                'validate': [{
+                    'eq': ['status_code', 200]
+                }]
+            }]
+        }
+
+    def test_get_memory_usage(self):
+        memory = prefork.get_memory_usage()
+        if memory is None:
+            pytest.skip('smaps_rollup is not supported')
+        assert memory['rss'] > 0
+        assert memory['shared'] + memory['private'] == memory['rss']
+        assert prefork.get_memory_usage(-1) is None
+
+    @pytest.mark.skipif(sys.version_info < (3, 7),
+                        reason='gc.freeze requires python 3.7')
+    def test_run(self):
+        gc_enabled = gc.isenabled()
+        report = prefork.PreforkRunner(workers=3,
+                                       threads=2).run([self.testcase],
+                                                      iterations=7)
+
+        assert report['total'] == 7
+        assert report['successes'] == 7
+        assert report['frozen'] > 0
+        assert report['stats']['teststeps']['index']['count'] == 7
+        assert gc.isenabled() == gc_enabled
+        assert gc.get_freeze_count() == 0
+
+        if report['memory']:
+            assert len(report['memory']) == 3
+            assert all(memory['shared'] > 0 for memory in report['memory'])
+            assert len(set(memory['pid'] for memory in report['memory'])) == 3
+
+    def test_run_without_freeze(self):
+        self.testcase['teststeps'][0]['validate'].append({
+            'eq': ['status_code', 201]
+        })
+        report = prefork.PreforkRunner(workers=2,
+                                       freeze=False).run([self.testcase])
+        assert report['frozen'] == 0
+        assert report['failures'] == 1
+        assert report['errors'] == [('prefork test', 'VaildationFailure()')]
+
+    def test_run_without_gc_freeze(self, monkeypatch):
+        monkeypatch.delattr(gc, 'freeze', raising=False)
+        runner = prefork.PreforkRunner(workers=2)
+        assert runner.freeze is False
+        report = runner.run([self.testcase])
+        assert report['frozen'] == 0
+        assert report['successes'] == 1
+
+    def test_invalid_workers(self):
+        with pytest.raises(exceptions.ParamError):
+            prefork.PreforkRunner(workers=0)
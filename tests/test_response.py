@@ -0,0 +1,289 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import io
+import json
+from collections import OrderedDict
+
+import pytest
+import requests
+
+from httprunner import client, exceptions, response, utils
+
+
+def gen_response(content, status_code=200, headers=None):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.encoding = 'utf-8'
+    resp.headers.update(headers or {'Content-Type': 'application/json'})
+    if not isinstance(content, (str, bytes)):
+        content = json.dumps(content)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    resp._content = content
+    return resp
+
+
+class CountingResponse(requests.Response):
+    json_count = 0
+
+    def json(self, **kwargs):
+        CountingResponse.json_count += 1
+        return super().json(**kwargs)
+
+
+class TestResponse:
+    def setup_method(self):
+        self.content = {
+            'success': True,
+            'token': 'abcdefghijklmnop',
+            'data': {
+                'items': [{
+                    'name': 'user1'
+                }, {
+                    'name': 'user2'
+                }]
+            }
+        }
+        self.resp_obj = response.ResponseObject(gen_response(self.content))
+
+    def test_extract_status_code_and_headers(self):
+        assert self.resp_obj.extract_field('status_code') == 200
+        assert self.resp_obj.extract_field(
+            'headers.content-type') == 'application/json'
+
+        with pytest.raises(exceptions.ParamError):
+            self.resp_obj.extract_field('status_code.xx')
+
+        with pytest.raises(exceptions.ExtractFailure):
+            self.resp_obj.extract_field('headers.not-exist')
+
+    def test_extract_content(self):
+        assert self.resp_obj.extract_field('content.success') is True
+        assert self.resp_obj.extract_field('content.token') == 'abcdefghijklmnop'
+        assert self.resp_obj.extract_field(
+            'content.data.items.1.name') == 'user2'
+        assert self.resp_obj.extract_field('content') == self.content
+
+        with pytest.raises(exceptions.ExtractFailure):
+            self.resp_obj.extract_field('content.data.items.5')
+
+    def test_extract_text_content(self):
+        resp_obj = response.ResponseObject(
+            gen_response('LB123abcRB789', headers={'Content-Type': 'text/html'}))
+        assert resp_obj.extract_field('content') == 'LB123abcRB789'
+        assert resp_obj.extract_field('content.0') == 'L'
+        assert resp_obj.extract_field('LB123(.*)RB789') == 'abc'
+
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('content.token')
+
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('LB456(.*)RB789')
+
+    def test_extract_invalid_field(self):
+        with pytest.raises(exceptions.ParamError):
+            self.resp_obj.extract_field('not_exist')
+
+    def test_lazy_json_decoding(self):
+        resp = CountingResponse()
+        resp.status_code = 200
+        resp.encoding = 'utf-8'
+        resp._content = json.dumps(self.content).encode('utf-8')
+        CountingResponse.json_count = 0
+
+        resp_obj = response.ResponseObject(resp)
+        resp_obj.extract_field('status_code')
+        resp_obj.extract_field('headers')
+        assert CountingResponse.json_count == 0
+
+        resp_obj.extract_field('content.token')
+        resp_obj.extract_field('content.success')
+        resp_obj.extract_field('content.token')
+        assert CountingResponse.json_count == 1
+        assert resp_obj._fields_cache['content.token'] == 'abcdefghijklmnop'
+
+    def test_lazy_json_decoding_failure(self):
+        resp = CountingResponse()
+        resp.status_code = 200
+        resp.encoding = 'utf-8'
+        resp._content = b'LB123abcRB789'
+        CountingResponse.json_count = 0
+
+        resp_obj = response.ResponseObject(resp)
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('content.token')
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('content.success')
+        assert resp_obj.extract_field('content') == 'LB123abcRB789'
+        with pytest.raises(ValueError):
+            resp_obj.json
+        assert CountingResponse.json_count == 1
+
+    def test_extract_response(self):
+        extractors = [{
+            'resp_status_code': 'status_code'
+        }, {
+            'token': 'content.token'
+        }, {
+            'first_name': 'content.data.items.0.name'
+        }]
+        extracted_variables_mapping = self.resp_obj.extract_response(
+            extractors)
+        assert extracted_variables_mapping['resp_status_code'] == 200
+        assert extracted_variables_mapping['token'] == 'abcdefghijklmnop'
+        assert extracted_variables_mapping['first_name'] == 'user1'
+        assert self.resp_obj.extract_response([]) == {}
+
+
+class TestCompiledField:
+    def test_compile_content_path(self):
+        assert utils.compile_content_path('data.items.0.name') == (
+            ('data', None), ('items', None), ('0', 0), ('name', None))
+
+    def test_query_content(self):
+        content_path = utils.compile_content_path('data.0.1')
+        assert utils.query_content({'data': {'0': [1, 2]}}, content_path) == 2
+
+        with pytest.raises(TypeError):
+            utils.query_content({'data': 1}, content_path)
+
+    def test_compile_field_shared(self):
+        accessor = response.compile_field('content.data.items.0.name')
+        assert response.compile_field('content.data.items.0.name') is accessor
+
+        resp_obj = response.ResponseObject(
+            gen_response({
+                'data': {
+                    'items': [{
+                        'name': 'user1'
+                    }]
+                }
+            }))
+        assert accessor(resp_obj) == 'user1'
+
+    def test_compile_invalid_field(self):
+        accessor = response.compile_field('status_code.xx')
+        with pytest.raises(exceptions.ParamError):
+            accessor(None)
+
+        accessor = response.compile_field('LB(.*RB(.*)')
+        with pytest.raises(exceptions.ParamError):
+            accessor(response.ResponseObject(gen_response('LB1RB')))
+
+    def test_compile_field_bounded(self, monkeypatch):
+        monkeypatch.setattr(response, 'MAX_COMPILED_FIELDS', 2)
+        monkeypatch.setattr(response, 'compiled_fields_mapping',
+                            OrderedDict())
+        response.compile_field('status_code')
+        response.compile_field('headers.Content-Type')
+        # recently used field is kept
+        response.compile_field('status_code')
+        response.compile_field('content.token')
+        assert list(response.compiled_fields_mapping) == [
+            'status_code', 'content.token'
+        ]
+
+    def test_get_teststep_fields(self):
+        teststep = {
+            'validate': [{
+                'eq': ['status_code', 200]
+            }, {
+                'check': 'content.token',
+                'comparator': 'len_eq',
+                'expect': 16
+            }, {
+                'eq': ['$token', 'abc']
+            }, {
+                'eq': [{
+                    'a': 1
+                }, 1]
+            }],
+            'extract': [{
+                'token': 'content.token'
+            }, {
+                'body': 'LB(.*)RB'
+            }]
+        }
+        assert response.get_teststep_fields(teststep) == [
+            'status_code', 'content.token', 'content.token', 'LB(.*)RB'
+        ]
+
+        response.compile_teststep_fields(teststep)
+        assert 'LB(.*)RB' in response.compiled_fields_mapping
+
+
+class TestStreamResponse:
+    def gen_stream_response(self, content):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.encoding = 'utf-8'
+        resp.headers.update({'Content-Type': 'application/json'})
+        if not isinstance(content, bytes):
+            content = json.dumps(content).encode('utf-8')
+        resp.raw = io.BytesIO(content)
+        return resp
+
+    def test_get_stream_fields(self):
+        fields = [
+            'status_code', 'content', 'content.success', 'json.count',
+            'content.success', 'LB(.*)RB', 'headers.content-type'
+        ]
+        assert response.get_stream_fields(fields) == [
+            'content.success', 'json.count'
+        ]
+
+    def test_extract_stream_fields(self):
+        content = {
+            'success': True,
+            'count': 2,
+            'items': [{
+                'id': index
+            } for index in range(100000)]
+        }
+        resp = self.gen_stream_response(content)
+        resp_obj = response.ResponseObject(
+            resp, stream_fields=['content.success', 'content.count'])
+        assert resp_obj.extract_field('content.success') is True
+        assert resp_obj.extract_field('content.count') == 2
+        assert resp.raw.tell() < 100000
+
+        # other content field reads the whole body
+        assert resp_obj.extract_field('content.items.99999.id') == 99999
+        assert resp_obj.json == content
+        assert resp_obj.content == json.dumps(content).encode('utf-8')
+        # body is kept on wrapper, wrapped response is left untouched
+        assert resp._content is False
+
+    def test_extract_stream_fields_without_body(self):
+        content = {
+            'items': [{
+                'id': index
+            } for index in range(100000)],
+            'count': 100000
+        }
+        resp_obj = response.ResponseObject(
+            self.gen_stream_response(content),
+            stream_fields=['content.count'],
+            keep_body=False)
+        assert resp_obj.extract_field('content.count') == 100000
+        # body over STREAM_MAX_RAW_SIZE is not kept
+        assert resp_obj._stream_extractor.raw_chunks == []
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('content.items.0.id')
+
+    def test_extract_stream_fields_not_json(self):
+        resp = self.gen_stream_response(b'LB123abcRB789')
+        resp_obj = response.ResponseObject(
+            resp, stream_fields=['content.success'])
+        with pytest.raises(exceptions.ExtractFailure):
+            resp_obj.extract_field('content.success')
+        assert resp_obj.extract_field('LB123(.*)RB789') == 'abc'
+
+    def test_discarded_body(self):
+        resp = self.gen_stream_response(b'LB123abcRB789')
+        client.discard_body(resp)
+        resp_obj = response.ResponseObject(resp)
+        assert resp_obj.content == b''
+        assert resp_obj.text == ''
+        assert resp_obj.get_body() == ''
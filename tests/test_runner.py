@@ -0,0 +1,330 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import os
+import time
+
+import pytest
+
+from httprunner import (client, exceptions, fixture, loader, response,
+                        runner, stats)
+from tests.base import TestApiServerBase
+
+
+class TestRunner(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.config = {
+            'name': 'runner test',
+            'variables': [{
+                'expect_status_code': 401
+            }],
+            'request': {
+                'base_url': self.host,
+                'headers': {
+                    'Content-Type': 'application/json'
+                }
+            }
+        }
+        self.teststep = {
+            'name': 'get users without token',
+            'request': {
+                'url': '/api/users',
+                'method': 'GET'
+            },
+            'extract': [{
+                'msg': 'content.msg'
+            }],
+            'validate': [{
+                'eq': ['status_code', '$expect_status_code']
+            }, {
+                'eq': ['content.success', False]
+            }, {
+                'eq': ['headers.Content-Type', 'application/json']
+            }]
+        }
+
+    def test_run_test(self):
+        latency_stats = stats.LatencyStats()
+        test_runner = runner.Runner(self.config, latency_stats=latency_stats)
+        test_runner.run_test(self.teststep)
+
+        assert test_runner.context.testcase_runtime_variables_mapping[
+            'msg'] == 'device_sn or token is null.'
+        report = latency_stats.get_report()
+        assert report['teststeps']['get users without token']['count'] == 1
+
+    def test_run_testcase_latency_stats(self):
+        test_runner = runner.run_testcase({
+            'config': self.config,
+            'teststeps': [self.teststep, self.teststep]
+        })
+        report = test_runner.latency_stats.get_report()
+        assert report['teststeps']['get users without token']['count'] == 2
+
+    def test_run_test_start_delay(self):
+        latency_stats = stats.LatencyStats()
+        test_runner = runner.Runner(self.config,
+                                    latency_stats=latency_stats,
+                                    start_delay=0.5)
+        test_runner.run_test(self.teststep)
+
+        summary = latency_stats.get_report()['teststeps'][
+            'get users without token']
+        assert summary['corrected']['min'] >= 500
+        assert summary['corrected']['min'] - summary['min'] \
+            == pytest.approx(500, abs=1)
+
+    def test_run_test_rate_limit(self):
+        self.config['request']['rate_limit'] = {
+            'rate': 20,
+            'apis': {
+                'get_users': {
+                    'rate': 10,
+                    'burst': 1
+                }
+            }
+        }
+        self.teststep['function_meta'] = {'func_name': 'get_users'}
+        latency_stats = stats.LatencyStats()
+        test_runner = runner.Runner(self.config, latency_stats=latency_stats)
+        start_at = time.perf_counter()
+        for _ in range(3):
+            test_runner.run_test(self.teststep)
+        # 3 requests at 10 per second take at least 0.2 seconds
+        assert time.perf_counter() - start_at >= 0.2
+
+        report = latency_stats.get_report()
+        host = self.host.split('//')[1]
+        assert report['rate_limiters'][f'host:{host}']['count'] == 3
+        api_waits = report['rate_limiters']['api:get_users']
+        assert api_waits['count'] == 3
+        assert api_waits['max'] > 0
+        assert 'rate_limit' not in test_runner.context.\
+            TESTCASE_SHARED_REQUSET_MAPPING
+
+    def test_run_test_hedge(self):
+        hedger = client.RequestHedger()
+        test_runner = runner.Runner(
+            self.config, client.HttpSession(self.host, hedger=hedger))
+        self.teststep['hedge'] = True
+        test_runner.run_test(self.teststep)
+        hedger.close()
+
+        assert hedger.get_report()['get users without token'] == {
+            'requests': 1,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'hedge_delay': None
+        }
+
+    def test_run_test_validation_failure(self):
+        self.teststep['validate'].append({'eq': ['content.success', True]})
+        test_runner = runner.Runner(self.config)
+        with pytest.raises(exceptions.VaildationFailure):
+            test_runner.run_test(self.teststep)
+
+    def test_run_test_missing_url(self):
+        test_runner = runner.Runner(self.config)
+        with pytest.raises(exceptions.ParamError):
+            test_runner.run_test({'name': 'no url', 'request': {}})
+
+    def test_run_test_stream(self):
+        self.teststep['request']['stream'] = True
+        response.compile_teststep_fields(self.teststep)
+        assert self.teststep['stream_fields'] == [
+            'content.success', 'content.msg'
+        ]
+        assert not self.teststep['skip_body']
+        assert not self.teststep['keep_body']
+
+        test_runner = runner.Runner(self.config)
+        test_runner.run_test(self.teststep)
+        assert test_runner.context.testcase_runtime_variables_mapping[
+            'msg'] == 'device_sn or token is null.'
+
+    def test_run_test_skip_body(self):
+        teststep = {
+            'name': 'index',
+            'request': {
+                'url': '/',
+                'method': 'GET'
+            },
+            'validate': [{
+                'eq': ['status_code', 200]
+            }, {
+                'eq': ['headers.Content-Length', '12']
+            }]
+        }
+        response.compile_teststep_fields(teststep)
+        assert teststep['skip_body']
+
+        runner.run_testcase({'config': self.config, 'teststeps': [teststep]})
+
+        # skip_body requests of all runners share one upstream response
+        coalescer = client.RequestCoalescer(cache_ttl=60)
+
+        def run_testcase(_):
+            runner.run_testcase({
+                'config': self.config,
+                'teststeps': [teststep]
+            }, client.HttpSession(coalescer=coalescer))
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(run_testcase, range(8)))
+        counts = coalescer.get_report()['index']
+        assert counts['requests'] == 8
+        assert counts['upstream'] == 1
+
+    def test_is_body_required(self):
+        teststep = {'teardown_hooks': ['${hook_print($response)}']}
+        assert response.is_body_required(teststep, ['status_code'])
+        assert response.is_body_required({}, ['LB(.*)RB'])
+        assert response.is_body_required({}, ['text'])
+        assert not response.is_body_required(
+            {}, ['status_code', 'headers.content-type', 'cookies.token'])
+
+    def gen_fixture(self, scope):
+        return {
+            'name': 'get token fixture',
+            'suite': 'get_token_fixture($sign)',
+            'cache': {
+                'ttl': None,
+                'scope': scope
+            },
+            'output': ['msg'],
+            'teststeps': [{
+                'name': 'get token without device_sn',
+                'request': {
+                    'url': '/api/get-token',
+                    'method': 'POST',
+                    'json': {
+                        'sign': '$sign'
+                    }
+                },
+                'extract': [{
+                    'msg': 'content.msg'
+                }],
+                'validate': [{
+                    'eq': ['status_code', 403]
+                }]
+            }]
+        }
+
+    def test_run_fixture(self):
+        fixture_cache = fixture.FixtureCache()
+        latency_stats = stats.LatencyStats()
+        fixture_teststep = self.gen_fixture('args')
+
+        for sign in ['abc', 'abc', 'xyz']:
+            self.config['variables'] = [{'sign': sign}]
+            test_runner = runner.Runner(
+                self.config,
+                latency_stats=latency_stats,
+                fixture_cache=fixture_cache)
+            test_runner.run_test(fixture_teststep)
+            assert test_runner.context.testcase_runtime_variables_mapping[
+                'msg'] == 'Authorzation failed!'
+
+        assert fixture_cache.get_report() == {
+            'get_token_fixture': {
+                'runs': 2,
+                'reused': 1
+            }
+        }
+        report = latency_stats.get_report()
+        assert report['teststeps']['get token without device_sn'][
+            'count'] == 2
+
+    def test_run_fixture_suite_scope(self):
+        fixture_cache = fixture.FixtureCache()
+        fixture_teststep = self.gen_fixture('suite')
+
+        for sign in ['abc', 'xyz']:
+            self.config['variables'] = [{'sign': sign}]
+            runner.Runner(
+                self.config,
+                fixture_cache=fixture_cache).run_test(fixture_teststep)
+
+        assert fixture_cache.get_report()['get_token_fixture']['runs'] == 1
+
+    def test_run_fixture_without_cache(self):
+        self.config['variables'] = [{'sign': 'abc'}]
+        fixture_teststep = self.gen_fixture('args')
+        fixture_teststep['output'].append('not_exist')
+
+        # fixture is run as plain teststeps without fixture cache
+        test_runner = runner.Runner(self.config)
+        test_runner.run_test(fixture_teststep)
+        assert test_runner.context.testcase_runtime_variables_mapping[
+            'msg'] == 'Authorzation failed!'
+
+        test_runner = runner.Runner(
+            self.config, fixture_cache=fixture.FixtureCache())
+        with pytest.raises(exceptions.VariableNotFound):
+            test_runner.run_test(fixture_teststep)
+
+    def test_run_testcase_parallel(self):
+        teststeps = [{
+            'name': 'get token without device_sn',
+            'request': {
+                'url': '/api/get-token',
+                'method': 'POST',
+                'json': {
+                    'sign': 'abc'
+                }
+            },
+            'extract': [{
+                'msg': 'content.msg'
+            }]
+        }]
+        for index in range(4):
+            teststeps.append({
+                'name': f'get index {index}',
+                'request': {
+                    'url': '/',
+                    'method': 'GET',
+                    'headers': {
+                        'msg': '$msg'
+                    }
+                },
+                'extract': [{
+                    f'index_{index}': 'status_code'
+                }]
+            })
+        teststeps.append({
+            'name': 'get users without token',
+            'request': {
+                'url': '/api/users',
+                'method': 'GET'
+            },
+            'validate': [{
+                'eq': ['$index_0', 200]
+            }, {
+                'eq': ['$index_3', 200]
+            }]
+        })
+
+        latency_stats = stats.LatencyStats()
+        test_runner = runner.run_testcase(
+            {
+                'config': self.config,
+                'teststeps': teststeps
+            },
+            latency_stats=latency_stats,
+            parallel=True)
+        variables_mapping = test_runner.context.testcase_runtime_variables_mapping
+        assert variables_mapping['msg'] == 'Authorzation failed!'
+        assert variables_mapping['index_2'] == 200
+        assert len(latency_stats.get_report()['teststeps']) == 6
+
+    def test_run_testcase_parallel_failure(self):
+        teststep = dict(self.teststep, validate=[{'eq': ['status_code', 200]}])
+        with pytest.raises(exceptions.VaildationFailure):
+            runner.run_testcase(
+                {
+                    'config': self.config,
+                    'teststeps': [teststep, self.teststep]
+                },
+                parallel=True)
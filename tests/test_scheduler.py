@@ -0,0 +1,155 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from httprunner import scheduler
+
+
+class TestScheduler:
+    def setup_method(self):
+        self.teststeps = [{
+            'name': 'get token',
+            'request': {
+                'url': '/api/get-token',
+                'method': 'POST'
+            },
+            'extract': [{
+                'token': 'content.token'
+            }]
+        }, {
+            'name': 'get user $uid',
+            'variables': [{
+                'uid': 1000
+            }],
+            'request': {
+                'url': '/api/users/$uid',
+                'method': 'GET',
+                'headers': {
+                    'token': '$token'
+                }
+            },
+            'extract': [{
+                'name_1000': 'content.data.name'
+            }]
+        }, {
+            'name': 'get user 1001',
+            'api': 'get_user(1001, $token)',
+            'request': {
+                'url': '/api/users/1001',
+                'method': 'get',
+                'headers': {
+                    'token': '$token'
+                }
+            },
+            'validate': [{
+                'eq': ['content.data.name', '$name_1000']
+            }]
+        }, {
+            'name': 'get user 1002',
+            'request': {
+                'url': '/api/users/1002',
+                'method': 'GET',
+                'headers': {
+                    'token': '$token'
+                }
+            }
+        }, {
+            'name': 'delete user 1002',
+            'request': {
+                'url': '/api/users/1002',
+                'method': 'DELETE'
+            }
+        }, {
+            'name': 'get users',
+            'request': {
+                'url': '/api/users',
+                'method': 'GET'
+            }
+        }]
+
+    def test_get_teststep_references(self):
+        assert scheduler.get_teststep_references(self.teststeps[1]) == {
+            'token'
+        }
+        assert scheduler.get_teststep_references(self.teststeps[2]) == {
+            'token', 'name_1000'
+        }
+
+    def test_get_teststep_references_shared_request(self):
+        shared_request = {'headers': {'token': '$token', 'uid': '$uid'}}
+        assert scheduler.get_teststep_references(
+            self.teststeps[5], shared_request) == {'token', 'uid'}
+        # teststep variables shadow variables of shared request
+        assert scheduler.get_teststep_references(
+            self.teststeps[1], shared_request) == {'token'}
+
+    def test_get_teststep_outputs(self):
+        assert scheduler.get_teststep_outputs(self.teststeps[0]) == {'token'}
+        assert scheduler.get_teststep_outputs({
+            'suite': 'setup_and_reset($device_sn)',
+            'output': ['token', 'device_sn'],
+            'teststeps': []
+        }) == {'token', 'device_sn'}
+
+    def test_is_barrier(self):
+        assert scheduler.is_barrier(self.teststeps[0])
+        assert not scheduler.is_barrier(self.teststeps[1])
+        assert not scheduler.is_barrier(self.teststeps[2])
+        assert scheduler.is_barrier(self.teststeps[4])
+        assert scheduler.is_barrier({
+            'request': {
+                'method': 'GET'
+            },
+            'setup_hooks': ['${sleep(1)}']
+        })
+
+    def test_build_teststeps_dependencies(self):
+        assert scheduler.build_teststeps_dependencies(self.teststeps) == [
+            set(), {0}, {0, 1}, {0}, {0, 1, 2, 3}, {4}
+        ]
+
+    def test_build_teststeps_dependencies_shared_request(self):
+        # token extracted by first teststep is sent by every teststep
+        teststeps = [{
+            'name': 'get token',
+            'request': {
+                'url': '/api/get-token',
+                'method': 'GET'
+            },
+            'extract': [{
+                'token': 'content.token'
+            }]
+        }, self.teststeps[5], self.teststeps[5]]
+        assert scheduler.build_teststeps_dependencies(teststeps) == [
+            set(), set(), set()
+        ]
+        assert scheduler.build_teststeps_dependencies(
+            teststeps, {'headers': {'token': '$token'}}) == [
+                set(), {0}, {0}
+            ]
+
+    def test_build_teststeps_dependencies_overwrite(self):
+        teststeps = [{
+            'request': {
+                'url': '/api/users/$uid',
+                'method': 'GET'
+            }
+        }, {
+            'request': {
+                'url': '/api/users',
+                'method': 'GET'
+            },
+            'extract': [{
+                'uid': 'content.uid'
+            }]
+        }, {
+            'request': {
+                'url': '/api/users',
+                'method': 'GET'
+            },
+            'extract': [{
+                'uid': 'content.uid'
+            }]
+        }]
+        assert scheduler.build_teststeps_dependencies(teststeps) == [
+            set(), {0}, {0, 1}
+        ]
@@ -0,0 +1,142 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from httprunner import exceptions, loader, sharding
+from tests.base import TestApiServerBase, make_testcase
+
+
+class TestDurationStore:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'durations.json')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_update_and_save(self):
+        duration_store = sharding.DurationStore(self.path)
+        assert duration_store.get_default() == sharding.DEFAULT_DURATION
+
+        duration_store.update('a', 2.0)
+        duration_store.update('a', 4.0)
+        duration_store.update('b', 1.0)
+        assert duration_store.get('a') == 3.0
+        duration_store.save()
+
+        duration_store = sharding.DurationStore(self.path)
+        assert duration_store.durations == {'a': 3.0, 'b': 1.0}
+        assert duration_store.get_default() == 2.0
+
+    def test_invalid_store(self):
+        with open(self.path, 'w') as f:
+            f.write('not json')
+        assert sharding.DurationStore(self.path).durations == {}
+
+        with pytest.raises(exceptions.ParamError):
+            sharding.DurationStore(self.path, alpha=0)
+
+
+class TestTestcaseKey:
+    def test_get_testcase_key(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        testcase = loader._load_test_file('tests/testcases/smoketest.yml')
+        assert sharding.get_testcase_key(testcase) == \
+            'testcases/smoketest.yml'
+
+        # testcases sharing the same name
+        testcase_a = dict(make_testcase('smoke'),
+                          path=os.path.join(os.getcwd(), 'tests', 'a.yml'))
+        testcase_b = dict(make_testcase('smoke'),
+                          path=os.path.join(os.getcwd(), 'tests', 'b.yml'))
+        assert sharding.get_testcase_key(testcase_a) == 'a.yml'
+        assert sharding.get_testcase_key(testcase_b) == 'b.yml'
+
+        assert sharding.get_testcase_key(make_testcase('smoke')) == 'smoke'
+
+
+class TestAssignShards:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.duration_store = sharding.DurationStore(
+            os.path.join(self.temp_dir, 'durations.json'))
+        for name, duration in [('a', 5), ('b', 4), ('c', 3), ('d', 3),
+                               ('e', 2), ('f', 2), ('g', 2)]:
+            self.duration_store.update(name, duration)
+        self.testcases = [make_testcase(name) for name in 'abcdefg']
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_names(self, shard):
+        return [testcase['config']['name'] for testcase in shard['testcases']]
+
+    def test_longest_first(self):
+        assignment = sharding.assign_shards(self.testcases, 3,
+                                            self.duration_store)
+        assert [self.get_names(shard) for shard in assignment] == [
+            ['a', 'f'], ['b', 'e', 'g'], ['c', 'd']
+        ]
+        assert [shard['predicted'] for shard in assignment] == [7, 8, 6]
+
+    def test_unknown_durations(self):
+        assignment = sharding.assign_shards(self.testcases, 2)
+        assert [len(shard['testcases']) for shard in assignment] == [4, 3]
+
+        # testcase never run is expected to take median duration
+        testcases = self.testcases + [make_testcase('new')]
+        assignment = sharding.assign_shards(testcases, 2,
+                                            self.duration_store)
+        assert sum(shard['predicted'] for shard in assignment) == 24
+
+    def test_get_shard(self):
+        names = []
+        for shard_index in range(3):
+            shard = sharding.get_shard(self.testcases, shard_index, 3,
+                                       self.duration_store)
+            names.extend(testcase['config']['name'] for testcase in shard)
+        assert sorted(names) == list('abcdefg')
+
+        with pytest.raises(exceptions.ParamError):
+            sharding.get_shard(self.testcases, 3, 3)
+        with pytest.raises(exceptions.ParamError):
+            sharding.assign_shards(self.testcases, 0)
+
+
+class TestRunSharded(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'durations.json')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_run_sharded(self):
+        testcases = [
+            make_testcase('index', self.host),
+            make_testcase('users', self.host, '/api/users'),
+            make_testcase('index again', self.host)
+        ]
+        duration_store = sharding.DurationStore(self.path)
+        report = sharding.run_sharded(testcases, 2, duration_store)
+
+        assert report['total'] == 3
+        assert report['successes'] == 2
+        assert report['errors'][0][0] == 'users'
+        assert report['predicted_makespan'] == 2 * sharding.DEFAULT_DURATION
+        assert report['actual_makespan'] == max(
+            shard['actual'] for shard in report['shards'])
+
+        # durations measured in this run are used by next run
+        duration_store = sharding.DurationStore(self.path)
+        assert sorted(duration_store.durations) == [
+            'index', 'index again', 'users'
+        ]
+        report = sharding.run_sharded(testcases, 2, duration_store)
+        assert report['predicted_makespan'] < sharding.DEFAULT_DURATION
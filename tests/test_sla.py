@@ -0,0 +1,173 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from httprunner import exceptions, loader, pool, sla, stats
+from tests.base import TestApiServerBase, make_testcase
+
+
+class TestSlaValidators:
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.latency_stats = stats.LatencyStats()
+        for elapsed in [0.01, 0.02, 0.03]:
+            self.latency_stats.record('get user', 'get_user', elapsed)
+        self.latency_stats.record('index', None, 0.5)
+        self.result = {'total': 10, 'failures': 1, 'duration': 2}
+
+    def test_parse_sla_validator(self):
+        assert sla.parse_sla_validator({'p99_lt': ['get_user', 200]}) == {
+            'metric': 'p99',
+            'name': 'get_user',
+            'comparator': 'less_than',
+            'expect': 200
+        }
+        assert sla.parse_sla_validator({'p99.9_le': 300}) == {
+            'metric': 'p99.9',
+            'name': None,
+            'comparator': 'less_than_or_equals',
+            'expect': 300
+        }
+        assert sla.parse_sla_validator({'error_rate_lt': 0.01})['metric'] \
+            == 'error_rate'
+
+        with pytest.raises(exceptions.ParamError):
+            sla.parse_sla_validator({'latency_lt': 200})
+        with pytest.raises(exceptions.ParamError):
+            sla.parse_sla_validator({'p99_lt': ['get_user']})
+        with pytest.raises(exceptions.ParamError):
+            sla.parse_sla_validator({'error_rate_lt': ['get_user', 0.1]})
+
+    def test_evaluate_sla(self):
+        evaluated_validators = sla.evaluate_sla([{
+            'p99_lt': ['get_user', 40]
+        }, {
+            'max_lt': 100
+        }, {
+            'error_rate_le': 0.1
+        }, {
+            'throughput_ge': 5
+        }, {
+            'count_eq': ['index', 1]
+        }], self.latency_stats, self.result)
+
+        assert [
+            validator['check_result'] for validator in evaluated_validators
+        ] == ['pass', 'fail', 'pass', 'pass', 'pass']
+        assert evaluated_validators[0]['check'] == 'p99 of get_user'
+        assert evaluated_validators[1]['check_value'] > 100
+        assert evaluated_validators[2]['check_value'] == 0.1
+
+        evaluated_validators = sla.evaluate_sla([{
+            'p99_lt': ['get_token', 200]
+        }], self.latency_stats, self.result, loader.get_project_snapshot())
+        assert evaluated_validators[0]['check_value'] is None
+        assert evaluated_validators[0]['check_result'] == 'fail'
+
+    def test_validate_sla(self):
+        assert len(
+            sla.validate_sla([{
+                'p50_lt': ['get user', 100]
+            }], self.latency_stats, self.result)) == 1
+
+        with pytest.raises(exceptions.VaildationFailure):
+            sla.validate_sla([{
+                'error_rate_lt': 0.01
+            }], self.latency_stats, self.result)
+        # teststep without samples fails
+        with pytest.raises(exceptions.VaildationFailure):
+            sla.validate_sla([{
+                'p99_lt': ['get_token', 200]
+            }], self.latency_stats, self.result)
+        with pytest.raises(exceptions.FunctionNotFound):
+            sla.validate_sla([{
+                'p99_unknown': 200
+            }], self.latency_stats, self.result)
+
+
+class TestPoolSla(TestApiServerBase):
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def get_testcase(self, validators):
+        return make_testcase('sla test', self.host, sla=validators)
+
+    def test_run_with_sla(self):
+        testcase = self.get_testcase([{
+            'p99_lt': ['index', 10000]
+        }, {
+            'error_rate_eq': 0
+        }])
+        pool_runner = pool.ThreadPoolRunner(2, stats.LatencyStats())
+        result = pool_runner.run([testcase], iterations=4)
+        pool_runner.close()
+        assert result['sla_passed'] is True
+        assert len(result['sla']) == 2
+
+        testcase = self.get_testcase([{'p99_lt': ['index', 0]}])
+        pool_runner = pool.ThreadPoolRunner(2, stats.LatencyStats())
+        result = pool_runner.run([testcase], iterations=4)
+        pool_runner.close()
+        assert result['successes'] == 0
+        assert result['failures'] == 4
+        assert result['sla_passed'] is False
+        assert result['errors'][0][0] == 'sla test'
+        assert result['errors'][0][1].startswith('SLA breached: p99 of index')
+
+        # evaluated without latency stats of pool
+        pool_runner = pool.ThreadPoolRunner(2)
+        result = pool_runner.run([testcase])
+        pool_runner.close()
+        assert result['sla_passed'] is False
+        assert result['sla'][0]['check_value'] is not None
+
+    def test_run_with_invalid_sla(self, monkeypatch):
+        pool_runner = pool.ThreadPoolRunner(2)
+        monkeypatch.setattr(pool_runner, 'run_testcase_safely',
+                            lambda *args: pytest.fail('testcase is run'))
+        for validators in [[{'p98_lt': 200}], [{'p99_ltt': 200}],
+                           {'p99_lt': 200}]:
+            with pytest.raises(exceptions.ParamError):
+                pool_runner.run([self.get_testcase(validators)])
+        pool_runner.close()
+
+        with pytest.raises(exceptions.ParamError):
+            sla.parse_sla({'p99_lt': 200})
+
+    def test_run_with_testcase_scoped_sla(self):
+        testcase_a = self.get_testcase([{
+            'count_eq': 4
+        }, {
+            'count_eq': ['index', 4]
+        }])
+        testcase_b = self.get_testcase([{'count_eq': ['other', 4]}])
+        testcase_b['config']['name'] = 'other sla test'
+        testcase_b['teststeps'][0]['name'] = 'other'
+        testcase_c = self.get_testcase([])
+        latency_stats = stats.LatencyStats()
+        pool_runner = pool.ThreadPoolRunner(2, latency_stats)
+        result = pool_runner.run([testcase_a, testcase_b, testcase_c],
+                                 iterations=4)
+        pool_runner.close()
+
+        assert result['sla_passed'] is True
+        assert [validator['testcase'] for validator in result['sla']] == [
+            'sla test', 'sla test', 'other sla test'
+        ]
+        assert result['successes'] == 12
+        # whole run stats are still recorded
+        assert latency_stats.teststeps_histograms['index'].total_count == 8
+
+        # step of another testcase is not in scope
+        testcase_b['config']['sla'] = [{'count_eq': ['index', 4]}]
+        pool_runner = pool.ThreadPoolRunner(2, stats.LatencyStats())
+        result = pool_runner.run([testcase_a, testcase_b], iterations=4)
+        pool_runner.close()
+
+        assert result['sla'][2]['check_value'] is None
+        assert result['sla_passed'] is False
+        assert result['successes'] == 4
+        assert result['failures'] == 4
@@ -0,0 +1,68 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+from httprunner import exceptions, loader, snapshot
+
+
+class TestSnapshot:
+    def setup_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+        self.testcases = loader.load_testcases(
+            os.path.join(os.getcwd(), 'tests', 'testcases', 'smoketest.yml'))
+
+    def teardown_method(self):
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def test_dump_and_load_snapshot(self):
+        functions = dict(loader.project_mapping['confcustom']['functions'])
+        def_api = loader.project_mapping['def-api']
+        project_working_directory = loader.project_working_directory
+
+        data = snapshot.dump_snapshot(self.testcases)
+        assert data.startswith(snapshot.MAGIC)
+
+        loader.reset_loader()
+        assert loader.project_mapping['def-api'] == {}
+
+        start_at = time.perf_counter()
+        testcases = snapshot.load_snapshot(data)
+        assert time.perf_counter() - start_at < 0.1
+
+        assert testcases == self.testcases
+        assert loader.project_working_directory == project_working_directory
+        assert loader.project_mapping['def-api'] == def_api
+        for name, function in functions.items():
+            assert loader.project_mapping['confcustom']['functions'][
+                name] is function
+
+    def test_save_and_load_snapshot_file(self):
+        path = os.path.join(os.getcwd(), 'tests', 'data', 'tmp.snapshot')
+        try:
+            snapshot.save_snapshot(path, self.testcases)
+            loader.reset_loader()
+            assert snapshot.load_snapshot_file(path) == self.testcases
+            assert 'setup_and_reset' in loader.project_mapping['def-testcase']
+        finally:
+            os.remove(path)
+
+    def test_dump_unreferenced_function(self):
+        loader.project_mapping['confcustom']['functions'][
+            'double'] = lambda x: x * 2
+        with pytest.raises(exceptions.ParamError):
+            snapshot.dump_snapshot()
+
+    def test_load_invalid_snapshot(self):
+        with pytest.raises(exceptions.FileFormatError):
+            snapshot.load_snapshot(b'not a snapshot')
+
+        with pytest.raises(exceptions.FileFormatError):
+            snapshot.load_snapshot(snapshot.MAGIC + b'\x01')
+
+        data = snapshot.dump_snapshot()
+        with pytest.raises(exceptions.FileFormatError):
+            snapshot.load_snapshot(data[:-10])
@@ -0,0 +1,244 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from httprunner import exceptions, stats
+from tests.base import FakeClock
+
+
+class TestLatencyHistogram:
+    def test_bucket_index_and_range(self):
+        histogram = stats.LatencyHistogram(significant_bits=8)
+        for value in [0, 1, 255, 256, 257, 511, 512, 1000, 123456, 10**9]:
+            index = histogram._get_bucket_index(value)
+            lowest_value, highest_value = histogram._get_bucket_range(index)
+            assert lowest_value <= value <= highest_value
+            assert (highest_value - lowest_value) / max(value, 1) < 1 / 2**7
+
+    def test_invalid_significant_bits(self):
+        with pytest.raises(exceptions.ParamError):
+            stats.LatencyHistogram(significant_bits=1)
+
+    def test_percentiles(self):
+        histogram = stats.LatencyHistogram()
+        for value in range(1, 10001):
+            histogram.record(value * 100)
+
+        assert histogram.total_count == 10000
+        assert histogram.min_value == 100
+        assert histogram.max_value == 1000000
+        for percentile in [50, 90, 99, 99.9]:
+            expected = percentile * 10000
+            value = histogram.get_value_at_percentile(percentile)
+            assert abs(value - expected) / expected < 1 / 2**7
+
+        assert histogram.get_value_at_percentile(100) == 1000000
+
+    def test_record_out_of_range(self):
+        histogram = stats.LatencyHistogram(highest_trackable_value=10**6)
+        histogram.record(-5)
+        histogram.record(10**9)
+        assert histogram.min_value == 0
+        assert histogram.max_value == 10**6
+
+    def test_record_corrected(self):
+        for value, expected_interval in [(10**6, 7), (123456, 1000),
+                                         (5 * 10**6, 3000), (10, 20)]:
+            histogram = stats.LatencyHistogram(highest_trackable_value=10**6)
+            histogram.record_corrected(value, expected_interval)
+
+            expected = stats.LatencyHistogram(highest_trackable_value=10**6)
+            expected.record(value)
+            missing_value = value - expected_interval
+            while missing_value >= expected_interval:
+                expected.record(missing_value)
+                missing_value -= expected_interval
+
+            assert histogram.to_bytes() == expected.to_bytes()
+
+    def test_summary_empty(self):
+        summary = stats.LatencyHistogram().get_summary()
+        assert summary['count'] == 0
+        assert summary['p99.9'] == 0
+        assert summary['throughput'] == 0
+
+
+class TestLatencyStats:
+    def test_get_teststep_names(self):
+        teststep = {
+            'name': 'get user 1000',
+            'function_meta': {
+                'func_name': 'get_user',
+                'args': ['$uid', '$token'],
+                'kwargs': {}
+            }
+        }
+        assert stats.get_teststep_names(teststep) == ('get user 1000',
+                                                      'get_user')
+        assert stats.get_teststep_names({'name': 'hardcode'}) == ('hardcode',
+                                                                  None)
+
+    def test_record_and_report(self):
+        latency_stats = stats.LatencyStats()
+        for _ in range(10):
+            latency_stats.record('get user 1000', 'get_user', 0.01)
+            latency_stats.record('get user 1001', 'get_user', 0.03)
+        latency_stats.record('hardcode', None, 0.02)
+
+        report = latency_stats.get_report()
+        assert set(report['teststeps']) == {
+            'get user 1000', 'get user 1001', 'hardcode'
+        }
+        assert list(report['apis']) == ['get_user']
+
+        api_summary = report['apis']['get_user']
+        assert api_summary['count'] == 20
+        assert 9.9 < api_summary['p50'] < 10.1
+        assert 29.7 < api_summary['p90'] < 30.1
+        assert api_summary['max'] == 30
+        assert api_summary['throughput'] > 0
+
+    def test_record_corrected_with_intended_start(self):
+        latency_stats = stats.LatencyStats()
+        schedule = stats.FixedRateSchedule(100)
+        for index in range(10):
+            intended_start = schedule.wait()
+            actual_start = intended_start
+            if index == 5:
+                # server stalled 1s, following request starts too late
+                actual_start += 1
+            latency_stats.record('get users', 'get_users', 0.001,
+                                 intended_start, actual_start)
+
+        summary = latency_stats.get_report()['apis']['get_users']
+        assert summary['max'] == 1
+        assert summary['corrected']['max'] > 1000
+        assert summary['corrected']['count'] == 10
+
+    def test_record_corrected_with_expected_interval(self):
+        latency_stats = stats.LatencyStats(expected_interval=0.01)
+        latency_stats.record('get users', 'get_users', 0.1)
+
+        summary = latency_stats.get_report()['teststeps']['get users']
+        assert summary['count'] == 1
+        assert summary['corrected']['count'] == 10
+        assert 9.9 < summary['corrected']['min'] < 10.1
+
+    def test_record_without_fixed_rate(self):
+        latency_stats = stats.LatencyStats()
+        latency_stats.record('get users', 'get_users', 0.1)
+        assert 'corrected' not in latency_stats.get_report()['apis'][
+            'get_users']
+
+    def test_swap(self):
+        latency_stats = stats.LatencyStats()
+        latency_stats.record('get users', 'get_users', 0.1)
+        swapped = latency_stats.swap()
+        latency_stats.record('get users', 'get_users', 0.2)
+
+        assert swapped.teststeps_histograms['get users'].total_count == 1
+        assert swapped.apis_histograms['get_users'].total_count == 1
+        assert swapped.duration == pytest.approx(0.1, abs=0.01)
+        assert latency_stats.teststeps_histograms['get users'].total_count \
+            == 1
+        assert latency_stats.teststeps_histograms['get users'].min_value \
+            >= 190000
+
+
+class TestFixedRateSchedule:
+    def test_invalid_rate(self):
+        with pytest.raises(exceptions.ParamError):
+            stats.FixedRateSchedule(0)
+
+    def test_wait(self):
+        schedule = stats.FixedRateSchedule(1000)
+        intended_starts = [schedule.wait() for _ in range(5)]
+        assert intended_starts[-1] - intended_starts[0] == pytest.approx(
+            0.004)
+
+    def test_wait_with_clock(self):
+        clock = FakeClock()
+        schedule = stats.FixedRateSchedule(10, clock)
+        assert [schedule.wait() for _ in range(3)] == pytest.approx(
+            [100, 100.1, 100.2])
+        assert clock.sleeps == pytest.approx([0.1, 0.1])
+
+
+class TestMergeableStats:
+    def test_varint(self):
+        buffer = bytearray()
+        for value in [0, 1, 127, 128, 300, 2**40]:
+            stats._encode_varint(value, buffer)
+
+        offset = 0
+        for value in [0, 1, 127, 128, 300, 2**40]:
+            decoded_value, offset = stats._decode_varint(buffer, offset)
+            assert decoded_value == value
+
+    def test_histogram_bytes(self):
+        histogram = stats.LatencyHistogram()
+        for value in range(0, 1000000, 997):
+            histogram.record(value)
+
+        data = histogram.to_bytes()
+        assert len(data) < len(histogram._counts) * 8 // 10
+        loaded_histogram = stats.LatencyHistogram.from_bytes(data)
+        assert loaded_histogram.total_count == histogram.total_count
+        assert loaded_histogram.min_value == histogram.min_value
+        assert loaded_histogram.max_value == histogram.max_value
+        assert loaded_histogram._counts == histogram._counts
+
+        with pytest.raises(exceptions.ParamError):
+            stats.LatencyHistogram.from_bytes(b'abc')
+
+    def test_histogram_merge(self):
+        whole_histogram = stats.LatencyHistogram()
+        worker_histograms = [stats.LatencyHistogram() for _ in range(3)]
+        for value in range(1, 30000):
+            whole_histogram.record(value * 37)
+            worker_histograms[value % 3].record(value * 37)
+
+        merged_left = stats.LatencyHistogram().merge(
+            stats.LatencyHistogram().merge(worker_histograms[0]).merge(
+                worker_histograms[1])).merge(worker_histograms[2])
+        merged_right = stats.LatencyHistogram().merge(
+            worker_histograms[0]).merge(stats.LatencyHistogram().merge(
+                worker_histograms[1]).merge(worker_histograms[2]))
+        assert merged_left._counts == merged_right._counts
+        assert merged_left._counts == whole_histogram._counts
+        assert merged_left.get_summary() == whole_histogram.get_summary()
+
+        for percentile in [50, 90, 99, 99.9]:
+            exact_value = percentile * 29999 * 37 / 100
+            value = merged_left.get_value_at_percentile(percentile)
+            assert abs(value - exact_value
+                       ) / exact_value <= merged_left.relative_error
+
+        with pytest.raises(exceptions.ParamError):
+            whole_histogram.merge(stats.LatencyHistogram(significant_bits=7))
+
+    def test_stats_bytes_and_merge(self):
+        worker_stats = []
+        for worker_index in range(2):
+            latency_stats = stats.LatencyStats()
+            for _ in range(5):
+                latency_stats.record(f'get user {worker_index}', 'get_user',
+                                     0.01 * (worker_index + 1), 1, 1.5)
+            worker_stats.append(
+                stats.LatencyStats.from_bytes(latency_stats.to_bytes()))
+
+        merged_stats = stats.LatencyStats()
+        for latency_stats in worker_stats:
+            merged_stats.merge(latency_stats)
+
+        report = merged_stats.get_report()
+        assert report['relative_error'] == 1 / 2**7
+        assert report['apis']['get_user']['count'] == 10
+        assert report['apis']['get_user']['max'] == 20
+        assert report['apis']['get_user']['corrected']['max'] == 520
+        assert report['teststeps']['get user 1']['count'] == 5
+        assert merged_stats.start_at == min(s.start_at for s in worker_stats)
+
+        with pytest.raises(exceptions.ParamError):
+            stats.LatencyStats.from_bytes(b'')
@@ -0,0 +1,133 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from httprunner import exceptions, streaming, utils
+
+
+def gen_chunks(content, chunk_size=7):
+    body = json.dumps(content).encode('utf-8')
+    for index in range(0, len(body), chunk_size):
+        yield body[index:index + chunk_size]
+
+
+def compile_paths(*sub_queries):
+    return [utils.compile_content_path(sub_query) for sub_query in sub_queries]
+
+
+class TestStreamingJsonExtractor:
+    def setup_method(self):
+        self.content = {
+            'success': True,
+            'count': 123456789,
+            'msg': 'escaped \\"quote\\" and 中文',
+            'data': [{
+                'id': index,
+                'name': f'user{index}',
+                'tags': ['a', {
+                    'b': [1, 2]
+                }]
+            } for index in range(100)],
+            'total': {
+                'pages': 10
+            },
+            'last': None
+        }
+
+    def test_extract_scalars(self):
+        content_paths = compile_paths('success', 'count', 'msg')
+        extractor = streaming.StreamingJsonExtractor(
+            gen_chunks(self.content), content_paths)
+        found = extractor.extract()
+        assert found[content_paths[0]] is True
+        assert found[content_paths[1]] == 123456789
+        assert found[content_paths[2]] == self.content['msg']
+
+        # stop early, list data is never read
+        body = json.dumps(self.content).encode('utf-8')
+        assert len(b''.join(extractor.raw_chunks)) < len(body) // 10
+        assert extractor.read_body() == body
+
+    def test_extract_nested_paths(self):
+        content_paths = compile_paths('data.3.name', 'data.99.tags.1.b',
+                                      'total', 'total.pages', 'last')
+        found = streaming.StreamingJsonExtractor(
+            gen_chunks(self.content, 3), content_paths).extract()
+        assert found[content_paths[0]] == 'user3'
+        assert found[content_paths[1]] == [1, 2]
+        assert found[content_paths[2]] == {'pages': 10}
+        assert found[content_paths[3]] == 10
+        assert found[content_paths[4]] is None
+
+    def test_extract_missing_paths(self):
+        content_paths = compile_paths('not_exist', 'success.abc', 'data.100',
+                                      'total.pages.0', 'success')
+        extractor = streaming.StreamingJsonExtractor(
+            gen_chunks(self.content), content_paths)
+        found = extractor.extract()
+        assert found == {content_paths[4]: True}
+        assert extractor.missing == set(content_paths[:4])
+
+    def test_extract_no_paths(self):
+        extractor = streaming.StreamingJsonExtractor(
+            gen_chunks(self.content), [])
+        assert extractor.extract() == {}
+        assert extractor.raw_chunks == []
+
+    def test_extract_invalid_json(self):
+        extractor = streaming.StreamingJsonExtractor(
+            [b'<html>', b'</html>'], compile_paths('success'))
+        with pytest.raises(ValueError):
+            extractor.extract()
+        assert extractor.read_body() == b'<html></html>'
+
+    def test_extract_trim_buffer(self, monkeypatch):
+        monkeypatch.setattr(streaming, 'BUFFER_TRIM_SIZE', 10)
+        content_paths = compile_paths('total.pages')
+        extractor = streaming.StreamingJsonExtractor(
+            gen_chunks(self.content, 5), content_paths)
+        assert extractor.extract() == {content_paths[0]: 10}
+        assert len(extractor.buffer) < 100
+
+    def test_extract_max_raw_size(self):
+        content_paths = compile_paths('total.pages')
+        extractor = streaming.StreamingJsonExtractor(gen_chunks(self.content),
+                                                     content_paths,
+                                                     max_raw_size=100)
+        assert extractor.extract() == {content_paths[0]: 10}
+        assert extractor.raw_dropped
+        assert extractor.raw_chunks == []
+        with pytest.raises(exceptions.ExtractFailure):
+            extractor.read_body()
+
+    def test_extract_long_values(self, monkeypatch):
+        monkeypatch.setattr(streaming, 'BUFFER_TRIM_SIZE', 10)
+        content = {
+            'skipped': 'a\\"' * 10000,
+            'msg': 'b\\"' * 10000,
+            'data': [[index, f'{index}'] for index in range(1000)],
+            'success': True
+        }
+        content_paths = compile_paths('msg', 'data', 'success')
+        found = streaming.StreamingJsonExtractor(
+            gen_chunks(content, 3), content_paths).extract()
+        assert found == {
+            content_paths[0]: content['msg'],
+            content_paths[1]: content['data'],
+            content_paths[2]: True
+        }
+
+    def test_skip_strings_with_brackets(self):
+        content = {
+            'data': [{
+                'text': 'a]}"[{\\'
+            }, ['}', '"]']],
+            'success': False
+        }
+        content_paths = compile_paths('success')
+        found = streaming.StreamingJsonExtractor(
+            gen_chunks(content, 2), content_paths).extract()
+        assert found == {content_paths[0]: False}
@@ -0,0 +1,195 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from httprunner import loader, watch
+from tests.base import TestApiServerBase
+
+API_CONTENT = '''
+- api:
+    def: get_index()
+    request:
+      url: /
+      method: GET
+    validate:
+      - eq: [status_code, {index_status_code}]
+- api:
+    def: get_users()
+    request:
+      url: /api/users
+      method: GET
+    validate:
+      - eq: [status_code, {users_status_code}]
+'''
+
+OTHER_API_CONTENT = '''
+- api:
+    def: get_other()
+    request:
+      url: /other
+      method: GET
+'''
+
+SUITE_CONTENT = '''
+- config:
+    name: index suite
+    def: index_suite()
+- test:
+    name: suite index
+    api: get_index()
+'''
+
+TESTCASE_CONTENT = '''
+- config:
+    name: {name}
+    request:
+      base_url: {host}
+- test:
+    name: {name} step
+    {ref_type}: {ref_call}
+'''
+
+
+class TestProjectWatcher(TestApiServerBase):
+    def setup_method(self):
+        self.project_path = tempfile.mkdtemp()
+        for folder in ['api', 'suite', 'testcases']:
+            os.mkdir(os.path.join(self.project_path, folder))
+
+        self.write('confcustom.py', '')
+        self.write_api(200, 401)
+        self.write('api/other.yml', OTHER_API_CONTENT)
+        self.write('suite/index.yml', SUITE_CONTENT)
+        self.write_testcase('a', 'api', 'get_index()')
+        self.write_testcase('b', 'api', 'get_users()')
+        self.write_testcase('c', 'suite', 'index_suite()')
+
+        self.watcher = watch.ProjectWatcher(
+            self.project_path, [os.path.join(self.project_path, 'testcases')])
+
+    def teardown_method(self):
+        shutil.rmtree(self.project_path)
+        loader.load_project_tests(os.path.join(os.getcwd(), 'tests'))
+
+    def get_path(self, relative_path):
+        return os.path.join(self.project_path, relative_path)
+
+    def write(self, relative_path, content):
+        path = self.get_path(relative_path)
+        mtime_ns = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        # make sure mtime changes within the same clock tick
+        if os.stat(path).st_mtime_ns <= mtime_ns:
+            os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+    def write_api(self, index_status_code, users_status_code):
+        self.write(
+            'api/user.yml',
+            API_CONTENT.format(index_status_code=index_status_code,
+                               users_status_code=users_status_code))
+
+    def write_testcase(self, name, ref_type, ref_call):
+        self.write(
+            f'testcases/{name}.yml',
+            TESTCASE_CONTENT.format(name=name,
+                                    host=self.host,
+                                    ref_type=ref_type,
+                                    ref_call=ref_call))
+
+    def test_references(self):
+        references = loader.get_test_file_references(
+            self.get_path('testcases/c.yml'))
+        assert references == {
+            'def-api': {'get_index'},
+            'def-testcase': {'index_suite'}
+        }
+
+    def test_poll(self):
+        assert self.watcher.poll() == []
+
+        # only changed api definition invalidates its dependents
+        self.write_api(200, 403)
+        assert self.watcher.poll() == [self.get_path('testcases/b.yml')]
+        assert loader.project_mapping['def-api']['get_users']['validate'] \
+            == [{'eq': ['status_code', 403]}]
+
+        self.write_api(201, 403)
+        assert self.watcher.poll() == [
+            self.get_path('testcases/a.yml'),
+            self.get_path('testcases/c.yml')
+        ]
+
+        self.write('suite/index.yml', SUITE_CONTENT.replace('suite index',
+                                                            'index step'))
+        assert self.watcher.poll() == [self.get_path('testcases/c.yml')]
+
+        # rewritten without change, or not referenced
+        self.write('api/other.yml', OTHER_API_CONTENT)
+        assert self.watcher.poll() == []
+        os.remove(self.get_path('api/other.yml'))
+        assert self.watcher.poll() == []
+        assert 'get_other' not in loader.project_mapping['def-api']
+
+        self.write_testcase('a', 'api', 'get_users()')
+        self.write_testcase('d', 'api', 'get_users()')
+        assert self.watcher.poll() == [
+            self.get_path('testcases/a.yml'),
+            self.get_path('testcases/d.yml')
+        ]
+
+    def test_poll_invalid_definition_file(self):
+        # api without def, e.g. while being edited
+        self.write('api/user.yml', '- api:\n    request: {}\n')
+        assert self.watcher.poll() == []
+        assert 'get_users' in loader.project_mapping['def-api']
+
+        # not parsed again until changed
+        assert self.watcher.poll() == []
+
+        self.write_api(200, 403)
+        assert self.watcher.poll() == [self.get_path('testcases/b.yml')]
+
+    def test_poll_duplicated_definition(self):
+        self.write('api/other_copy.yml',
+                   OTHER_API_CONTENT.replace('/other', '/other_copy'))
+        assert self.watcher.poll() == []
+        assert loader.project_mapping['def-api']['get_other']['request'][
+            'url'] == '/other_copy'
+
+        # still defined by other.yml
+        os.remove(self.get_path('api/other_copy.yml'))
+        assert self.watcher.poll() == []
+        assert loader.project_mapping['def-api']['get_other']['request'][
+            'url'] == '/other'
+        assert self.watcher.definition_owners['def-api']['get_other'] == [
+            self.get_path('api/other.yml')
+        ]
+
+        os.remove(self.get_path('api/other.yml'))
+        assert self.watcher.poll() == []
+        assert 'get_other' not in loader.project_mapping['def-api']
+        assert 'get_other' not in self.watcher.definition_owners['def-api']
+
+    def test_run_affected(self):
+        assert self.watcher.run_affected() is None
+
+        self.write_api(201, 401)
+        result = self.watcher.run_affected()
+        assert result['testcases'] == [
+            self.get_path('testcases/a.yml'),
+            self.get_path('testcases/c.yml')
+        ]
+        assert result['total'] == 2
+        assert result['failures'] == 2
+
+        self.write_api(200, 401)
+        results = []
+        self.watcher.watch(poll_interval=0, callback=results.append,
+                           max_polls=2)
+        assert len(results) == 1
+        assert results[0]['successes'] == 2